@@ -3,6 +3,11 @@ import os
 os.environ["KIVY_AUDIO"] = "ffpyplayer"
 os.environ["DUNGEONFASTER_PATH"] = os.path.dirname(os.path.realpath(__file__))
 
-from dungeonfaster.gui.main import DungeonFasterApp
+from dungeonfaster.gui import startup
+
+startup.mark("launch")
+
+# Imported after the launch mark so loading Kivy and the app counts towards startup
+from dungeonfaster.gui.main import DungeonFasterApp  # noqa: E402
 
 DungeonFasterApp().run()
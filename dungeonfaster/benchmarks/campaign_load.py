@@ -0,0 +1,90 @@
+"""Compare decoding a large campaign with eval() against the schema loader
+
+Run with `python -m dungeonfaster.benchmarks.campaign_load [locations] [walls per map] [points per wall]`
+"""
+
+import json
+import random
+import sys
+import timeit
+
+from dungeonfaster.model.schema import parse_coordinate, parse_polyline, upgrade
+
+
+def make_v0_campaign(locations: int, walls: int, points: int) -> str:
+    """JSON text of a version 0 campaign, every coordinate stored as a tuple string"""
+    rng = random.Random(0)
+
+    def tile() -> str:
+        return str((rng.randrange(500), rng.randrange(500)))
+
+    data = {"name": "benchmark", "position": "(0, 0)", "current_location": "overworld", "party": [], "locations": {}}
+    for index in range(locations):
+        data["locations"]["overworld" if index == 0 else f"location-{index}"] = {
+            "parent": "overworld",
+            "position": tile(),
+            "type": "group",
+            "transitions": {tile(): f"location-{rng.randrange(locations)}" for _ in range(20)},
+            "entrances": {tile(): tile() for _ in range(20)},
+            "map": {
+                "map_file": "map.png",
+                "zoom": 1.0,
+                "hidden": True,
+                "grid_type": "square",
+                "grid": {
+                    "width": 500,
+                    "height": 500,
+                    "x_offset": 0,
+                    "y_offset": 0,
+                    "x_margin": 1,
+                    "y_margin": 1,
+                    "pixel_density": 60.0,
+                    "matrix": [],
+                },
+                "walls": [
+                    [str((rng.uniform(0, 30000), rng.uniform(0, 30000))) for _ in range(points)] for _ in range(walls)
+                ],
+            },
+        }
+
+    return json.dumps(data)
+
+
+def load_with_eval(text: str) -> None:
+    """Decoding as done before the schema loader"""
+    data = json.loads(text)
+    eval(data["position"])  # pylint: disable=eval-used
+    for location in data["locations"].values():
+        eval(location.get("position", "(0, 0)"))  # pylint: disable=eval-used
+        {eval(tile): name for tile, name in location["transitions"].items()}  # pylint: disable=eval-used
+        {eval(tile): eval(to) for tile, to in location["entrances"].items()}  # pylint: disable=eval-used
+        [[eval(point) for point in wall] for wall in location["map"]["walls"]]  # pylint: disable=eval-used
+
+
+def load_with_schema(text: str) -> None:
+    data = upgrade(json.loads(text))
+    parse_coordinate(data["position"])
+    for location in data["locations"].values():
+        parse_coordinate(location["position"])
+        {parse_coordinate(tile): name for tile, name in location["transitions"]}
+        {parse_coordinate(tile): parse_coordinate(to) for tile, to in location["entrances"]}
+        [parse_polyline(wall) for wall in location["map"]["walls"]]
+
+
+def main(locations: int = 50, walls: int = 100, points: int = 20) -> None:
+    v0_text = make_v0_campaign(locations, walls, points)
+    v1_text = json.dumps(upgrade(json.loads(v0_text)))
+    coordinates = locations * (1 + 60 + walls * points)
+    print(f"{locations} locations, {coordinates} coordinates")
+
+    for label, function, text in (
+        ("eval, version 0 file", load_with_eval, v0_text),
+        ("schema, version 0 file", load_with_schema, v0_text),
+        ("schema, version 1 file", load_with_schema, v1_text),
+    ):
+        best = min(timeit.repeat(lambda f=function, t=text: f(t), number=1, repeat=5))
+        print(f"{label:<24} {best * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -7,6 +7,7 @@ from kivy.input.motionevent import MotionEvent
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
 from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.label import Label
 from kivy.uix.screenmanager import Screen
 
 from dungeonfaster.gui.audio import AudioPlayer
@@ -20,6 +21,8 @@ from dungeonfaster.networking.server import CampaignServer
 if TYPE_CHECKING:
     from kivy.graphics import Rectangle
 
+    from dungeonfaster.model.autosave import Autosave
+
 DELTA_X_SHIFT = 15
 DELTA_Y_SHIFT = 15
 
@@ -101,11 +104,15 @@ class CampaignView(MapView):
             size_hint=(0.15, 0.05),
             pos_hint={"center_x": 0.8, "y": 0.1},
         )
+        # Number of moves from the party to the selected tile
+        self.moves_label = Label(text="", size_hint=(0.15, 0.05), pos_hint={"center_x": 0.8, "y": 0.15})
         self.save_button = Button(text="save", size_hint=(0.1, 0.05), pos_hint={"x": 0.85, "y": 0.9})
         self.save_button.bind(on_press=self.on_click_save)
 
         self.adjacent: list[Rectangle] | None = None
         self.campaign: Campaign = Campaign()
+        # Saves the campaign in the background while it is running
+        self.autosave: Autosave | None = None
 
         self.map_clicked = self.interact  # : callable[[int, int], None]
 
@@ -139,6 +146,7 @@ class CampaignView(MapView):
 
         self.add_widget(self.move_party_button)
         self.move_party_button.bind(on_release=self.on_move_party_button)
+        self.add_widget(self.moves_label)
 
         self.add_widget(self.save_button)
 
@@ -146,6 +154,11 @@ class CampaignView(MapView):
         self.map_clicked = self.location_selected
 
     def on_click_save(self, instance: Button) -> None:
+        if self.campaign.journal is not None:
+            # The campaign's own file is kept up to date through the journal, make sure it reached the disk
+            self.campaign.sync()
+
+        # A restore point, which compacting the journal doesn't overwrite
         save_file = os.path.join(
             CAMPAIGNS_DIR, f"{self.campaign.name}-{datetime.now().strftime('%Y%m%dT-%H%M%SZ')}.json"
         )
@@ -160,11 +173,17 @@ class CampaignView(MapView):
         if not os.path.isabs(file):
             file = os.path.join(CAMPAIGNS_DIR, file)
 
-        self.campaign.save(file)
+        if self.autosave is not None:
+            # Written on the autosave thread so the map doesn't freeze
+            self.autosave.save_to(file)
+        else:
+            self.campaign.save(file)
 
-    def load(self, load_path):
+    def load(self, load_path, journal: bool = False):
         self.campaign.load(load_path, self.map_layout)
-        self.map = self.campaign.current_location.map
+        if journal:
+            self.campaign.open_journal()
+        self.map = self.campaign.current_location.location_map
 
         # Get first parent with music
         tmp: Location = self.campaign.current_location
@@ -202,11 +221,14 @@ class CampaignView(MapView):
 
     def change_map(self, name: str):
         new_location: Location = self.campaign.locations[name]
-        self.map = new_location.map
+
+        # Release the tiles drawn for the location being left, its texture stays in the LRU cache
+        if self.map is not None and self.map is not new_location.location_map:
+            self.map.clear_drawn()
+        self.map = new_location.location_map
 
         self.map_layout.canvas.clear()
-        self.map.drawn_tiles = []
-        self.map.map_rect = None
+        self.map.clear_drawn()
         self.map.get_zoom_for_surface(self.map_layout)
         # self._by_scroll()
 
@@ -248,8 +270,6 @@ class CampaignView(MapView):
         if self.leave_button not in self.children:
             self.add_widget(self.leave_button)
 
-        # TODO: Send update
-
     def on_click_up(self, layout: FloatLayout, event: MotionEvent):
         if event.grab_current is None:
             return
@@ -278,7 +298,7 @@ class CampaignView(MapView):
                 if self.running:
                     self.map_clicked(x, y)
                 else:
-                    self.map.grid.flip_tile(x, y)
+                    self.map.flip_at_index(x, y)
                 self.draw()
 
     def interact(self, x: int, y: int) -> None:
@@ -292,6 +312,7 @@ class CampaignView(MapView):
                     )
                     self.clear_adjacent()
                 self.selected = None
+                self.moves_label.text = ""
 
             # Move party to new location
             if self.selected == self.campaign.position and (x, y) in self.map.grid.adjacent(*self.campaign.position):
@@ -299,16 +320,20 @@ class CampaignView(MapView):
 
         elif self.map.revealed(x, y):
             self.selected = (x, y)
+            self.show_moves(x, y)
         elif self.map.hidden_tiles:
             self.map.flip_at_index(x, y)
 
-        # TODO: Send update
+    def show_moves(self, x: int, y: int) -> None:
+        # Only routes through tiles the party has already seen
+        moves = self.map.paths.moves(self.campaign.position, (x, y), avoid_hidden=True)
+        self.moves_label.text = "Unreachable" if moves is None else f"{moves} moves"
 
     def move_party(self, x: int, y: int) -> None:
         self.campaign.position = (x, y)
         self.clear_adjacent()
         self.selected = None
+        self.moves_label.text = ""
 
-        # Reveal adjacent tiles
-        for adjacent in self.map.grid.adjacent(x, y):
-            self.map.reveal(*adjacent)
+        # Reveal every tile within the party's line of sight
+        self.map.reveal_visible(x, y)
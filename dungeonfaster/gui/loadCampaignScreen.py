@@ -1,4 +1,3 @@
-import json
 import os
 import shutil
 from datetime import datetime
@@ -11,26 +10,21 @@ from kivy.uix.scrollview import ScrollView
 
 from dungeonfaster.gui.menuManager import MenuManager
 from dungeonfaster.gui.utilities import FileDialog
+from dungeonfaster.model.catalog import CampaignCatalog, CatalogEntry
 
 CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
 
 
 class LoadCampaignEntry(BoxLayout):
-    def __init__(self, campaign_path, load_cb, **kwargs):
+    def __init__(self, entry: CatalogEntry, load_cb, **kwargs):
         super().__init__(orientation="horizontal", **kwargs)
-        self.campaign_path = campaign_path
+        self.campaign_path = entry.file
+        self.entry = entry
 
-        # Load from campaign file
-        campaign_path = os.path.join(CAMPAIGNS_DIR, campaign_path)
-        with open(campaign_path, encoding="utf-8") as campaign_file:
-            string_data = campaign_file.read()
-            load_data = json.loads(string_data)
-            campaign_name = load_data["name"]
+        campaign_path = os.path.join(CAMPAIGNS_DIR, entry.file)
+        mtime_str = datetime.fromtimestamp(entry.mtime).strftime("%H:%M %d-%m-%Y")
 
-        campaign_mtime = os.path.getmtime(campaign_path)
-        mtime_str = datetime.fromtimestamp(campaign_mtime).strftime("%H:%M %d-%m-%Y")
-
-        name_label = Label(text=campaign_name, halign="left", valign="middle", size_hint=(0.25, 1))
+        name_label = Label(text=entry.name, halign="left", valign="middle", size_hint=(0.25, 1))
         name_label.text_size = name_label.size
         display_path = campaign_path
         if len(display_path) > 50:
@@ -85,10 +79,10 @@ class LoadCampaignScreen(Screen):
         layout.add_widget(campaigns_layout)
         self.add_widget(layout)
 
+        # Only files changed since the catalog was last written are read
         campaigns = []
-        for campaign_file in os.listdir(CAMPAIGNS_DIR):
-            if campaign_file.endswith(".json"):
-                campaigns.append(LoadCampaignEntry(campaign_file, self.load_cb))
+        for entry in CampaignCatalog(CAMPAIGNS_DIR).entries():
+            campaigns.append(LoadCampaignEntry(entry, self.load_cb))
 
         # TODO: Use RelativeLayout
 
@@ -106,9 +100,9 @@ class LoadCampaignScreen(Screen):
         self.menuManager.add_widget(self)
 
     def load(self, campaign_path: os.PathLike | str) -> None:
-        self.manager.runCampaignScreen.load(campaign_path)
+        self.manager.run_campaign_screen.load(campaign_path)
         self.manager.last_screen = self.name
-        self.manager.current = self.manager.runCampaignScreen.name
+        self.manager.current = self.manager.run_campaign_screen.name
 
     def load_cb(self, instance: Button):
         parent: LoadCampaignEntry = instance.parent
@@ -6,22 +6,52 @@
 
 from kivy.app import App
 
-from dungeonfaster.gui.loadCampaignScreen import LoadCampaignScreen
+from dungeonfaster.gui import startup
 from dungeonfaster.gui.menuManager import MenuManager
-from dungeonfaster.gui.newCampaignScreen import NewCampaignScreen
-from dungeonfaster.gui.playerScreen import PlayerScreen
-from dungeonfaster.gui.runCampaignScreen import RunCampaignScreen
+
+startup.mark("imports")
+
+# Screens are only imported and built when first shown, see MenuManager.screen
+
+
+def new_campaign_screen(manager: MenuManager):
+    from dungeonfaster.gui.newCampaignScreen import NewCampaignScreen  # pylint: disable=import-outside-toplevel
+
+    screen = NewCampaignScreen(manager)
+    manager.add_back_button(screen)
+    return screen
+
+
+def load_campaign_screen(manager: MenuManager):
+    from dungeonfaster.gui.loadCampaignScreen import LoadCampaignScreen  # pylint: disable=import-outside-toplevel
+
+    screen = LoadCampaignScreen(manager)
+    manager.add_back_button(screen)
+    return screen
+
+
+def run_campaign_screen(manager: MenuManager):
+    from dungeonfaster.gui.runCampaignScreen import RunCampaignScreen  # pylint: disable=import-outside-toplevel
+
+    return RunCampaignScreen(manager)
+
+
+def player_screen(manager: MenuManager):
+    from dungeonfaster.gui.playerScreen import PlayerScreen  # pylint: disable=import-outside-toplevel
+
+    return PlayerScreen(manager)
 
 
 class DungeonFasterApp(App):
     def build(self):
         menu_manager = MenuManager()
-        menu_manager.newCampaignScreen = NewCampaignScreen(menu_manager)
-        menu_manager.add_back_button(menu_manager.newCampaignScreen)
-        menu_manager.loadCampaignScreen = LoadCampaignScreen(menu_manager)
-        menu_manager.add_back_button(menu_manager.loadCampaignScreen)
-        menu_manager.runCampaignScreen = RunCampaignScreen(menu_manager)
-        menu_manager.playerScreen = PlayerScreen(menu_manager)
+        menu_manager.register_screen("new_campaign_screen", new_campaign_screen)
+        menu_manager.register_screen("load_campaign_screen", load_campaign_screen)
+        menu_manager.register_screen("run_campaign_screen", run_campaign_screen)
+        menu_manager.register_screen("player_screen", player_screen)
         # TODO: Exit campaign button?
 
+        startup.mark("build")
+        startup.report_on_first_frame()
+
         return menu_manager
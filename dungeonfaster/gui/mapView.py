@@ -1,7 +1,8 @@
 import os
+import threading
 from typing import TYPE_CHECKING
 
-from kivy.clock import mainthread
+from kivy.clock import Clock
 from kivy.core.window import Window, WindowBase
 from kivy.graphics import Rectangle
 from kivy.input.motionevent import MotionEvent
@@ -11,6 +12,8 @@ from kivy.uix.screenmanager import Screen
 from dungeonfaster.model.campaign import Campaign
 from dungeonfaster.model.location import Location
 from dungeonfaster.networking.comms import Comms
+from dungeonfaster.networking.protocol import encode_index, encode_pos
+from dungeonfaster.networking.throttle import PositionThrottle
 
 if TYPE_CHECKING:
     from dungeonfaster.model.map import Map
@@ -51,7 +54,12 @@ class MapView(FloatLayout):
 
         self.party_tiles: list[PlayerRect] = []
         self.active_tile: PlayerRect | None = None
-        self.updated_tile: PlayerRect | None = None
+        self.updated_tiles: list[PlayerRect] = []
+
+        self.position_throttle = PositionThrottle(self._send_player_pos)
+        # Latest received position of each dragged token, drawn together on the next frame
+        self.received_positions: dict[str, tuple[float, float]] = {}
+        self.received_lock = threading.Lock()
 
         self.map_layout = FloatLayout(pos_hint={"x": 0.025, "y": 0.025}, size_hint=(0.95, 0.95))
         self.add_widget(self.map_layout)
@@ -116,7 +124,7 @@ class MapView(FloatLayout):
             for tile in self.party_tiles:
                 if tile == self.active_tile:
                     continue
-                if tile == self.updated_tile:
+                if tile in self.updated_tiles:
                     continue
                 self.map_layout.canvas.add(tile)
                 tile.pos = self.map.grid.tile_pos_from_index(*tile.index)
@@ -135,11 +143,14 @@ class MapView(FloatLayout):
 
     def change_map(self, name: str):
         new_location: Location = self.campaign.locations[name]
-        self.map = new_location.map
+
+        # Release the tiles drawn for the location being left, its texture stays in the LRU cache
+        if self.map is not None and self.map is not new_location.location_map:
+            self.map.clear_drawn()
+        self.map = new_location.location_map
 
         self.map_layout.canvas.clear()
-        self.map.drawn_tiles = []
-        self.map.map_rect = None
+        self.map.clear_drawn()
         self.map.get_zoom_for_surface(self.map_layout)
         # self._by_scroll()
 
@@ -257,6 +268,11 @@ class MapView(FloatLayout):
             self.send_player_index(self.active_tile.name, cursor_index)
             self.active_tile = None
 
+        # Clear the fog the token can now see
+        if self.map.hidden_tiles:
+            self.map.reveal_visible(*cursor_index)
+            self.map.draw_tiles()
+
         self.draw_party()
 
     def on_click(self, layout: FloatLayout, event: MotionEvent):
@@ -344,29 +360,46 @@ class MapView(FloatLayout):
 
         self._by_zoom(old_zoom, event)
 
-    @mainthread
     def receive_player_pos(self, player_name: str, pos: tuple[float, float]):
-        player_rect = next(rect for rect in self.party_tiles if rect.name == player_name)
+        """Called from the network thread, positions received before the next frame replace each other"""
+        with self.received_lock:
+            schedule = not self.received_positions
+            self.received_positions[player_name] = pos
+        if schedule:
+            Clock.schedule_once(self._draw_received_positions)
+
+    def _draw_received_positions(self, *args):
+        with self.received_lock:
+            (positions, self.received_positions) = (self.received_positions, {})
+
+        if self.map is None:
+            # Joined but not shown yet, the snapshot and deltas place the tokens once it is
+            return
 
         icon_width, icon_height = self.map.grid.tile_size
+        for player_name, pos in positions.items():
+            player_rect = next((rect for rect in self.party_tiles if rect.name == player_name), None)
+            if player_rect is None:
+                continue
 
-        (pix_x, pix_y) = self.absolute_to_pixel(pos)
+            (pix_x, pix_y) = self.absolute_to_pixel(pos)
 
-        player_rect.pos = (pix_x - icon_width / 2, pix_y - icon_width / 2)
-        player_rect.size = (icon_width, icon_height)
+            player_rect.pos = (pix_x - icon_width / 2, pix_y - icon_width / 2)
+            player_rect.size = (icon_width, icon_height)
+            self.updated_tiles.append(player_rect)
 
-        self.updated_tile = player_rect
         self.draw()
-        self.updated_tile = None
+        self.updated_tiles.clear()
 
     def send_player_pos(self, player_name: str, pos: tuple[float, float]):
-        message = f"POS:{player_name}:({pos[0]}, {pos[1]})"
+        self.position_throttle.update(player_name, pos)
 
+    def _send_player_pos(self, player_name: str, pos: tuple[float, float]):
         if self.comms:
-            self.comms.send_update(message)
+            self.comms.send_update(encode_pos(player_name, pos))
 
-    @mainthread
     def receive_player_index(self, player_name: str, index: tuple[int, int]):
+        """Called on the Kivy thread, once the server has sequenced the move"""
         player_rect = next(rect for rect in self.party_tiles if rect.name == player_name)
 
         player_rect.index = index
@@ -375,7 +408,7 @@ class MapView(FloatLayout):
         self.draw()
 
     def send_player_index(self, player_name: str, pos: tuple[int, int]):
-        message = f"INDEX:{player_name}:({pos[0]}, {pos[1]})"
-
+        # The tile the token was dropped on supersedes any position not sent yet
+        self.position_throttle.discard(player_name)
         if self.comms:
-            self.comms.send_update(message)
+            self.comms.send_update(encode_index(player_name, pos))
@@ -1,3 +1,5 @@
+from collections.abc import Callable
+
 from kivy.uix.button import Button
 from kivy.uix.floatlayout import FloatLayout
 from kivy.uix.label import Label
@@ -11,13 +13,49 @@ class MenuManager(ScreenManager):
         self.mainMenuScreen: Screen = MainMenuScreen(self)
         self.last_screen: Screen = self.mainMenuScreen.name
 
-        self.newCampaignScreen: Screen = None
-        self.loadCampaignScreen: Screen = None
-        self.runCampaignScreen: Screen = None
-        self.playerScreen: Screen = None
+        # Attribute name -> function building the screen, called on first use, see screen()
+        self.screen_factories: dict[str, Callable[[MenuManager], Screen]] = {}
+        self.built_screens: dict[str, Screen] = {}
 
         self.current = self.mainMenuScreen.name
 
+    def register_screen(self, attribute: str, factory: Callable[["MenuManager"], Screen]) -> None:
+        self.screen_factories[attribute] = factory
+
+    def screen(self, attribute: str) -> Screen | None:
+        """Get a registered screen, building it the first time it is needed
+
+        Args:
+            attribute (str): Name the screen was registered under, such as "load_campaign_screen"
+
+        Returns:
+            Screen | None: None if no screen was registered under that name
+        """
+        if attribute not in self.built_screens:
+            factory = self.screen_factories.get(attribute)
+            if factory is None:
+                return None
+
+            self.built_screens[attribute] = factory(self)
+
+        return self.built_screens[attribute]
+
+    @property
+    def new_campaign_screen(self) -> Screen:
+        return self.screen("new_campaign_screen")
+
+    @property
+    def load_campaign_screen(self) -> Screen:
+        return self.screen("load_campaign_screen")
+
+    @property
+    def run_campaign_screen(self) -> Screen:
+        return self.screen("run_campaign_screen")
+
+    @property
+    def player_screen(self) -> Screen:
+        return self.screen("player_screen")
+
     def add_back_button(self, screen: Screen):
         backButton = Button(
             text="<",
@@ -30,11 +68,11 @@ class MenuManager(ScreenManager):
 
     def toNewCampaignScreen(self, instance):
         self.last_screen = self.current
-        self.current = self.newCampaignScreen.name
+        self.current = self.new_campaign_screen.name
 
     def toLoadCampaignScreen(self, instance):
         self.last_screen = self.current
-        self.current = self.loadCampaignScreen.name
+        self.current = self.load_campaign_screen.name
 
     def toMainMenuScreen(self, instance):
         self.last_screen = self.current
@@ -42,7 +80,7 @@ class MenuManager(ScreenManager):
 
     def toPlayerScreen(self, instance):
         self.last_screen = self.current
-        self.current = self.playerScreen.name
+        self.current = self.player_screen.name
 
     def toLastScreen(self, instance):
         self.current = self.last_screen
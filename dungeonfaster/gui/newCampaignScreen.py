@@ -1,7 +1,6 @@
 import os
-import shutil
 
-from kivy.graphics import Color, Ellipse, Line, Rectangle
+from kivy.graphics import Color, Ellipse, InstructionGroup, Line, Rectangle
 from kivy.input.motionevent import MotionEvent
 from kivy.uix.accordion import Accordion, AccordionItem
 from kivy.uix.boxlayout import BoxLayout
@@ -23,13 +22,23 @@ from dungeonfaster.gui.utilities import (
     LabeledTextInput,
     NewPlayerDialog,
 )
+from dungeonfaster.model.assets import AssetStore
 from dungeonfaster.model.location import Location
 from dungeonfaster.model.map import Map
 from dungeonfaster.model.player import Player
+from dungeonfaster.model.walls import VertexIndex
 
 CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
 CAMP_FILE_DIR = os.path.join(CAMPAIGNS_DIR, "files")
 
+# Imported maps are copied here, named by content
+ASSET_STORE = AssetStore(CAMP_FILE_DIR)
+
+# Screen pixel radius around a wall point within which it can be grabbed
+WALL_HIT_RADIUS = 10
+# Screen pixel radius within which a dropped wall point snaps onto another one
+WALL_SNAP_RADIUS = 15
+
 
 class NewCampaignScreen(Screen):
     overworld_map_dialog: FileDialog
@@ -40,13 +49,14 @@ class NewCampaignScreen(Screen):
         self.menuManager = manager
         self.fileChooser = None
 
-        self.walls: dict[Ellipse, tuple[float, float]] = {}
+        # Wall points are referred to by (polyline index, point index) into the current map's walls
+        self.wall_dots: dict[tuple[int, int], Ellipse] = {}
         self.lines: list[Line] = []
-        self.line = Line(points=[], width=2)
-        self.grabbed_wall: Ellipse | None = None
+        self.walls_group = InstructionGroup()
+        self.wall_vertices = VertexIndex()
+        self.grabbed_wall: tuple[int, int] | None = None
         self.wall_moved: bool = False
-        self.active_wall: Ellipse | None = None
-        self.wall_segments: list[list[Ellipse]] = [[]]
+        self.active_wall: tuple[int, int] | None = None
 
         layout = BoxLayout(orientation="vertical")
 
@@ -139,139 +149,159 @@ class NewCampaignScreen(Screen):
         circle_y = wall_y / self.campaign_view.map.window.zoom - self.campaign_view.map.window.y
         return (circle_x, circle_y)
 
-    def draw_walls(self):
-        for wall, wall_pos in self.walls.items():
-            if wall == self.grabbed_wall:
-                wall.size = (60, 60)
-            elif wall == self.active_wall:
-                wall.size = (40, 40)
-            else:
-                wall.size = (20, 20)
+    def screen_to_wall_pos(self, pos: tuple[float, float]) -> tuple[float, float]:
+        cursor_x, cursor_y = pos
+        wall_x: float = (self.campaign_view.map.window.x + cursor_x) * self.campaign_view.map.window.zoom
+        wall_y: float = (self.campaign_view.map.window.y + cursor_y) * self.campaign_view.map.window.zoom
+        return (wall_x, wall_y)
+
+    def load_walls(self) -> None:
+        """(Re-)create the wall points, lines and index from the current map's walls"""
+        self.walls_group.clear()
+        self.wall_dots = {}
+        self.lines = []
+        self.wall_vertices = VertexIndex()
+        self.grabbed_wall = None
+        self.active_wall = None
+
+        for polyline_index, polyline in enumerate(self.campaign_view.map.walls):
+            line = Line(points=[], width=2)
+            self.lines.append(line)
+            self.walls_group.add(line)
+            for point_index in range(len(polyline)):
+                self.add_wall_dot((polyline_index, point_index))
 
-            if wall not in self.campaign_view.map.window.surface.canvas.children:
-                self.campaign_view.map.window.surface.canvas.add(wall)
+        self.draw_walls()
 
-            wall.pos = self.wall_pos_to_map(wall_pos)
-            wall.pos = (wall.pos[0] - wall.size[0] / 2, wall.pos[1] - wall.size[1] / 2)
+    def attach_walls(self) -> None:
+        canvas = self.campaign_view.map.window.surface.canvas
+        if self.walls_group not in canvas.children:
+            canvas.add(self.walls_group)
+
+    def add_wall_dot(self, key: tuple[int, int]) -> None:
+        (polyline_index, point_index) = key
+        wall_dot = Ellipse(segments=3, size=(20, 20))
+        self.wall_dots[key] = wall_dot
+        self.walls_group.add(wall_dot)
+        self.wall_vertices.add(key, tuple(self.campaign_view.map.walls[polyline_index][point_index]))
+
+    def place_wall_dot(self, key: tuple[int, int]) -> None:
+        if key == self.grabbed_wall:
+            size = 60
+        elif key == self.active_wall:
+            size = 40
+        else:
+            size = 20
+
+        (polyline_index, point_index) = key
+        x, y = self.wall_pos_to_map(self.campaign_view.map.walls[polyline_index][point_index])
+        wall_dot = self.wall_dots[key]
+        wall_dot.size = (size, size)
+        wall_dot.pos = (x - size / 2, y - size / 2)
+
+    def draw_wall_line(self, polyline_index: int) -> None:
+        points = []
+        for wall in self.campaign_view.map.walls[polyline_index]:
+            x, y = self.wall_pos_to_map(wall)
+            points.append(x)
+            points.append(y)
+        self.lines[polyline_index].points = points
+
+    def draw_walls(self):
+        self.attach_walls()
+        for key in self.wall_dots:
+            self.place_wall_dot(key)
 
         # Draw lines in between walls
-        for line, segments in zip(self.lines, self.campaign_view.map.walls, strict=True):
-            points = []
-            for wall in segments:
-                x, y = self.wall_pos_to_map(wall)
-                points.append(x)
-                points.append(y)
-            line.points = points
-            if line not in self.campaign_view.map.window.surface.canvas.children:
-                self.campaign_view.map.window.surface.canvas.add(line)
+        for polyline_index in range(len(self.lines)):
+            self.draw_wall_line(polyline_index)
+
+    def move_wall_point(self, key: tuple[int, int], pos: tuple[float, float]) -> None:
+        """Move one wall point, only redrawing the polyline it belongs to"""
+        (polyline_index, point_index) = key
+        self.campaign_view.map.walls[polyline_index][point_index] = pos
+        self.campaign_view.map.walls_changed()
+        self.wall_vertices.move(key, pos)
+        self.place_wall_dot(key)
+        self.draw_wall_line(polyline_index)
 
     def on_touch_move(self, touch: MotionEvent):
-        if self.grabbed_wall:
+        if self.grabbed_wall is not None:
             self.wall_moved = True
-            cursor_x, cursor_y = touch.pos
-            wall_x: float = (self.campaign_view.map.window.x + cursor_x) * self.campaign_view.map.window.zoom
-            wall_y: float = (self.campaign_view.map.window.y + cursor_y) * self.campaign_view.map.window.zoom
+            self.move_wall_point(self.grabbed_wall, self.screen_to_wall_pos(touch.pos))
+            return
 
-            wall_dot = self.grabbed_wall
-            wall_dot.pos = (cursor_x - wall_dot.size[0] / 2, cursor_y - wall_dot.size[1] / 2)
-            self.walls[wall_dot] = (wall_x, wall_y)
         self.draw_walls()
 
-    def collides_with_wall(self, pos: tuple[float, float]) -> Ellipse:
-        for wall in self.walls:
-            if self.wall_collide(pos, wall):
-                return wall
-
-        return None
-
-    def wall_collide(self, pos: tuple[float, float], wall: Ellipse) -> bool:
-        wall_x, wall_y = wall.pos
-        wall_width, wall_height = wall.size
-        cursor_x, cursor_y = pos
-        x_offset = self.campaign_view.map_layout.x
-        y_offset = self.campaign_view.map_layout.y
-
-        return bool(
-            cursor_x < wall_x + wall_width + x_offset
-            and cursor_x > wall_x
-            and cursor_y < wall_y + wall_height + y_offset
-            and cursor_y > wall_y
-        )
-
-    def wall_resize(self, wall: Ellipse, size: tuple[float, float]):
-        wall_x, wall_y = wall.pos
-        circle_x = wall_x / self.campaign_view.map.window.zoom - self.campaign_view.map.window.x
-        circle_y = wall_y / self.campaign_view.map.window.zoom - self.campaign_view.map.window.y
-        wall.pos = (circle_x - wall.size[0] / 2, circle_y - wall.size[1] / 2)
+    def collides_with_wall(self, pos: tuple[float, float]) -> tuple[int, int] | None:
+        radius = WALL_HIT_RADIUS * self.campaign_view.map.window.zoom
+        return self.wall_vertices.nearest(self.screen_to_wall_pos(pos), radius)
 
     def wall_touch_down(self, layout: FloatLayout, event: MotionEvent):
         collission = self.collides_with_wall(event.pos)
-        if self.collides_with_wall(event.pos):
-            wall_pos = self.walls[collission]
+        if collission is not None:
             self.grabbed_wall = collission
-            self.grabbed_wall.size = (60, 60)
-            wall_x, wall_y = wall_pos
-            circle_x = wall_x / self.campaign_view.map.window.zoom - self.campaign_view.map.window.x
-            circle_y = wall_y / self.campaign_view.map.window.zoom - self.campaign_view.map.window.y
-            collission.pos = (circle_x - collission.size[0] / 2, circle_y - collission.size[1] / 2)
+            self.place_wall_dot(collission)
             return
 
-        if self.grabbed_wall:
-            self.grabbed_wall = None
+        self.grabbed_wall = None
 
         self.campaign_view.on_click(layout, event)
 
     def handle_wall_up(self, event: MotionEvent):
+        self.attach_walls()
+
         # If current grabbing wall
-        if self.grabbed_wall:
+        if self.grabbed_wall is not None:
             wall = self.grabbed_wall
-            wall_x, wall_y = self.walls[self.grabbed_wall]
             self.grabbed_wall = None
-            circle_x = wall_x / self.campaign_view.map.window.zoom - self.campaign_view.map.window.x
-            circle_y = wall_y / self.campaign_view.map.window.zoom - self.campaign_view.map.window.y
-            wall.pos = (circle_x - wall.size[0] / 2, circle_y - wall.size[1] / 2)
             if self.wall_moved:
                 self.wall_moved = False
+                # Snap onto the nearest point of another wall
+                (polyline_index, point_index) = wall
+                pos = self.campaign_view.map.walls[polyline_index][point_index]
+                radius = WALL_SNAP_RADIUS * self.campaign_view.map.window.zoom
+                snap = self.wall_vertices.nearest(pos, radius, exclude_polyline=polyline_index)
+                if snap is not None:
+                    self.move_wall_point(wall, self.wall_vertices.points[snap])
+                else:
+                    self.place_wall_dot(wall)
                 return
+            self.place_wall_dot(wall)
 
+        previous = self.active_wall
         collission = self.collides_with_wall(event.pos)
-        # If we're clicking on a wall and no wall is currently active
-        if not self.active_wall:
-            if collission:
-                self.active_wall = collission
-                return
-        # If there's already an active wall and we're clicking on a wall
-        elif collission:
-            if self.active_wall == collission:
-                self.active_wall = None
-                return
-            self.active_wall = collission
+        if collission is not None:
+            # Clicking the active wall deactivates it, clicking any other wall activates that one
+            self.active_wall = None if collission == previous else collission
+            for wall in (previous, collission):
+                if wall is not None:
+                    self.place_wall_dot(wall)
             return
 
-        cursor_x, cursor_y = event.pos
-        wall_x: float = (self.campaign_view.map.window.x + cursor_x) * self.campaign_view.map.window.zoom
-        wall_y: float = (self.campaign_view.map.window.y + cursor_y) * self.campaign_view.map.window.zoom
-
-        wall_dot = Ellipse(segments=3, size=(20, 20), pos=(cursor_x, cursor_y))
-        wall_dot.pos = (wall_dot.pos[0] - wall_dot.size[0] / 2, wall_dot.pos[1] - wall_dot.size[1] / 2)
-        self.walls[wall_dot] = (wall_x, wall_y)
-        self.campaign_view.map_layout.canvas.add(wall_dot)
-
-        # Get active wall segment by current active wall
-        if self.active_wall:
-            wall = self.walls[self.active_wall]
-            for segments in self.campaign_view.map.walls:
-                for segment in segments:
-                    if wall == segment:
-                        segments.append((wall_x, wall_y))
-                        break
+        walls = self.campaign_view.map.walls
+        if previous is not None:
+            # Continue the polyline of the active wall
+            polyline_index = previous[0]
         else:
-            # Add new Line to self.lines
-            self.lines.append(Line(points=[], width=2))
-            self.campaign_view.map.walls.append([(wall_x, wall_y)])
-
+            # Start a new polyline
+            polyline_index = len(walls)
+            walls.append([])
+            line = Line(points=[], width=2)
+            self.lines.append(line)
+            self.walls_group.add(line)
+
+        wall_dot = (polyline_index, len(walls[polyline_index]))
+        walls[polyline_index].append(self.screen_to_wall_pos(event.pos))
+        self.campaign_view.map.walls_changed()
+        self.add_wall_dot(wall_dot)
         self.active_wall = wall_dot
 
+        if previous is not None:
+            self.place_wall_dot(previous)
+        self.place_wall_dot(wall_dot)
+        self.draw_wall_line(polyline_index)
+
     def wall_touch_up(self, layout: FloatLayout, event: MotionEvent):
         if self.campaign_view.moved:
             return
@@ -281,11 +311,6 @@ class NewCampaignScreen(Screen):
 
         self.handle_wall_up(event)
 
-        self.draw_walls()
-
-    def wall_move(self):
-        pass
-
     def on_text(self, instance: TextInput, value: str) -> None:
         self.campaign_view.campaign.name = value
 
@@ -302,11 +327,10 @@ class NewCampaignScreen(Screen):
         overworld_map_file = self.overworld_map_dialog.text_input.text
         self.campaign_view.remove_widget(self.get_map_button)
         self.overworld_map_dialog.close_dialog(None)
-        # TODO: Move map file to campaigns/files
 
         base_location = Location("overworld", {})
-        base_location.set_map(overworld_map_file)
-        self.campaign_view.map = base_location.map
+        base_location.set_map(ASSET_STORE.add(overworld_map_file))
+        self.campaign_view.map = base_location.location_map
 
         self.campaign_view.add_location(base_location, "overworld")
 
@@ -365,19 +389,7 @@ class NewCampaignScreen(Screen):
             self.controls_layout.add_location_entry(location)
 
         # Add walls for display
-        for segment in self.campaign_view.map.walls:
-            points = []
-            for wall_x, wall_y in segment:
-                circle_x = wall_x * self.campaign_view.map.window.zoom - self.campaign_view.map.window.x
-                circle_y = wall_y * self.campaign_view.map.window.zoom - self.campaign_view.map.window.y
-                wall_dot = Ellipse(segments=3, size=(20, 20), pos=(circle_x, circle_y))
-                wall_dot.pos = (wall_dot.pos[0] - wall_dot.size[0] / 2, wall_dot.pos[1] - wall_dot.size[1] / 2)
-                self.walls[wall_dot] = (wall_x, wall_y)
-
-                points.append(wall_dot.pos[0] + wall_dot.size[0] / 2)
-                points.append(wall_dot.pos[1] + wall_dot.size[1] / 2)
-            # Add any lines between walls
-            self.lines.append(Line(points=points, width=2))
+        self.load_walls()
 
         # Add musics for current location
         for music in self.campaign_view.campaign.current_location.music:
@@ -449,6 +461,9 @@ class MapEditorLayout(BoxLayout):
         self.yMarginController = LabeledIntInput("Y Margin", self.set_y_margin, 1, 1, size_hint=(1, 0.08))
         self.add_widget(self.yMarginController)
 
+        self.visionController = LabeledIntInput("Vision", self.set_vision_radius, 1, 1, size_hint=(1, 0.08))
+        self.add_widget(self.visionController)
+
         # hex-or-square: Switch
         hex_switch_layout = BoxLayout(orientation="horizontal", size_hint=(1, 0.08))
         hex_switch_layout.add_widget(Label(text="Hex Grid"))
@@ -488,21 +503,15 @@ class MapEditorLayout(BoxLayout):
         self.screen.campaign_view.campaign.current_location.name = value
 
     def all_on(self, instance):
-        for i in range(self.screen.campaign_view.map.grid.x):
-            for j in range(self.screen.campaign_view.map.grid.y):
-                if (i, j) not in self.screen.campaign_view.map.grid.matrix:
-                    self.screen.campaign_view.map.grid.flip_tile(i, j)
+        self.screen.campaign_view.map.hide_all()
         self.screen.campaign_view.map.draw()
 
     def all_off(self, instance):
-        for tile in self.screen.campaign_view.map.grid.matrix:
-            self.screen.campaign_view.map.grid.flip_tile(*tile)
+        self.screen.campaign_view.map.reveal_all()
         self.screen.campaign_view.map.draw()
 
     def invert_tiles(self, instance):
-        for i in range(self.screen.campaign_view.map.grid.x):
-            for j in range(self.screen.campaign_view.map.grid.y):
-                self.screen.campaign_view.map.grid.flip_tile(i, j)
+        self.screen.campaign_view.map.invert_tiles()
         self.screen.campaign_view.map.draw()
 
     def update_from_map(self, map_arg: Map):
@@ -517,6 +526,8 @@ class MapEditorLayout(BoxLayout):
         self.xMarginController.value = map_arg.grid.x_margin
         self.yMarginController.input.text = str(map_arg.grid.y_margin)
         self.yMarginController.value = map_arg.grid.y_margin
+        self.visionController.input.text = str(map_arg.vision_radius)
+        self.visionController.value = map_arg.vision_radius
 
     def hex_switch_cb(self, instance: Switch, state: bool):
         if not self.screen.campaign_view.map:
@@ -587,6 +598,11 @@ class MapEditorLayout(BoxLayout):
         self.screen.campaign_view.map.update()
         self.screen.campaign_view.map.draw()
 
+    def set_vision_radius(self, value: float):
+        if self.screen.campaign_view.map is None:
+            return
+        self.screen.campaign_view.map.vision_radius = max(0, int(value))
+
     def set_density(self, value: float):
         if self.screen.campaign_view.map is None:
             return
@@ -690,10 +706,8 @@ class ControllerLayout(BoxLayout):
         self.file_selection_dialog.close_dialog(None)
         map_name = os.path.basename(location_map_file).split("/")[-1]
 
-        # Move map file to campaigns/files
-        new_map_file = os.path.join(CAMP_FILE_DIR, map_name)
-        if new_map_file != location_map_file:
-            shutil.copy(location_map_file, new_map_file)
+        # Copy map file to the campaign files, stored once however many locations use it
+        new_map_file = ASSET_STORE.add(location_map_file)
 
         current_location: Location = self.screen.campaign_view.campaign.current_location
 
@@ -726,7 +740,7 @@ class ControllerLayout(BoxLayout):
 
     def add_location_entry(self, location: Location):
         new_location_entry = EditableListEntry(
-            f"{location.name}\n{os.path.basename(location.map.map_file)}",
+            f"{location.name}\n{os.path.basename(location.map_file)}",
             location,
             self.screen.edit_location_cb,
             self.screen.delete_location_cb,
@@ -1,17 +1,15 @@
-import os
-import time
-
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.button import Button
+from kivy.uix.label import Label
+from kivy.uix.progressbar import ProgressBar
 from kivy.uix.screenmanager import Screen
 
 from dungeonfaster.gui.menuManager import MenuManager
 from dungeonfaster.gui.playerView import PlayerView
 from dungeonfaster.gui.utilities import LabeledTextInput
 from dungeonfaster.model.campaign import Campaign
-from dungeonfaster.networking.client import CampaignClient
+from dungeonfaster.networking.client import CampaignClient, FetchProgress, campaign_path
 
-USERS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "users")
 # TODO: Add connection dialog box - username, password, server address
 
 
@@ -51,6 +49,20 @@ class PlayerScreen(Screen):
         self.connect_layout.add_widget(self.connect_button)
         self.add_widget(self.connect_layout)
 
+        # Shown while the campaign's files arrive
+        self.joined = False
+        self.campaign_path = ""
+        self.first_files: set[str] = set()
+        self.progress_layout = BoxLayout(
+            pos_hint={"center_x": 0.5, "y": 0.02},
+            size_hint=(0.5, 0.06),
+            orientation="vertical",
+        )
+        self.progress_label = Label(text="Joining...")
+        self.progress_bar = ProgressBar(max=1, value=0)
+        self.progress_layout.add_widget(self.progress_label)
+        self.progress_layout.add_widget(self.progress_bar)
+
     def on_host_str(self, instance, value):
         # TODO: Validate address
 
@@ -67,31 +79,64 @@ class PlayerScreen(Screen):
         self.password = value
 
     def connect_to_server(self, instance: Button):
+        """Connect without waiting, PlayerView.on_session reports when the campaign was received"""
         self.connect_button.text = "Connecting..."
         # self.client_connection = CampaignClient(self.player_view, self.player_name)
 
         self.player_view.connect(self.player_name, (self.host_addr, self.host_port))
 
-        while not self.player_view.comms.established and self.player_view.comms.running:
-            time.sleep(1)
+    def on_session(self, established: bool):
+        if not established:
+            print("Client not running")
+            if self.joined:
+                self.progress_label.text = "Connection lost"
+            else:
+                self.connect_button.text = "Connect"
+            return
 
         self.remove_widget(self.connect_layout)
+        self.joined = True
+
+        # Fetch what is needed to show the campaign first, then the other maps, nearest first
+        self.campaign_path = campaign_path(self.player_name)
+        files = Campaign().get_files(self.campaign_path)
+        self.first_files = set(files.first)
+
+        self.add_widget(self.progress_layout)
+        self.player_view.fetch_files(files.first, urgent=True)
+        self.player_view.fetch_files(files.rest)
+        if not self.first_files:
+            self.show_campaign()
+
+    def on_file_received(self, reference: str, received: bool):
+        if not received:
+            print(f"ERROR: Campaign file not received: {reference}")
+
+        if reference in self.first_files:
+            self.first_files.discard(reference)
+            if not self.first_files:
+                self.show_campaign()
+
+    def show_progress(self, progress: FetchProgress):
+        megabytes = 1024 * 1024
+        self.progress_label.text = (
+            f"Maps: {progress.files_done}/{progress.files_total} "
+            f"({progress.bytes_done / megabytes:.1f}/{progress.bytes_total / megabytes:.1f} MB)"
+        )
+        self.progress_bar.max = max(progress.bytes_total, 1)
+        self.progress_bar.value = progress.bytes_done
 
-        if not self.player_view.comms.running:
-            print("Client not running")
-            return
+        if progress.files_done >= progress.files_total and self.progress_layout.parent is self:
+            self.remove_widget(self.progress_layout)
 
+    def show_campaign(self):
         # Load campaign
         self.player_view.campaign = Campaign()
-        campaign_path = os.path.join(USERS_DIR, f"{self.player_name}.json")
-
-        files_needed = self.player_view.campaign.get_files(campaign_path)
-        self.player_view.request_files(files_needed)
-
-        self.player_view.campaign.load(campaign_path, self.player_view.map_layout)
-        self.player_view.map = self.player_view.campaign.current_location.map
+        self.player_view.campaign.load(self.campaign_path, self.player_view.map_layout)
+        self.player_view.map = self.player_view.campaign.current_location.location_map
         self.player_view.populate_tiles(self.player_view.campaign.current_location)
 
         self.player_view.bind(on_touch_down=self.player_view.on_click)
         self.player_view.bind(on_touch_up=self.player_view.on_click_up)
-        self.add_widget(self.player_view)
+        self.add_widget(self.player_view, index=len(self.children))
+        self.player_view.apply_held_deltas()
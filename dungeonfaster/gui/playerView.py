@@ -2,20 +2,146 @@ from typing import override
 
 from kivy.input.motionevent import MotionEvent
 from kivy.uix.floatlayout import FloatLayout
+from kivy.uix.screenmanager import Screen
 
 from dungeonfaster.gui.mapView import MapView
-from dungeonfaster.networking.client import CampaignClient
+from dungeonfaster.model.assets import AssetInfo
+from dungeonfaster.model.campaign import Campaign, fetch_reference
+from dungeonfaster.networking.client import CampaignClient, FetchProgress
+from dungeonfaster.networking.protocol import (
+    FOG,
+    INDEX,
+    LOCATION,
+    PARTY,
+    decode_fog_change,
+    decode_index,
+    decode_location,
+    decode_party,
+)
 
 
 class PlayerView(MapView):
     name: str
 
+    def __init__(self, screen: Screen, **kwargs):
+        super().__init__(screen, **kwargs)
+        self.comms: CampaignClient | None = None
+        # References of the campaign's files which haven't been received yet
+        self.missing_files: set[str] = set()
+        # Location to show once its map arrives
+        self.awaited_location: str | None = None
+        # Deltas received before the campaign is shown, applied once it is
+        self.held_deltas: list[tuple[int, memoryview]] = []
+
     def connect(self, name: str, addr: tuple[str, int]):
+        if self.comms is not None:
+            # Its connection has ended, but its loop thread is still running
+            self.comms.stop()
         self.comms = CampaignClient(self, name)
         self.comms.start_client(addr)
 
-    def request_files(self, files_needed: list[str]):
-        self.comms.request_files(files_needed)
+    def fetch_files(self, files: dict[str, AssetInfo | None], urgent: bool = False):
+        self.missing_files.update(files)
+        self.comms.fetch_files(files, urgent)
+
+    # ==== Called by the client, on the Kivy thread ==== #
+
+    def on_session(self, established: bool):
+        self.screen.on_session(established)
+
+    def on_file_received(self, reference: str, received: bool):
+        if received:
+            self.missing_files.discard(reference)
+        self.screen.on_file_received(reference, received)
+
+        if self.awaited_location is not None:
+            location = self.campaign.locations[self.awaited_location]
+            if fetch_reference(location.map_file) == reference:
+                self.awaited_location = None
+                if received:
+                    self.change_map(location.name)
+
+    def on_fetch_progress(self, progress: FetchProgress):
+        self.screen.show_progress(progress)
+
+    def receive_delta(self, kind: int, body: memoryview):
+        """Apply a change to the campaign, in the order the server made them"""
+        if self.map is None:
+            self.held_deltas.append((kind, body))
+            return
+
+        if kind == INDEX:
+            self.receive_player_index(*decode_index(body))
+        elif kind == FOG:
+            self.receive_fog_change(*decode_fog_change(body))
+        elif kind == PARTY:
+            self.campaign.position = decode_party(body)
+            if self.awaited_location is None:
+                self.draw()
+        elif kind == LOCATION:
+            self.receive_location(*decode_location(body))
+
+    def receive_fog_change(self, name: str, change: str, tiles: list[list[int]]):
+        location = self.campaign.locations.get(name)
+        if location is None:
+            return
+
+        if change == "flip":
+            for tile in tiles:
+                location.apply({"type": "flip", "tile": tile})
+        else:
+            location.apply({"type": change, "tiles": tiles})
+
+        if location is self.campaign.current_location and self.awaited_location is None:
+            # Only the bands of fog with a changed tile are rebuilt
+            self.map.draw_tiles()
+
+    def receive_location(self, name: str, hidden: list[list[int]]):
+        """The party went to another location, whose fog comes along as it wasn't in the snapshot"""
+        location = self.campaign.get_location(name)
+        location.load_fog(hidden)
+
+        self.selected = None
+        if self.campaign.current_location.type != location.type:
+            self.populate_tiles(location)
+        self.campaign.current_location = location
+        self.change_map(location.name)
+
+    def apply_held_deltas(self):
+        (deltas, self.held_deltas) = (self.held_deltas, [])
+        for kind, body in deltas:
+            self.receive_delta(kind, body)
+
+    def on_snapshot(self, campaign_path: str):
+        """The campaign was sent again after a missed delta, show it as it is now"""
+        # Deltas still held are older than the snapshot
+        self.held_deltas.clear()
+        if self.map is None:
+            # Loaded by the screen once the first files arrive
+            return
+
+        self.map.clear_drawn()
+        self.campaign = Campaign()
+        self.campaign.load(campaign_path, self.map_layout)
+        self.map = self.campaign.current_location.location_map
+        self.party_tiles.clear()
+        self.party_bg = None
+        self.populate_tiles(self.campaign.current_location)
+        self.change_map(self.campaign.current_location.name)
+
+    @override
+    def change_map(self, name: str):
+        # The party got somewhere before its map arrived, get it ahead of the others
+        location = self.campaign.locations[name]
+        reference = fetch_reference(location.map_file)
+        if reference in self.missing_files:
+            print(f"Waiting for the map of {name}")
+            self.awaited_location = name
+            self.comms.fetch_files({reference: self.campaign.assets.get(location.map_file)}, urgent=True)
+            return
+
+        self.awaited_location = None
+        super().change_map(name)
 
     @override
     def on_click(self, layout: FloatLayout, event: MotionEvent):
@@ -5,6 +5,7 @@ from kivy.uix.screenmanager import Screen
 
 from dungeonfaster.gui.campaignView import CampaignView
 from dungeonfaster.gui.menuManager import MenuManager
+from dungeonfaster.model.autosave import Autosave
 
 
 class RunCampaignScreen(Screen):
@@ -27,10 +28,13 @@ class RunCampaignScreen(Screen):
         self.campaign_view.add_controls()
 
     def load(self, campaign_path: os.PathLike) -> None:
-        self.campaign_view.load(campaign_path)
+        self.campaign_view.load(campaign_path, journal=True)
         self.campaign_view.draw()
         self.campaign_view.populate_tiles(self.campaign_view.campaign.current_location)
 
+        self.campaign_view.autosave = Autosave(self.campaign_view.campaign)
+        self.campaign_view.autosave.start()
+
         self.campaign_view.start_server()
 
         # https://stackoverflow.com/questions/54501099/how-to-run-a-method-on-the-exit-of-a-kivy-app
@@ -38,4 +42,8 @@ class RunCampaignScreen(Screen):
 
     def stop_server(self, args):
         self.campaign_view.comms.stop()
+        if self.campaign_view.autosave is not None:
+            self.campaign_view.autosave.stop()
+        if self.campaign_view.campaign.journal is not None:
+            self.campaign_view.campaign.journal.close()
         return False
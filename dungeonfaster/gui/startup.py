@@ -0,0 +1,45 @@
+"""Time from launch to the first frame, reported once the app has drawn it
+
+Kept free of Kivy imports at module level so it can be imported before anything else is loaded.
+"""
+
+import os
+import time
+
+# Milliseconds from launch to the first frame above which the report flags startup as over budget
+STARTUP_BUDGET_MS = float(os.environ.get("DUNGEONFASTER_STARTUP_BUDGET", 1500))
+
+# (phase, time.perf_counter() at its end), starting with the launch itself
+_marks: list[tuple[str, float]] = []
+
+
+def mark(phase: str) -> None:
+    """Record the end of a startup phase, the first mark is the launch"""
+    _marks.append((phase, time.perf_counter()))
+
+
+def report() -> str:
+    if not _marks:
+        return "startup: not timed"
+
+    phases = []
+    previous = _marks[0][1]
+    for phase, at in _marks[1:]:
+        phases.append(f"{phase} {(at - previous) * 1000:.0f} ms")
+        previous = at
+
+    total = (previous - _marks[0][1]) * 1000
+    status = "over budget" if total > STARTUP_BUDGET_MS else "within budget"
+    return f"startup: {', '.join(phases)}; total {total:.0f} ms, {status} ({STARTUP_BUDGET_MS:.0f} ms)"
+
+
+def report_on_first_frame() -> None:
+    """Mark the first frame drawn by the window and print the report"""
+    from kivy.core.window import Window  # pylint: disable=import-outside-toplevel
+
+    def on_flip(*args):
+        Window.unbind(on_flip=on_flip)
+        mark("first frame")
+        print(report())
+
+    Window.bind(on_flip=on_flip)
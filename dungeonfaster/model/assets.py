@@ -0,0 +1,185 @@
+"""Content-addressed store for the files campaigns reference: maps, token images and icons
+
+Files added to the store are named after the SHA-256 digest of their content, under
+`campaigns/files/objects/<first two hex digits>/<digest><extension>`, and campaigns reference them by
+that path relative to `campaigns/files`. The extension is kept because image loaders pick a decoder
+from it. Adding the same content twice stores it once, and a reference never changes meaning: a file
+edited after being added becomes a new reference.
+
+Campaigns also save a manifest of the digest, size and MIME type of every file they reference, so a
+client can tell which files it is missing or holds a different version of, and check what it
+receives. Files referenced by plain name from before the store existed are described by hashing them.
+"""
+
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import zlib
+from typing import Any, NamedTuple
+
+CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
+CAMP_FILE_DIR = os.path.join(CAMPAIGNS_DIR, "files")
+
+OBJECTS_DIR = "objects"
+HASH_NAME = "sha256"
+DIGEST_LENGTH = 64
+READ_SIZE = 1 << 20
+
+
+class AssetInfo(NamedTuple):
+    digest: str
+    size: int
+    mime: str
+
+    def save(self) -> dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def load(cls, data: dict[str, Any]) -> "AssetInfo":
+        return cls(data["digest"], data["size"], data["mime"])
+
+
+# (path, mtime_ns, size) -> digest, files are only hashed again once they change
+_digests: dict[tuple[str, int, int], str] = {}
+
+
+def file_digest(path: str | os.PathLike) -> str:
+    """Hex SHA-256 digest of the content of a file"""
+    path = os.fspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    digest = _digests.get(key)
+    if digest is None:
+        hasher = hashlib.new(HASH_NAME)
+        with open(path, "rb") as source:
+            while chunk := source.read(READ_SIZE):
+                hasher.update(chunk)
+        digest = _digests[key] = hasher.hexdigest()
+
+    return digest
+
+
+# (path, mtime_ns, size, chunk size) -> CRC-32 of each chunk
+_chunk_checksums: dict[tuple[str, int, int, int], list[int]] = {}
+
+
+def chunk_checksums(path: str | os.PathLike, chunk_size: int) -> list[int]:
+    """CRC-32 of each chunk_size bytes of a file, the last chunk may be shorter"""
+    path = os.fspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size, chunk_size)
+    checksums = _chunk_checksums.get(key)
+    if checksums is None:
+        checksums = []
+        with open(path, "rb") as source:
+            while chunk := source.read(chunk_size):
+                checksums.append(zlib.crc32(chunk))
+        _chunk_checksums[key] = checksums
+
+    return checksums
+
+
+def mime_type(path: str) -> str:
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def reference_digest(reference: str) -> str | None:
+    """Digest a store reference is named after, None for files referenced by plain name"""
+    parts = reference.replace(os.sep, "/").split("/")
+    if len(parts) != 3 or parts[0] != OBJECTS_DIR:
+        return None
+
+    digest = os.path.splitext(parts[2])[0]
+    if len(digest) != DIGEST_LENGTH or not digest.startswith(parts[1]):
+        return None
+    return digest
+
+
+class AssetStore:
+    def __init__(self, files_dir: str | os.PathLike = CAMP_FILE_DIR):
+        self.files_dir = os.fspath(files_dir)
+
+    def path(self, reference: str) -> str:
+        """Local path of a referenced file"""
+        return os.path.join(self.files_dir, reference)
+
+    def add(self, source: str | os.PathLike) -> str:
+        """Copy a file into the store, unless the same content is already there
+
+        Returns:
+            str: Reference to the stored file, relative to the campaign files directory
+        """
+        source = os.fspath(source)
+        digest = file_digest(source)
+        extension = os.path.splitext(source)[1].lower()
+        reference = "/".join((OBJECTS_DIR, digest[:2], digest + extension))
+
+        destination = self.path(reference)
+        if not os.path.exists(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            # Copy then rename, the store never holds a partial file under a digest name
+            (handle, temp_path) = tempfile.mkstemp(dir=os.path.dirname(destination))
+            os.close(handle)
+            try:
+                shutil.copyfile(source, temp_path)
+                os.replace(temp_path, destination)
+            except BaseException:
+                os.remove(temp_path)
+                raise
+
+        return reference
+
+    def describe(self, reference: str) -> AssetInfo | None:
+        """Manifest entry of a referenced file, None if it isn't available locally"""
+        path = self.path(reference)
+        try:
+            size = os.stat(path).st_size
+        except OSError:
+            return None
+
+        # Store files are checked when they are added or received, only legacy files need hashing
+        digest = reference_digest(reference) or file_digest(path)
+        return AssetInfo(digest, size, mime_type(path))
+
+    def matches(self, reference: str, info: AssetInfo) -> bool:
+        """Is the local copy of a referenced file present and the version described by info?"""
+        path = self.path(reference)
+        try:
+            if os.stat(path).st_size != info.size:
+                return False
+        except OSError:
+            return False
+
+        # Store files were checked when written, their name is their digest
+        return (reference_digest(reference) or file_digest(path)) == info.digest
+
+    def manifest(self, references: list[str], known: dict[str, AssetInfo] | None = None) -> dict[str, AssetInfo]:
+        """Manifest entries of every available file in references
+
+        Args:
+            references (list[str]): References, relative to the campaign files directory
+            known (dict[str, AssetInfo] | None, optional): Entries of a previous manifest, reused for files
+                which are not available locally
+        """
+        known = known or {}
+        manifest = {}
+        for reference in references:
+            info = self.describe(reference) or known.get(reference)
+            if info is not None:
+                manifest[reference] = info
+        return manifest
+
+
+class ManifestSnapshot(NamedTuple):
+    """References of a campaign, described only when written so legacy files are hashed off the GUI thread"""
+
+    store: AssetStore
+    references: tuple[str, ...]
+    # Entries of the previous manifest, for files which are not available locally
+    known: dict[str, AssetInfo]
+
+    def save(self) -> dict[str, dict[str, Any]]:
+        manifest = self.store.manifest(list(self.references), self.known)
+        return {reference: info.save() for reference, info in manifest.items()}
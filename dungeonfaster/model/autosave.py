@@ -0,0 +1,159 @@
+import glob
+import os
+import queue
+import threading
+from collections.abc import Callable
+from datetime import datetime
+from typing import Any
+
+from kivy.clock import Clock
+
+from dungeonfaster.model.campaign import Campaign
+from dungeonfaster.model.campaignFile import BINARY_EXTENSION, write_campaign
+from dungeonfaster.model.catalog import record_save
+
+CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
+AUTOSAVE_DIR = os.path.join(CAMPAIGNS_DIR, "autosave")
+
+# Seconds between autosaves
+AUTOSAVE_INTERVAL = float(os.environ.get("DUNGEONFASTER_AUTOSAVE_INTERVAL", 120))
+# Autosaves kept per campaign, the oldest are deleted
+AUTOSAVE_KEEP = int(os.environ.get("DUNGEONFASTER_AUTOSAVE_KEEP", 5))
+
+
+class Autosave:
+    """Saves a campaign periodically without blocking the GUI
+
+    On the GUI thread only a snapshot is taken: new dictionaries for the campaign, its locations and party,
+    with each fog bitmap copied as immutable bytes. Encoding the snapshot and writing the file happen on a
+    worker thread, one save at a time. An autosave is skipped while the previous one is still waiting for
+    the worker, so a slow disk doesn't pile up snapshots. While started, it also writes the snapshots the
+    campaign takes when compacting its journal.
+    """
+
+    def __init__(
+        self,
+        campaign: Campaign,
+        directory: str | os.PathLike = AUTOSAVE_DIR,
+        interval: float = AUTOSAVE_INTERVAL,
+        keep: int = AUTOSAVE_KEEP,
+        extension: str = BINARY_EXTENSION,
+    ):
+        """
+        Args:
+            campaign (Campaign): Campaign to save
+            directory (str | os.PathLike, optional): Where autosaves are written
+            interval (float, optional): Seconds between autosaves, 0 to only save when asked
+            keep (int, optional): Number of autosaves of the campaign to keep, 0 to keep them all
+            extension (str, optional): File extension, which decides the format of the files
+        """
+        self.campaign = campaign
+        self.directory = directory
+        self.interval = interval
+        self.keep = keep
+        self.extension = extension
+
+        # Saves waiting for the worker, (path, data, prune, done) or None to stop it
+        self.requests: queue.Queue = queue.Queue()
+        self.autosave_pending = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.event = None
+        self.last_error: Exception | None = None
+
+    def start(self) -> None:
+        if self.thread is not None:
+            return
+
+        self.thread = threading.Thread(target=self._run, name="autosave", daemon=True)
+        self.thread.start()
+        self.campaign.snapshot_writer = self.write_snapshot
+        if self.interval > 0:
+            self.event = Clock.schedule_interval(self.autosave, self.interval)
+
+    def stop(self) -> None:
+        """Stop saving periodically, waiting for the save in progress and any pending one to be written"""
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+        if self.campaign.snapshot_writer == self.write_snapshot:
+            self.campaign.snapshot_writer = None
+        if self.thread is not None:
+            self.requests.put(None)
+            self.thread.join()
+            self.thread = None
+
+    def autosave(self, *args) -> str | None:
+        """Save the campaign as a new autosave file
+
+        Returns:
+            str | None: Path of the file which will be written, None if the previous autosave is still pending
+        """
+        if self.autosave_pending.is_set():
+            return None
+
+        stamp = datetime.now().strftime("%Y%m%dT-%H%M%S-%f")
+        path = os.path.join(self.directory, f"{self.campaign.name}-autosave-{stamp}{self.extension}")
+        self.autosave_pending.set()
+        self.save_to(path, prune=True)
+        return path
+
+    def save_to(self, path: str | os.PathLike, prune: bool = False) -> None:
+        """Snapshot the campaign now and write it to path in the background"""
+        self._request(path, self.campaign.save_data(snapshot=True), prune)
+
+    def write_snapshot(self, path: str | os.PathLike, data: dict[str, Any], done: Callable[[bool], None]) -> None:
+        """Write a snapshot already taken in the background, then call done with whether it was written"""
+        self._request(path, data, False, done)
+
+    def _request(
+        self, path: str | os.PathLike, data: dict, prune: bool, done: Callable[[bool], None] | None = None
+    ) -> None:
+        request = (path, data, prune, done)
+        if self.thread is None:
+            self._write(*request)
+        else:
+            self.requests.put(request)
+
+    def _run(self) -> None:
+        while True:
+            request = self.requests.get()
+            if request is None:
+                return
+            self._write(*request)
+
+    def _write(
+        self, path: str | os.PathLike, data: dict, prune: bool, done: Callable[[bool], None] | None = None
+    ) -> None:
+        if prune:
+            self.autosave_pending.clear()
+
+        written = False
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            write_campaign(path, data)
+            record_save(path, data)
+            written = True
+            if prune:
+                self.prune()
+        except OSError as error:
+            # Keep the session going, the next save may well succeed
+            self.last_error = error
+            print(f"Autosave to {path} failed: {error}")
+        finally:
+            if done is not None:
+                done(written)
+
+    def autosaves(self) -> list[str]:
+        """Autosave files of the campaign, oldest first"""
+        name = f"{glob.escape(self.campaign.name)}-autosave-*"
+        pattern = os.path.join(glob.escape(os.fspath(self.directory)), name)
+        return sorted(path for path in glob.glob(pattern) if path.endswith(self.extension))
+
+    def prune(self) -> None:
+        """Delete the oldest autosaves of the campaign beyond the number to keep"""
+        if self.keep <= 0:
+            return
+
+        for path in self.autosaves()[: -self.keep]:
+            os.remove(path)
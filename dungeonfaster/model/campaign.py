@@ -1,28 +1,88 @@
-import json
 import os
-from typing import Any
+from typing import TYPE_CHECKING, Any, NamedTuple
 
 from kivy.uix.widget import Widget
 
+from dungeonfaster.model.assets import AssetInfo, AssetStore, ManifestSnapshot, reference_digest
+from dungeonfaster.model.campaignFile import read_campaign, read_campaign_meta, write_campaign
+from dungeonfaster.model.catalog import record_save
+from dungeonfaster.model.journal import CampaignJournal
 from dungeonfaster.model.location import Location
 from dungeonfaster.model.player import Player
+from dungeonfaster.model.schema import SCHEMA_VERSION, encode_coordinate, parse_coordinate, upgrade
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
 FILES_PATH = "campaigns/files"
 
 
 class Campaign:
     path: str
-    current_location: Location
 
     def __init__(self):
+        # Changes are only recorded once a journal is opened, see open_journal
+        self.journal: CampaignJournal | None = None
+        # Sequence number of the last journal event included in the loaded file
+        self.journal_seq = 0
+        # Called with every change passed to record, journaled or not
+        self.on_change: Callable[[dict[str, Any]], None] | None = None
+        # Writes compacted snapshots off the GUI thread when set, see Autosave.write_snapshot
+        self.snapshot_writer: Callable[[str | os.PathLike, dict[str, Any], Callable[[bool], None]], None] | None = None
+        # A compacted snapshot is being written
+        self.compacting = False
+
         self.name: str | os.PathLike = ""
         self.save_path: str | os.PathLike = ""
-        self.position: tuple[int, int] = (0, 0)
+        self._position: tuple[int, int] = (0, 0)
+        self._current_location: Location | None = None
         self.locations: dict[str, Location] = {}
         self.party: list[Player] = []
+        # Digest, size and type of every referenced file, as last saved in full
+        self.assets: dict[str, AssetInfo] = {}
+
+    @property
+    def position(self) -> tuple[int, int]:
+        return self._position
+
+    @position.setter
+    def position(self, position: tuple[int, int]) -> None:
+        self._position = tuple(position)
+        self.record({"type": "party", "position": encode_coordinate(position)})
+
+    @property
+    def current_location(self) -> Location:
+        return self._current_location
+
+    @current_location.setter
+    def current_location(self, location: Location) -> None:
+        self._current_location = location
+        self.record({"type": "location", "location": location.name})
 
     def save(self, out_path: str | os.PathLike) -> None:
-        data_dict = {"name": self.name, "position": str(self.position), "current_location": self.current_location.name}
+        data = self.save_data()
+        # Binary if out_path has the binary extension, JSON otherwise
+        write_campaign(out_path, data)
+        record_save(out_path, data)
+
+    def save_data(self, snapshot: bool = False) -> dict[str, Any]:
+        """Get the campaign as stored in campaign files
+
+        Args:
+            snapshot (bool, optional): Only copy the fog of each map, as a FogSnapshot, and leave describing the
+                referenced files, as a ManifestSnapshot, so this is cheap enough to call on the GUI thread.
+                write_campaign converts the snapshots when writing.
+
+        Returns:
+            dict[str, Any]: New dictionaries and lists, which later changes to the campaign don't affect
+        """
+        data_dict = {
+            "version": SCHEMA_VERSION,
+            "name": self.name,
+            "position": encode_coordinate(self.position),
+            "current_location": self.current_location.name,
+            "journal_seq": self.journal.seq if self.journal is not None else self.journal_seq,
+        }
 
         party: list[dict] = []
         for player in self.party:
@@ -31,20 +91,47 @@ class Campaign:
 
         locations_dict = {}
         for name, location in self.locations.items():
-            locations_dict[name] = location.save()
+            locations_dict[name] = location.save(snapshot)
         data_dict["locations"] = locations_dict
 
-        json_data = json.dumps(data_dict, indent=4, separators=(",", ": "))
+        if snapshot:
+            # Legacy files may need hashing, which is left to the thread writing the snapshot
+            data_dict["assets"] = ManifestSnapshot(AssetStore(), tuple(self.references()), dict(self.assets))
+        else:
+            self.assets = AssetStore().manifest(self.references(), self.assets)
+            data_dict["assets"] = {reference: info.save() for reference, info in self.assets.items()}
+
+        return data_dict
 
-        with open(out_path, "w", encoding="utf-8") as out_file:
-            out_file.write(json_data)
+    def player_data(self) -> dict[str, Any]:
+        """Get the campaign as sent to players, cheap enough to call on the GUI thread
+
+        Players only see the fog of the party's current location, the fog of any other location is left out
+        until the party gets there.
+
+        Returns:
+            dict[str, Any]: As save_data(snapshot=True)
+        """
+        data_dict = self.save_data(snapshot=True)
+        for name, location_dict in data_dict["locations"].items():
+            grid = location_dict["map"].get("grid", {})
+            if name != self.current_location.name and "matrix" in grid:
+                # Maps which were never displayed share their dictionaries with the campaign
+                location_dict["map"] = dict(location_dict["map"], grid={k: v for k, v in grid.items() if k != "matrix"})
+
+        return data_dict
+
+    def references(self) -> list[str]:
+        """Files used by the campaign, relative to the campaign files directory"""
+        references = [location.map_file for location in self.locations.values() if location.map_file]
+        references += [player.image for player in self.party if player.image]
+        return list(dict.fromkeys(references))
 
     def load(self, load_path: str | os.PathLike, surface: Widget):
         self.path = load_path
 
-        with open(load_path, encoding="utf-8") as load_file:
-            string_data = load_file.read()
-            load_data = json.loads(string_data)
+        # Either format, older files are converted to the current layout
+        load_data = upgrade(read_campaign(load_path))
 
         for player_dict in load_data.get("party", {}):
             new_player: Player = Player()
@@ -52,12 +139,15 @@ class Campaign:
             self.party.append(new_player)
 
         self.name = load_data["name"]
-        self.position = eval(load_data["position"])
+        self.position = parse_coordinate(load_data["position"])
+        self.journal_seq = load_data.get("journal_seq", 0)
+        self.assets = {reference: AssetInfo.load(info) for reference, info in load_data.get("assets", {}).items()}
 
         # Load locations
         for name, location_data in load_data["locations"].items():
             self.locations[name] = Location(name, location_data)
             self.locations[name].load(surface)
+            self.locations[name].on_change = self.record
 
         self.current_location = self.get_location(load_data["current_location"])
 
@@ -74,24 +164,131 @@ class Campaign:
         player = next(player for player in self.party if player.name == player_name)
 
         player.position = pos
+        self.record({"type": "token", "player": player_name, "position": encode_coordinate(pos)})
 
-    def get_files(self, load_path: str) -> list[str]:
-        files: list[str] = []
+    # ==== Journal ==== #
 
-        with open(load_path, encoding="utf-8") as load_file:
-            string_data = load_file.read()
-            load_data: dict[str, Any] = json.loads(string_data)
+    def record(self, event: dict[str, Any]) -> None:
+        if self.on_change is not None:
+            self.on_change(event)
+        if self.journal is None:
+            return
 
-        for player_dict in load_data.get("party", {}):
-            image_file = player_dict.get("image", None)
-            if image_file and "/" in image_file:
-                image_file = image_file.split("/")[-1]
-            files.append(os.path.join(FILES_PATH, image_file))
-
-        for location_dict in load_data.get("locations", {}).values():
-            image_file = location_dict["map"]["map_file"]
-            if "/" in image_file:
-                image_file = image_file.split("/")[-1]
-            files.append(os.path.join(FILES_PATH, image_file))
-
-        return files
+        self.journal.append(event)
+        if self.journal.needs_compaction():
+            self.compact()
+
+    def apply(self, event: dict[str, Any]) -> None:
+        """Repeat a change passed to record"""
+        kind = event["type"]
+        if kind == "party":
+            self.position = parse_coordinate(event["position"])
+        elif kind == "location":
+            self.current_location = self.get_location(event["location"])
+        elif kind == "token":
+            self.set_player_pos(event["player"], parse_coordinate(event["position"]))
+        elif event.get("location") in self.locations:
+            self.locations[event["location"]].apply(event)
+
+    def open_journal(self) -> None:
+        """Bring the campaign up to date with the changes journaled since its file was written, then
+        journal every further change"""
+        journal = CampaignJournal(CampaignJournal.path_for(self.path))
+        for event in journal.read():
+            # Events up to journal_seq were already compacted into the file
+            if event["seq"] > self.journal_seq:
+                self.apply(event)
+
+        journal.seq = max(journal.seq, self.journal_seq)
+        self.journal = journal
+
+    def sync(self) -> None:
+        """Save the campaign to its own file, only writing the changes made since the last save"""
+        if self.journal is None:
+            self.save(self.path)
+            return
+
+        self.journal.sync()
+
+    def compact(self) -> None:
+        """Write a new snapshot of the whole campaign to its file and empty the journal
+
+        Only the snapshot is taken here, it is written by snapshot_writer if there is one. The journaled
+        events are kept in the rotated journal until it is, new events are journaled meanwhile.
+        """
+        if self.compacting:
+            return
+
+        data = self.save_data(snapshot=True)
+        self.journal.rotate()
+        self.journal_seq = self.journal.seq
+        self.compacting = True
+
+        if self.snapshot_writer is not None:
+            self.snapshot_writer(self.path, data, self._compacted)
+            return
+
+        # Written atomically, a crash leaves either the old or the new snapshot
+        write_campaign(self.path, data)
+        record_save(self.path, data)
+        self._compacted(True)
+
+    def _compacted(self, written: bool) -> None:
+        """Called once the snapshot of compact is written, or failed to be, from any thread"""
+        if written:
+            self.journal.discard_rotated()
+        self.compacting = False
+
+    def get_files(self, load_path: str) -> "CampaignFiles":
+        """Files a campaign file uses, relative to the campaign files directory, in the order they are needed
+
+        First come the map of the current location and the party's tokens, which are needed to show the
+        campaign at all. The other maps follow, nearest location first, counting the transitions and
+        parent links the party would go through to reach it.
+
+        Returns:
+            CampaignFiles: Manifest entry of each file, None if the campaign has none for it
+        """
+        load_data: dict[str, Any] = read_campaign_meta(load_path)
+        manifest = load_data.get("assets", {})
+        locations: dict[str, dict] = load_data.get("locations", {})
+
+        def entries(references: list[str]) -> dict[str, AssetInfo | None]:
+            files = {}
+            for reference in references:
+                info = manifest.get(reference)
+                files[fetch_reference(reference)] = AssetInfo.load(info) if info is not None else None
+            return files
+
+        current = load_data.get("current_location", "overworld")
+        first = [player_dict.get("image", None) or "party.png" for player_dict in load_data.get("party", {})]
+        if current in locations:
+            first.insert(0, locations[current]["map"]["map_file"])
+
+        # Breadth first from the current location
+        order = [current]
+        for name in order:
+            location_dict = locations.get(name, {})
+            linked = [location for _, location in location_dict.get("transitions", [])]
+            linked.append(location_dict.get("parent") or "overworld")
+            order += [location for location in linked if location in locations and location not in order]
+        order += [name for name in locations if name not in order]
+
+        first_files = entries(first)
+        rest_files = entries([locations[name]["map"]["map_file"] for name in order if name in locations])
+        return CampaignFiles(first_files, {ref: info for ref, info in rest_files.items() if ref not in first_files})
+
+
+def fetch_reference(reference: str) -> str:
+    """Reference a file is requested from the server by"""
+    if reference_digest(reference) is None:
+        # Files referenced by name are looked up by their base name
+        return reference.split("/")[-1]
+    return reference
+
+
+class CampaignFiles(NamedTuple):
+    # Needed to show the campaign
+    first: dict[str, AssetInfo | None]
+    # Needed once the party travels, nearest location first
+    rest: dict[str, AssetInfo | None]
@@ -0,0 +1,367 @@
+"""Reading and writing campaign files as JSON or in the compact binary format
+
+Binary files start with a header followed by a list of sections:
+
+    header:   magic b"DFCB", format version (u16), schema version (u16), section count (u32)
+    section:  kind (u8), payload length (u32), payload
+
+    META      The campaign as JSON (utf-8) without the fog matrices and walls stored in other sections
+    FOG       Location name, grid width and height, then the fog bitmap as run lengths of alternating
+              revealed and hidden tiles, starting with revealed, each an unsigned LEB128 varint
+    WALLS     Location name, polyline count, then per polyline its array typecode (int32, float32 or
+              float64, whichever is the smallest to hold every value exactly), value count and values
+
+Integers are big-endian and names are a u16 length followed by utf-8 bytes. Converting between the two
+formats is lossless: fog matrices which are not in the row by row order FogMatrix writes and walls
+which don't fit any array type are kept in the META section as they are.
+
+Files are written atomically: to a temporary file in the same directory which then replaces the old one,
+so a crash or a full disk never leaves a half written campaign.
+"""
+
+import json
+import os
+import struct
+import sys
+from array import array
+from typing import Any
+
+from dungeonfaster.model.assets import ManifestSnapshot
+from dungeonfaster.model.fog import FogSnapshot
+
+BINARY_EXTENSION = ".dfc"
+JSON_EXTENSION = ".json"
+EXTENSIONS = (JSON_EXTENSION, BINARY_EXTENSION)
+
+MAGIC = b"DFCB"
+FORMAT_VERSION = 1
+
+HEADER = struct.Struct("!4sHHI")
+SECTION = struct.Struct("!BI")
+
+META = 1
+FOG = 2
+WALLS = 3
+
+
+class CampaignFileError(ValueError):
+    """A campaign file is truncated or isn't a campaign file at all"""
+
+
+# ==== Primitive encoding ==== #
+
+
+def _pack_name(name: str) -> bytes:
+    encoded = name.encode("utf-8")
+    return struct.pack("!H", len(encoded)) + encoded
+
+
+def _unpack_name(payload: bytes, offset: int) -> tuple[str, int]:
+    (length,) = struct.unpack_from("!H", payload, offset)
+    offset += 2
+    return (payload[offset : offset + length].decode("utf-8"), offset + length)
+
+
+def _pack_varint(value: int, out: bytearray) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _unpack_varint(payload: bytes, offset: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = payload[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return (value, offset)
+        shift += 7
+
+
+def _array_bytes(values: array) -> bytes:
+    # Arrays are stored big-endian like every other integer in the file
+    if sys.byteorder == "little":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _array_from_bytes(typecode: str, data: bytes) -> array:
+    values = array(typecode)
+    values.frombytes(data)
+    if sys.byteorder == "little":
+        values.byteswap()
+    return values
+
+
+# ==== Fog ==== #
+
+
+def encode_fog(coordinates: list, width: int, height: int) -> bytes | None:
+    """Run-length encode a list of hidden [x, y] tiles
+
+    Returns:
+        bytes | None: None if the list can't be rebuilt exactly from a bitmap (out of range, duplicated
+        or out of order coordinates)
+    """
+    bits = bytearray(width * height)
+    last = -1
+    for coordinate in coordinates:
+        if len(coordinate) != 2 or not all(isinstance(value, int) for value in coordinate):
+            return None
+        (x, y) = coordinate
+        if not (0 <= x < width and 0 <= y < height):
+            return None
+        index = y * width + x
+        if index <= last:
+            return None
+        bits[index] = 1
+        last = index
+
+    return encode_fog_bits(bits)
+
+
+def encode_fog_bits(bits: bytes | bytearray) -> bytes:
+    """Run-length encode a fog bitmap, one byte (0 or 1) per tile"""
+    out = bytearray()
+    position = 0
+    value = 0
+    while position < len(bits):
+        # Find the end of the current run in C rather than byte by byte
+        end = bits.find(b"\x01" if value == 0 else b"\x00", position)
+        if end < 0:
+            end = len(bits)
+        _pack_varint(end - position, out)
+        position = end
+        value ^= 1
+
+    return bytes(out)
+
+
+def decode_fog(runs: bytes, width: int) -> list[list[int]]:
+    coordinates = []
+    offset = 0
+    position = 0
+    hidden = False
+    while offset < len(runs):
+        (length, offset) = _unpack_varint(runs, offset)
+        if hidden:
+            coordinates.extend([index % width, index // width] for index in range(position, position + length))
+        position += length
+        hidden = not hidden
+
+    return coordinates
+
+
+# ==== Walls ==== #
+
+
+def _wall_typecode(polyline: list) -> str | None:
+    """Smallest array type holding every value of polyline exactly, None if there is none"""
+    if all(type(value) is int for value in polyline):
+        return "i" if all(-(2**31) <= value < 2**31 for value in polyline) else None
+    if not all(type(value) is float for value in polyline):
+        # Mixing integers and floats, the integers would come back as floats
+        return None
+
+    try:
+        if array("f", polyline).tolist() == polyline:
+            return "f"
+    except OverflowError:
+        pass
+    return "d"
+
+
+def encode_walls(walls: list) -> bytes | None:
+    """Pack wall polylines (flat number lists) as typed arrays
+
+    Returns:
+        bytes | None: None if a value can't be stored exactly
+    """
+    out = bytearray(struct.pack("!I", len(walls)))
+    for polyline in walls:
+        typecode = _wall_typecode(polyline)
+        if typecode is None:
+            return None
+        values = array(typecode, polyline)
+        out += typecode.encode("ascii") + struct.pack("!I", len(values)) + _array_bytes(values)
+
+    return bytes(out)
+
+
+def decode_walls(payload: bytes, offset: int) -> list[list[float]]:
+    (count,) = struct.unpack_from("!I", payload, offset)
+    offset += 4
+
+    walls = []
+    for _ in range(count):
+        typecode = payload[offset : offset + 1].decode("ascii")
+        (length,) = struct.unpack_from("!I", payload, offset + 1)
+        offset += 5
+        size = array(typecode).itemsize * length
+        walls.append(_array_from_bytes(typecode, payload[offset : offset + size]).tolist())
+        offset += size
+
+    return walls
+
+
+# ==== Campaigns ==== #
+
+
+def dumps(data: dict) -> bytes:
+    """Encode a campaign (current schema version) in the binary format"""
+    # Copy only the dictionaries which sections are taken out of, data itself is left untouched
+    meta = dict(data)
+    meta["locations"] = {}
+    if isinstance(meta.get("assets"), ManifestSnapshot):
+        meta["assets"] = meta["assets"].save()
+    sections: list[tuple[int, bytes]] = []
+
+    for name, location in data.get("locations", {}).items():
+        location = dict(location)
+        meta["locations"][name] = location
+        map_data = location.get("map")
+        if not isinstance(map_data, dict):
+            continue
+        map_data = location["map"] = dict(map_data)
+        grid = map_data.get("grid")
+        if isinstance(grid, dict):
+            grid = map_data["grid"] = dict(grid)
+        else:
+            grid = {}
+
+        if isinstance(grid.get("matrix"), FogSnapshot):
+            # Straight from the bitmap, without building the coordinate list
+            fog = grid.pop("matrix")
+            header = _pack_name(name) + struct.pack("!II", fog.width, fog.height)
+            sections.append((FOG, header + encode_fog_bits(fog.bits)))
+        elif "matrix" in grid:
+            runs = encode_fog(grid["matrix"], int(grid["width"]), int(grid["height"]))
+            if runs is not None:
+                del grid["matrix"]
+                header = _pack_name(name) + struct.pack("!II", int(grid["width"]), int(grid["height"]))
+                sections.append((FOG, header + runs))
+
+        if "walls" in map_data:
+            packed = encode_walls(map_data["walls"])
+            if packed is not None:
+                del map_data["walls"]
+                sections.append((WALLS, _pack_name(name) + packed))
+
+    sections.insert(0, (META, json.dumps(meta, separators=(",", ":")).encode("utf-8")))
+
+    out = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, data.get("version", 0), len(sections)))
+    for kind, payload in sections:
+        out += SECTION.pack(kind, len(payload))
+        out += payload
+
+    return bytes(out)
+
+
+def _sections(blob: bytes):
+    if len(blob) < HEADER.size:
+        raise CampaignFileError("Campaign file is truncated")
+
+    (magic, format_version, _, count) = HEADER.unpack_from(blob, 0)
+    if magic != MAGIC:
+        raise CampaignFileError("Not a binary campaign file")
+    if format_version > FORMAT_VERSION:
+        raise CampaignFileError(f"Unsupported binary campaign format {format_version}")
+
+    offset = HEADER.size
+    for _ in range(count):
+        if offset + SECTION.size > len(blob):
+            raise CampaignFileError("Campaign file is truncated")
+        (kind, length) = SECTION.unpack_from(blob, offset)
+        offset += SECTION.size
+        if offset + length > len(blob):
+            raise CampaignFileError("Campaign file is truncated")
+        yield (kind, blob[offset : offset + length])
+        offset += length
+
+
+def loads(blob: bytes) -> dict:
+    """Decode a binary campaign into the same dictionary as its JSON equivalent"""
+    data: dict[str, Any] = {}
+    for kind, payload in _sections(blob):
+        if kind == META:
+            data = json.loads(payload.decode("utf-8"))
+            continue
+
+        (name, offset) = _unpack_name(payload, 0)
+        map_data = data["locations"][name].setdefault("map", {})
+        if kind == FOG:
+            (width, _) = struct.unpack_from("!II", payload, offset)
+            map_data.setdefault("grid", {})["matrix"] = decode_fog(payload[offset + 8 :], width)
+        elif kind == WALLS:
+            map_data["walls"] = decode_walls(payload, offset)
+        # Unknown sections are from newer writers and are skipped
+
+    return data
+
+
+def read_campaign(path: str | os.PathLike) -> dict:
+    """Load a campaign file in either format, detected from its content rather than its name"""
+    with open(path, "rb") as campaign_file:
+        blob = campaign_file.read()
+
+    if blob.startswith(MAGIC):
+        return loads(blob)
+    return json.loads(blob.decode("utf-8"))
+
+
+def read_campaign_meta(path: str | os.PathLike) -> dict:
+    """Load a campaign file, without the fog matrices and walls if it is binary so they aren't decoded"""
+    with open(path, "rb") as campaign_file:
+        head = campaign_file.read(HEADER.size + SECTION.size)
+        if not head.startswith(MAGIC):
+            return json.loads((head + campaign_file.read()).decode("utf-8"))
+
+        # dumps writes the META section first
+        if len(head) < HEADER.size + SECTION.size:
+            raise CampaignFileError("Campaign file is truncated")
+        (kind, length) = SECTION.unpack_from(head, HEADER.size)
+        payload = campaign_file.read(length)
+
+    if kind != META or len(payload) < length:
+        raise CampaignFileError("Campaign file has no META section")
+    return json.loads(payload.decode("utf-8"))
+
+
+def resolve_snapshots(data: dict) -> dict:
+    """Replace the FogSnapshot matrices and ManifestSnapshot of Campaign.save_data(snapshot=True), in place"""
+    if isinstance(data.get("assets"), ManifestSnapshot):
+        data["assets"] = data["assets"].save()
+    for location in data.get("locations", {}).values():
+        grid = (location.get("map") or {}).get("grid") or {}
+        if isinstance(grid.get("matrix"), FogSnapshot):
+            grid["matrix"] = grid["matrix"].save()
+
+    return data
+
+
+def write_campaign(path: str | os.PathLike, data: dict) -> None:
+    """Save a campaign, in the binary format if path ends with BINARY_EXTENSION and as JSON otherwise
+
+    data may hold FogSnapshot matrices and a ManifestSnapshot, see Campaign.save_data.
+    """
+    path = os.fspath(path)
+    if path.endswith(BINARY_EXTENSION):
+        blob = dumps(data)
+    else:
+        blob = json.dumps(resolve_snapshots(data), indent=4, separators=(",", ": ")).encode("utf-8")
+
+    temp_path = f"{path}.tmp"
+    try:
+        with open(temp_path, "wb") as out_file:
+            out_file.write(blob)
+            out_file.flush()
+            os.fsync(out_file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,143 @@
+import json
+import os
+import threading
+from typing import Any, NamedTuple
+
+from dungeonfaster.model.assets import reference_digest
+from dungeonfaster.model.campaignFile import EXTENSIONS, CampaignFileError, read_campaign_meta
+
+CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
+CAMP_FILE_DIR = os.path.join(CAMPAIGNS_DIR, "files")
+
+# Not one of the campaign EXTENSIONS so the index is never listed as a campaign
+INDEX_FILE = "catalog.index"
+INDEX_VERSION = 1
+
+# Saves can be written by the autosave thread while the GUI scans
+_lock = threading.Lock()
+
+
+class CatalogEntry(NamedTuple):
+    """Summary of a campaign file, enough to list it without loading it"""
+
+    file: str
+    mtime: float
+    size: int
+    name: str
+    locations: int
+    party: list[str]
+    thumbnail: str | None
+
+
+def summarize(file: str, stat: os.stat_result, data: dict[str, Any]) -> CatalogEntry:
+    """Summary of a campaign from its loaded (or about to be saved) data
+
+    The thumbnail is the map image of the campaign's current location.
+    """
+    locations = data.get("locations", {})
+    current = locations.get(data.get("current_location"), {})
+    map_file = (current.get("map") or {}).get("map_file")
+    if map_file and reference_digest(map_file) is None:
+        map_file = os.path.basename(map_file)
+
+    return CatalogEntry(
+        file=file,
+        mtime=stat.st_mtime,
+        size=stat.st_size,
+        name=data.get("name", ""),
+        locations=len(locations),
+        party=[player.get("name", "") for player in data.get("party", [])],
+        thumbnail=os.path.join(CAMP_FILE_DIR, map_file) if map_file else None,
+    )
+
+
+class CampaignCatalog:
+    """Persistent index of the campaign files of a directory
+
+    Entries are stored in INDEX_FILE, keyed by file name together with the file's mtime and size. Listing
+    the directory only reads the campaign files which were added or changed since the index was written,
+    and saves through Campaign.save update their entry as they are written.
+    """
+
+    def __init__(self, directory: str | os.PathLike = CAMPAIGNS_DIR):
+        self.directory = os.fspath(directory)
+        self.index_path = os.path.join(self.directory, INDEX_FILE)
+
+    def _read_index(self) -> dict[str, CatalogEntry]:
+        try:
+            with open(self.index_path, encoding="utf-8") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            return {}
+
+        if not isinstance(index, dict) or index.get("version") != INDEX_VERSION:
+            return {}
+
+        entries = {}
+        for fields in index.get("entries", []):
+            try:
+                entry = CatalogEntry(**fields)
+            except TypeError:
+                continue
+            entries[entry.file] = entry
+        return entries
+
+    def _write_index(self, entries: dict[str, CatalogEntry]) -> None:
+        index = {"version": INDEX_VERSION, "entries": [entry._asdict() for entry in entries.values()]}
+        temp_path = f"{self.index_path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as index_file:
+                json.dump(index, index_file, separators=(",", ":"))
+            os.replace(temp_path, self.index_path)
+        except OSError:
+            # Only a cache, the next scan reads the files again
+            pass
+
+    def entries(self) -> list[CatalogEntry]:
+        """List every campaign file of the directory, newest first
+
+        Files which can't be read are left out.
+        """
+        with _lock:
+            index = self._read_index()
+            entries: dict[str, CatalogEntry] = {}
+            changed = False
+
+            with os.scandir(self.directory) as scan:
+                for dir_entry in scan:
+                    if not dir_entry.name.endswith(EXTENSIONS) or not dir_entry.is_file():
+                        continue
+
+                    stat = dir_entry.stat()
+                    entry = index.get(dir_entry.name)
+                    if entry is None or (entry.mtime, entry.size) != (stat.st_mtime, stat.st_size):
+                        changed = True
+                        try:
+                            entry = summarize(dir_entry.name, stat, read_campaign_meta(dir_entry.path))
+                        except (OSError, ValueError, CampaignFileError, AttributeError):
+                            continue
+                    entries[dir_entry.name] = entry
+
+            if changed or len(entries) != len(index):
+                self._write_index(entries)
+
+        return sorted(entries.values(), key=lambda entry: entry.mtime, reverse=True)
+
+    def record(self, path: str | os.PathLike, data: dict[str, Any]) -> None:
+        """Update the entry of a campaign file which was just written with data"""
+        path = os.fspath(path)
+        if os.path.dirname(os.path.abspath(path)) != os.path.abspath(self.directory):
+            return
+        if not path.endswith(EXTENSIONS):
+            return
+
+        with _lock:
+            entries = self._read_index()
+            file = os.path.basename(path)
+            entries[file] = summarize(file, os.stat(path), data)
+            self._write_index(entries)
+
+
+def record_save(path: str | os.PathLike, data: dict[str, Any]) -> None:
+    """Keep the catalog of the campaigns directory up to date after writing a campaign file"""
+    CampaignCatalog().record(path, data)
@@ -1,7 +1,7 @@
 import os
-import shutil
 from typing import Any
 
+from dungeonfaster.model.assets import AssetStore
 from dungeonfaster.model.entity.entity import Entity
 
 TOOLS_IMG_DIR = os.path.expanduser("~/Documents/5e.tools/5etools-src/img")
@@ -53,6 +53,5 @@ class NPC(Entity):
         source = data.get("source")
         if source:
             bestiary_file = os.path.join(TOOLS_IMG_DIR, source, f"{self.name}.webp")
-            campaign_file = os.path.join(CAMP_FILE_DIR, f"{self.name}.webp")
-            shutil.copyfile(bestiary_file, campaign_file)
-            self.icon = campaign_file
+            store = AssetStore(CAMP_FILE_DIR)
+            self.icon = store.path(store.add(bestiary_file))
@@ -0,0 +1,176 @@
+from collections.abc import Iterable, Iterator
+from itertools import compress
+from typing import NamedTuple
+
+HIDDEN = 1
+REVEALED = 0
+
+# Translation table swapping hidden <-> revealed for every byte of the bitmap in one pass
+_INVERT_TABLE = bytes([HIDDEN, REVEALED]) + bytes(range(2, 256))
+
+
+def _hidden_coordinates(bits: bytes | bytearray, width: int) -> list[list[int]]:
+    return [[index % width, index // width] for index in compress(range(len(bits)), bits)]
+
+
+class FogSnapshot(NamedTuple):
+    """Immutable copy of a FogMatrix, safe to serialize from another thread while the original changes"""
+
+    width: int
+    height: int
+    bits: bytes
+
+    def save(self) -> list[list[int]]:
+        return _hidden_coordinates(self.bits, self.width)
+
+
+class FogMatrix:
+    """Dense bitmap of hidden tiles for a grid of `width` x `height` tiles
+
+    Each tile is one byte of a `bytearray` stored row by row (index = y * width + x), so lookups and
+    flips are O(1) and whole-map operations run as single C-level bytearray operations. version is
+    bumped by every change, so caches built from the fog can tell they are stale without comparing it.
+    """
+
+    def __init__(self, width: int = 0, height: int = 0):
+        self.width = max(0, int(width))
+        self.height = max(0, int(height))
+        self.bits = bytearray(self.width * self.height)
+        self.version = 0
+
+    def __contains__(self, coordinate: tuple[int, int]) -> bool:
+        return self.hidden(*coordinate)
+
+    def __iter__(self) -> Iterator[tuple[int, int]]:
+        width = self.width
+        for index in compress(range(len(self.bits)), self.bits):
+            yield (index % width, index // width)
+
+    def __len__(self) -> int:
+        return self.bits.count(HIDDEN)
+
+    def in_range(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def hidden(self, x: int, y: int) -> bool:
+        if not self.in_range(x, y):
+            return False
+        return self.bits[y * self.width + x] == HIDDEN
+
+    def revealed(self, x: int, y: int) -> bool:
+        return not self.hidden(x, y)
+
+    def hide(self, x: int, y: int) -> bool:
+        """Hide the tile at x, y
+
+        Returns:
+            bool: True if the tile changed state
+        """
+        return self._set(x, y, HIDDEN)
+
+    def reveal(self, x: int, y: int) -> bool:
+        """Reveal the tile at x, y
+
+        Returns:
+            bool: True if the tile changed state
+        """
+        return self._set(x, y, REVEALED)
+
+    def flip(self, x: int, y: int) -> bool:
+        """Invert the state of the tile at x, y
+
+        Returns:
+            bool: True if the tile is now hidden, False if it is now revealed or out of range
+        """
+        if not self.in_range(x, y):
+            return False
+
+        index = y * self.width + x
+        self.bits[index] ^= HIDDEN
+        self.version += 1
+        return self.bits[index] == HIDDEN
+
+    def _set(self, x: int, y: int, value: int) -> bool:
+        if not self.in_range(x, y):
+            return False
+
+        index = y * self.width + x
+        changed = self.bits[index] != value
+        if changed:
+            self.bits[index] = value
+            self.version += 1
+        return changed
+
+    # ==== Bulk operations ==== #
+
+    def hide_all(self) -> None:
+        self.bits[:] = bytes([HIDDEN]) * len(self.bits)
+        self.version += 1
+
+    def reveal_all(self) -> None:
+        self.bits[:] = bytes(len(self.bits))
+        self.version += 1
+
+    def invert(self) -> None:
+        self.bits[:] = self.bits.translate(_INVERT_TABLE)
+        self.version += 1
+
+    def hide_many(self, coordinates: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+        """Hide every tile in coordinates
+
+        Returns:
+            list[tuple[int, int]]: Coordinates which changed state
+        """
+        return [(x, y) for x, y in coordinates if self._set(x, y, HIDDEN)]
+
+    def reveal_many(self, coordinates: Iterable[tuple[int, int]]) -> list[tuple[int, int]]:
+        """Reveal every tile in coordinates
+
+        Returns:
+            list[tuple[int, int]]: Coordinates which changed state
+        """
+        return [(x, y) for x, y in coordinates if self._set(x, y, REVEALED)]
+
+    def row(self, y: int) -> bytearray:
+        """Get a copy of row y of the bitmap, one byte per tile"""
+        return self.bits[y * self.width : (y + 1) * self.width]
+
+    def resize(self, width: int, height: int) -> None:
+        """Change the dimensions of the bitmap, keeping the state of tiles which are still in range"""
+        width = max(0, int(width))
+        height = max(0, int(height))
+        if (width, height) == (self.width, self.height):
+            return
+
+        bits = bytearray(width * height)
+        copy_width = min(width, self.width)
+        for y in range(min(height, self.height)):
+            bits[y * width : y * width + copy_width] = self.bits[y * self.width : y * self.width + copy_width]
+
+        self.width = width
+        self.height = height
+        self.bits = bits
+        self.version += 1
+
+    def snapshot(self) -> FogSnapshot:
+        """Copy the bitmap as it is now, a single memcpy"""
+        return FogSnapshot(self.width, self.height, bytes(self.bits))
+
+    def copy(self) -> "FogMatrix":
+        fog = FogMatrix()
+        fog.width = self.width
+        fog.height = self.height
+        fog.bits = bytearray(self.bits)
+        fog.version = self.version
+        return fog
+
+    # ==== Serialization ==== #
+
+    def save(self) -> list[list[int]]:
+        """List of [x, y] pairs of hidden tiles, as previously stored in campaign files"""
+        return _hidden_coordinates(self.bits, self.width)
+
+    def load(self, coordinates: Iterable[Iterable[int]]) -> None:
+        self.reveal_all()
+        for x, y in coordinates:
+            self._set(int(x), int(y), HIDDEN)
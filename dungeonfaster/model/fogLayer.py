@@ -0,0 +1,164 @@
+from kivy.core.image import Image as CoreImage
+from kivy.graphics import InstructionGroup, Mesh, PopMatrix, PushMatrix, Scale, Translate
+
+from dungeonfaster.model.grid import Grid
+
+# Mesh indices are unsigned shorts, so one mesh can hold at most 65536 / 4 quads
+MAX_QUADS = 65536 // 4
+
+QUAD_FLOATS = 16
+QUAD_INDICES = (0, 1, 2, 2, 3, 0)
+
+
+class FogChunk:
+    """One Mesh holding a quad for every hidden tile within a band of grid rows
+
+    Quads are kept in slots so that a tile changing state only rewrites its own 16 floats. Slots of
+    revealed tiles are collapsed to zero-area quads and reused by the next tile hidden in the band.
+    """
+
+    def __init__(self, rows: range, texture):
+        self.rows = rows
+        self.slots: dict[tuple[int, int], int] = {}
+        self.free_slots: list[int] = []
+        self.vertices: list[float] = []
+        self.indices: list[int] = []
+        self.mesh = Mesh(mode="triangles", texture=texture)
+        self.dirty = False
+
+    def add(self, tile: tuple[int, int], quad: list[float]) -> None:
+        if tile in self.slots:
+            return
+
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.vertices[slot * QUAD_FLOATS : (slot + 1) * QUAD_FLOATS] = quad
+        else:
+            slot = len(self.vertices) // QUAD_FLOATS
+            self.vertices.extend(quad)
+            self.indices.extend(4 * slot + index for index in QUAD_INDICES)
+
+        self.slots[tile] = slot
+        self.dirty = True
+
+    def remove(self, tile: tuple[int, int]) -> None:
+        slot = self.slots.pop(tile, None)
+        if slot is None:
+            return
+
+        self.vertices[slot * QUAD_FLOATS : (slot + 1) * QUAD_FLOATS] = [0.0] * QUAD_FLOATS
+        self.free_slots.append(slot)
+        self.dirty = True
+
+    def flush(self) -> None:
+        if not self.dirty:
+            return
+
+        self.mesh.vertices = self.vertices
+        self.mesh.indices = self.indices
+        self.dirty = False
+
+
+class FogLayer:
+    """Batched drawing of the hidden tiles of a grid
+
+    Quads are built once in map (image) pixel coordinates, panning and zooming only change the
+    Translate and Scale applied to the whole layer. Tiles are grouped into row bands with one Mesh
+    each, bands outside the display window are left off the canvas.
+    """
+
+    def __init__(self, grid: Grid):
+        self.grid = grid
+        self.canvas = None
+
+        self.texture = CoreImage(grid.hidden_image_path).texture
+        self.tex_coords = self.texture.tex_coords
+
+        self.translate = Translate(0, 0)
+        self.scale = Scale(1, 1, 1)
+        self.chunk_group = InstructionGroup()
+        self.group = InstructionGroup()
+        self.group.add(PushMatrix())
+        self.group.add(self.translate)
+        self.group.add(self.scale)
+        self.group.add(self.chunk_group)
+        self.group.add(PopMatrix())
+
+        self.geometry: tuple = ()
+        self.rows_per_chunk = 1
+        self.chunks: list[FogChunk] = []
+        self.shown_chunks: set[int] = set()
+
+        self.build()
+
+    def build(self) -> None:
+        """(Re-)create every chunk from the grid's fog bitmap"""
+        self.geometry = self.grid.geometry()
+        self.rows_per_chunk = max(1, MAX_QUADS // max(1, self.grid.x))
+
+        self.chunk_group.clear()
+        self.shown_chunks = set()
+        self.chunks = [
+            FogChunk(range(start, min(start + self.rows_per_chunk, self.grid.y)), self.texture)
+            for start in range(0, self.grid.y, self.rows_per_chunk)
+        ]
+
+        # Position every hidden tile in one batch
+        hidden = list(self.grid.matrix)
+        xs = [x for x, _ in hidden]
+        ys = [y for _, y in hidden]
+        (mxs, mys) = self.grid.map_pos_from_indices(xs, ys)
+        for x, y, mx, my in zip(xs, ys, mxs, mys, strict=True):
+            self.chunks[y // self.rows_per_chunk].add((x, y), self.quad(mx, my))
+
+    def quad(self, mx: float, my: float) -> list[float]:
+        (width, height) = self.grid.map_tile_size()
+        (u0, v0, u1, v1, u2, v2, u3, v3) = self.tex_coords
+
+        right = mx + width
+        top = my + height
+
+        return [mx, my, u0, v0, right, my, u1, v1, right, top, u2, v2, mx, top, u3, v3]
+
+    def set_tile(self, x: int, y: int, hidden: bool) -> None:
+        if not 0 <= y < self.grid.y:
+            return
+
+        chunk = self.chunks[y // self.rows_per_chunk]
+        if hidden:
+            chunk.add((x, y), self.quad(*self.grid.map_pos_from_index(x, y)))
+        else:
+            chunk.remove((x, y))
+
+    def draw(self, canvas) -> None:
+        if self.canvas is not canvas:
+            canvas.add(self.group)
+            self.canvas = canvas
+
+        # Quads are positioned in map pixels, so they only go stale when the grid itself is adjusted
+        if self.geometry != self.grid.geometry():
+            self.build()
+
+        window = self.grid.window
+        (sx, sy) = window.surface.pos
+        self.translate.xy = (sx - window.x, sy - window.y)
+        self.scale.x = 1 / window.zoom
+        self.scale.y = 1 / window.zoom
+
+        # Only bands of rows which overlap the display window are drawn
+        (_, y_range) = self.grid.visible_range()
+        for index, chunk in enumerate(self.chunks):
+            showing = chunk.rows.start < y_range.stop and y_range.start < chunk.rows.stop
+            if showing:
+                chunk.flush()
+                if index not in self.shown_chunks:
+                    self.chunk_group.add(chunk.mesh)
+                    self.shown_chunks.add(index)
+            elif index in self.shown_chunks:
+                self.chunk_group.remove(chunk.mesh)
+                self.shown_chunks.remove(index)
+
+    def detach(self) -> None:
+        if self.canvas is not None and self.group in self.canvas.children:
+            self.canvas.remove(self.group)
+        self.canvas = None
@@ -1,10 +1,14 @@
 import math
 import os
 from abc import ABC, abstractmethod
+from array import array
+from collections.abc import Sequence
 
 from kivy.graphics import Rectangle
 from kivy.uix.image import Image
 
+from dungeonfaster.model import hexmath
+from dungeonfaster.model.fog import FogMatrix
 from dungeonfaster.model.window import Window
 
 RESOURCES_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "resources")
@@ -14,6 +18,9 @@ class Grid(ABC):
     x: int
     y: int
 
+    # Maximum number of neighbours of a tile
+    NEIGHBORS: int
+
     def __init__(self, window: Window):
         self.pixel_density: float = 60.0
         self.tile_size: tuple[float, float] = (self.pixel_density, self.pixel_density)
@@ -27,14 +34,21 @@ class Grid(ABC):
         self.x_offset = 0
         self.y_offset = 0
 
-        self.matrix: list[tuple[int, int]] = []
+        # Bitmap of hidden tiles, sized to x * y whenever the grid dimensions change
+        self.matrix: FogMatrix = FogMatrix()
         self.highlight_image_path = None
         self.hidden_image_path = None
 
-        # Matrix of None or Rectangle for tiles to be drawn
-        self.image_matrix: dict[tuple[int, int], Rectangle] = {}
+        # Bounds-checked neighbours of every tile, see neighbor_table()
+        self._neighbors: array | None = None
+        self._neighbors_size: tuple[int, int] = (0, 0)
+
+    def save(self, snapshot: bool = False) -> dict:
+        """Get the grid as stored in campaign files
 
-    def save(self) -> dict:
+        Args:
+            snapshot (bool, optional): Leave the fog as a FogSnapshot for the caller to convert later
+        """
         save_data = {
             "width": self.x,
             "height": self.y,
@@ -43,7 +57,7 @@ class Grid(ABC):
             "x_margin": self.x_margin,
             "y_margin": self.y_margin,
             "pixel_density": self.pixel_density,
-            "matrix": self.matrix,
+            "matrix": self.matrix.snapshot() if snapshot else self.matrix.save(),
         }
 
         return save_data
@@ -57,14 +71,10 @@ class Grid(ABC):
         self.y_margin = json_data["y_margin"]
         self.pixel_density = json_data["pixel_density"]
 
-        self.scale_tiles()
+        self.matrix.resize(self.x, self.y)
+        self.matrix.load(json_data.get("matrix", []))
 
-        for coordinate in self.matrix:
-            self.image_matrix[coordinate] = Rectangle(
-                source=self.hidden_image_path,
-                pos=self.tile_pos_from_index(*coordinate),
-                size=self.tile_size,
-            )
+        self.scale_tiles()
 
     def get_rect(self, x: int, y: int, source=None) -> Rectangle:
         if source is None:
@@ -84,11 +94,6 @@ class Grid(ABC):
         rect.pos = self.tile_pos_from_index(x, y)
         rect.size = self.tile_size
 
-    def update_tile(self, x: int, y: int):
-        tile = self.image_matrix.get((x, y), None)
-        if tile:
-            self.update_rect(tile, x, y)
-
     def tile_at_index(self, source: str, i: int, j: int):
         Image(
             source=source,
@@ -96,7 +101,7 @@ class Grid(ABC):
             pos=self.tile_pos_from_index(i, j),
         )
 
-    def flip_tile(self, x: int, y: int) -> Rectangle:
+    def flip_tile(self, x: int, y: int) -> bool:
         """Invert the value of the grid tile at position x, y
 
         Args:
@@ -104,31 +109,43 @@ class Grid(ABC):
             y (int): Target tile y coordinate
 
         Returns:
-            Rectangle: Flipped tile image to be added or removed from caller's tracking list
+            bool: True if the tile is now hidden, False if it is now revealed or is outside the grid
         """
+        return self.matrix.flip(x, y)
 
-        tile = self.image_matrix.get((x, y), None)
+    def _index_range(self, low: float, high: float, size: int, guard: int) -> range:
+        return range(max(0, math.floor(low) - guard), min(size, math.ceil(high) + guard + 1))
 
-        if (x, y) in self.matrix:
-            if tile in self.window.surface.canvas.children:
-                self.window.surface.canvas.remove(tile)
-            self.matrix.remove((x, y))
-            self.image_matrix.pop((x, y), None)
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.x and 0 <= y < self.y
 
-        else:
-            self.matrix.append((x, y))
-            tile = Rectangle(
-                source=self.hidden_image_path,
-                pos=self.tile_pos_from_index(x, y),
-                size=self.tile_size,
-            )
-            self.image_matrix[(x, y)] = tile
+    def neighbor_table(self) -> array:
+        """Flat table of the linear indices (y * width + x) of the neighbours of every tile
 
-        return tile
-
-    # ==== Override methods ==== #
+        Tile (x, y) owns entries [NEIGHBORS * (y * width + x), NEIGHBORS * (y * width + x + 1)), with -1
+        for neighbours outside the grid. The table is built once per grid size, a row and neighbour
+        direction at a time.
+        """
+        if self._neighbors is None or self._neighbors_size != (self.x, self.y):
+            (width, height) = (self.x, self.y)
+            count = self.NEIGHBORS
+            table = array("i", [-1]) * (width * height * count)
+            for y in range(height):
+                row = y * width
+                for k, (dx, ny) in enumerate(self.neighbor_offsets(0, y)):
+                    x_start = max(0, -dx)
+                    x_stop = min(width, width - dx)
+                    if not 0 <= ny < height or x_start >= x_stop:
+                        continue
+                    table[(row + x_start) * count + k : (row + x_stop) * count : count] = array(
+                        "i", range(ny * width + x_start + dx, ny * width + x_stop + dx)
+                    )
+
+            self._neighbors = table
+            self._neighbors_size = (self.x, self.y)
+
+        return self._neighbors
 
-    @abstractmethod
     def adjacent(self, x: int, y: int) -> list[tuple[int, int]]:
         """For the given x, y index, return a list of indices that are directly adjacent to the given
         index within the matrix
@@ -140,11 +157,94 @@ class Grid(ABC):
         Returns:
             list[tuple[int, int]]: List of indices within the matrix adjacent to the given
         """
+        if not self.in_bounds(x, y):
+            return [(nx, ny) for nx, ny in self.neighbor_offsets(x, y) if self.in_bounds(nx, ny)]
+
+        table = self.neighbor_table()
+        width = self.x
+        base = (y * width + x) * self.NEIGHBORS
+        return [(index % width, index // width) for index in table[base : base + self.NEIGHBORS] if index >= 0]
+
+    # ==== Override methods ==== #
+
+    @abstractmethod
+    def neighbor_offsets(self, x: int, y: int) -> list[tuple[int, int]]:
+        """Indices of the tiles directly adjacent to (x, y), without checking the grid's bounds
+
+        The offsets from (x, y) may depend on the row but must be the same for every tile of a row.
+        """
+
+    @abstractmethod
+    def distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        """Number of moves between adjacent tiles it takes to get from tile a to tile b"""
+
+    @abstractmethod
+    def within_radius(self, x: int, y: int, radius: int) -> list[tuple[int, int]]:
+        """Get every tile of the grid within radius moves of (x, y), including (x, y) itself
+
+        Args:
+            x (int): Coordinate on the x axis
+            y (int): Coordinate on the y axis
+            radius (int): Maximum distance in tiles
+
+        Returns:
+            list[tuple[int, int]]: Indices within the grid
+        """
+
+    @abstractmethod
+    def ring(self, x: int, y: int, radius: int) -> list[tuple[int, int]]:
+        """Get every tile of the grid at exactly radius moves from (x, y)"""
 
     @abstractmethod
     def scale_tiles(self):
         pass
 
+    def visible_range(self, guard: int = 1) -> tuple[range, range]:
+        """Get the ranges of x and y indices of tiles which can be seen within the display surface
+
+        Args:
+            guard (int, optional): Number of extra tiles to include past each edge of the surface. Defaults to 1.
+
+        Returns:
+            tuple[range, range]: Visible x indices and visible y indices, clamped to the grid
+        """
+        (width, height) = self.window.surface.size
+        zoom = self.window.zoom
+        return self.map_index_range(
+            self.window.x * zoom,
+            self.window.y * zoom,
+            (self.window.x + width) * zoom,
+            (self.window.y + height) * zoom,
+            guard,
+        )
+
+    def geometry(self) -> tuple:
+        """Everything which affects where tiles are placed on the map, compare to detect grid adjustments"""
+        return (self.x, self.y, self.x_offset, self.y_offset, self.x_margin, self.y_margin, self.pixel_density)
+
+    def map_center_from_index(self, i: int, j: int) -> tuple[float, float]:
+        """Center of the tile at index (i, j) in map (source image) pixels"""
+        (mx, my) = self.map_pos_from_index(i, j)
+        (width, height) = self.map_tile_size()
+        return (mx + width / 2, my + height / 2)
+
+    @abstractmethod
+    def map_index_range(
+        self, left: float, bottom: float, right: float, top: float, guard: int = 1
+    ) -> tuple[range, range]:
+        """Get the ranges of x and y indices of tiles which may overlap a rectangle of the map
+
+        Args:
+            left (float): Left edge of the rectangle in map (source image) pixels
+            bottom (float): Bottom edge of the rectangle in map pixels
+            right (float): Right edge of the rectangle in map pixels
+            top (float): Top edge of the rectangle in map pixels
+            guard (int, optional): Number of extra tiles to include past each edge. Defaults to 1.
+
+        Returns:
+            tuple[range, range]: x indices and y indices, clamped to the grid
+        """
+
     @abstractmethod
     def update(self, width, height):
         """
@@ -153,18 +253,54 @@ class Grid(ABC):
         """
 
     @abstractmethod
-    def tile_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
-        """_summary_
+    def map_tile_size(self) -> tuple[float, float]:
+        """Size of a tile image in map (source image) pixels, independent of zoom"""
+
+    @abstractmethod
+    def map_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
+        """Get the position of the tile at index (i, j) in map (source image) pixels, independent of the
+        display window
 
         Args:
-            i (int): _description_
-            j (int): _description_
+            i (int): x coordinate of tile
+            j (int): y coordinate of tile
 
         Returns:
-            tuple[float, float]: _description_
+            tuple[float, float]: Position of the tile's lower left corner within the map image
         """
 
     @abstractmethod
+    def map_pos_from_indices(self, xs: Sequence[int], ys: Sequence[int]) -> tuple[list[float], list[float]]:
+        """Batch version of map_pos_from_index
+
+        Args:
+            xs (Sequence[int]): x coordinates of tiles
+            ys (Sequence[int]): y coordinates of tiles, same length as xs
+
+        Returns:
+            tuple[list[float], list[float]]: x and y positions of each tile within the map image
+        """
+
+    def tile_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
+        """Get the position of the tile at index (i, j) on the canvas, for drawing on the display surface
+
+        Args:
+            i (int): x coordinate of tile
+            j (int): y coordinate of tile
+
+        Returns:
+            tuple[float, float]: Canvas position of the tile's lower left corner
+        """
+        (sx, sy) = self.window.surface.pos
+        (px, py) = self.index_to_pixel(i, j)
+        return (sx + px, sy + py)
+
+    def tile_pos_from_indices(self, xs: Sequence[int], ys: Sequence[int]) -> tuple[list[float], list[float]]:
+        """Batch version of tile_pos_from_index"""
+        (sx, sy) = self.window.surface.pos
+        (pxs, pys) = self.index_to_pixels(xs, ys)
+        return ([sx + px for px in pxs], [sy + py for py in pys])
+
     def index_to_pixel(self, x: int, y: int) -> tuple[float, float]:
         """Get the x and y pixel offsets relative to display surface of the tile at index position (x, y)
 
@@ -175,6 +311,15 @@ class Grid(ABC):
         Returns:
             tuple[int, int]: Position of the tile in x, y pixels relative to display surface
         """
+        (mx, my) = self.map_pos_from_index(x, y)
+        return (mx / self.window.zoom - self.window.x, my / self.window.zoom - self.window.y)
+
+    def index_to_pixels(self, xs: Sequence[int], ys: Sequence[int]) -> tuple[list[float], list[float]]:
+        """Batch version of index_to_pixel"""
+        (mxs, mys) = self.map_pos_from_indices(xs, ys)
+        scale = 1 / self.window.zoom
+        (wx, wy) = (self.window.x, self.window.y)
+        return ([mx * scale - wx for mx in mxs], [my * scale - wy for my in mys])
 
     @abstractmethod
     def pixel_to_index(self, px: float, py: float) -> tuple[int, int]:
@@ -190,14 +335,16 @@ class Grid(ABC):
 
 
 class SquareGrid(Grid):
+    NEIGHBORS = 8
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.highlight_image_path = os.path.join(RESOURCES_DIR, "map", "highlight_grid.png")
         self.hidden_image_path = os.path.join(RESOURCES_DIR, "map", "grid.png")
 
-    def adjacent(self, x: int, y: int) -> list[tuple[int, int]]:
-        tiles = [
+    def neighbor_offsets(self, x: int, y: int) -> list[tuple[int, int]]:
+        return [
             (x, y - 1),
             (x, y + 1),
             (x - 1, y - 1),
@@ -208,13 +355,32 @@ class SquareGrid(Grid):
             (x + 1, y),
         ]
 
-        # TODO: Filter out of range
+    def distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        # Diagonal moves count as one
+        return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
 
-        return tiles
+    def within_radius(self, x: int, y: int, radius: int) -> list[tuple[int, int]]:
+        return [
+            (i, j)
+            for j in range(max(0, y - radius), min(self.y, y + radius + 1))
+            for i in range(max(0, x - radius), min(self.x, x + radius + 1))
+        ]
+
+    def ring(self, x: int, y: int, radius: int) -> list[tuple[int, int]]:
+        if radius == 0:
+            return [(x, y)] if self.in_bounds(x, y) else []
+
+        tiles = [(i, y - radius) for i in range(x - radius, x + radius + 1)]
+        tiles += [(i, y + radius) for i in range(x - radius, x + radius + 1)]
+        tiles += [(x - radius, j) for j in range(y - radius + 1, y + radius)]
+        tiles += [(x + radius, j) for j in range(y - radius + 1, y + radius)]
+
+        return [tile for tile in tiles if self.in_bounds(*tile)]
 
     def update(self, width, height):
         self.x = int(width / self.pixel_density - 2 * self.x_margin)
         self.y = int(height / self.pixel_density - 2 * self.y_margin)
+        self.matrix.resize(self.x, self.y)
 
     def scale_tiles(self):
         self.tile_size = (
@@ -222,48 +388,89 @@ class SquareGrid(Grid):
             self.pixel_density / self.window.zoom,
         )
 
-    def tile_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
-        (sx, sy) = self.window.surface.pos
+    def map_index_range(
+        self, left: float, bottom: float, right: float, top: float, guard: int = 1
+    ) -> tuple[range, range]:
+        x_min = (left - self.x_offset) / self.pixel_density - self.x_margin
+        x_max = (right - self.x_offset) / self.pixel_density - self.x_margin
+        y_min = (bottom - self.y_offset) / self.pixel_density - self.y_margin
+        y_max = (top - self.y_offset) / self.pixel_density - self.y_margin
+
         return (
-            sx - self.window.x + (self.x_offset + (self.x_margin + i) * self.pixel_density) / self.window.zoom,
-            sy - self.window.y + (self.y_offset + (self.y_margin + j) * self.pixel_density) / self.window.zoom,
+            self._index_range(x_min, x_max, self.x, guard),
+            self._index_range(y_min, y_max, self.y, guard),
         )
 
-    def index_to_pixel(self, x: int, y: int) -> tuple[float, float]:
-        px = (self.x_offset + (self.x_margin + x) * self.pixel_density) / self.window.zoom - self.window.x
-        py = (self.y_offset + (self.y_margin + y) * self.pixel_density) / self.window.zoom - self.window.y
+    def _raw_index(self, px: float, py: float) -> tuple[float, float]:
+        x = ((px + self.window.x) * self.window.zoom - self.x_offset) / self.pixel_density - self.x_margin
+        y = ((py + self.window.y) * self.window.zoom - self.y_offset) / self.pixel_density - self.y_margin
+        return (x, y)
 
-        return px, py
+    def map_tile_size(self) -> tuple[float, float]:
+        return (self.pixel_density, self.pixel_density)
+
+    def map_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
+        return (
+            self.x_offset + (self.x_margin + i) * self.pixel_density,
+            self.y_offset + (self.y_margin + j) * self.pixel_density,
+        )
+
+    def map_pos_from_indices(self, xs: Sequence[int], ys: Sequence[int]) -> tuple[list[float], list[float]]:
+        (x0, y0) = self.map_pos_from_index(0, 0)
+        density = self.pixel_density
+        return ([x0 + i * density for i in xs], [y0 + j * density for j in ys])
 
     def pixel_to_index(self, px: float, py: float) -> tuple[int, int]:
-        x = ((px + self.window.x) * self.window.zoom - self.x_offset) / self.pixel_density - self.x_margin
-        y = ((py + self.window.y) * self.window.zoom - self.y_offset) / self.pixel_density - self.y_margin
+        (x, y) = self._raw_index(px, py)
 
         return (int(x), int(y))
 
 
 class HexGrid(Grid):
+    NEIGHBORS = 6
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.highlight_image_path = os.path.join(RESOURCES_DIR, "icons", "highlight.png")
         self.hidden_image_path = os.path.join(RESOURCES_DIR, "map", "hexes.png")
 
-    def adjacent(self, x: int, y: int) -> list[tuple[int, int]]:
-        tiles = [(x, y + 2), (x, y - 2)]
-        if x % 2 == 0:
-            tiles.append((x, y + 1))
-            tiles.append((x, y - 1))
-        else:
-            tiles.append((x, y + 1))
-            tiles.append((x, y - 1))
-
-        if y % 2 == 0:
-            tiles.append((x - 1, y + 1))
-            tiles.append((x - 1, y - 1))
-        else:
-            tiles.append((x + 1, y - 1))
-            tiles.append((x + 1, y + 1))
+    def neighbor_offsets(self, x: int, y: int) -> list[tuple[int, int]]:
+        (q, r) = hexmath.offset_to_axial(x, y)
+        return [hexmath.axial_to_offset(q + dq, r + dr) for dq, dr in hexmath.AXIAL_DIRECTIONS]
+
+    def distance(self, a: tuple[int, int], b: tuple[int, int]) -> int:
+        return hexmath.axial_distance(hexmath.offset_to_axial(*a), hexmath.offset_to_axial(*b))
+
+    def within_radius(self, x: int, y: int, radius: int) -> list[tuple[int, int]]:
+        (q, r) = hexmath.offset_to_axial(x, y)
+        tiles = []
+        for dq in range(-radius, radius + 1):
+            for dr in range(max(-radius, -dq - radius), min(radius, -dq + radius) + 1):
+                tile = hexmath.axial_to_offset(q + dq, r + dr)
+                if self.in_bounds(*tile):
+                    tiles.append(tile)
+
+        return tiles
+
+    def ring(self, x: int, y: int, radius: int) -> list[tuple[int, int]]:
+        if radius == 0:
+            return [(x, y)] if self.in_bounds(x, y) else []
+
+        # Start radius steps away in the fifth direction, then walk radius steps along each side
+        (q, r) = hexmath.offset_to_axial(x, y)
+        (dq, dr) = hexmath.AXIAL_DIRECTIONS[4]
+        q += dq * radius
+        r += dr * radius
+
+        tiles = []
+        for dq, dr in hexmath.AXIAL_DIRECTIONS:
+            for _ in range(radius):
+                tile = hexmath.axial_to_offset(q, r)
+                if self.in_bounds(*tile):
+                    tiles.append(tile)
+                q += dq
+                r += dr
 
         return tiles
 
@@ -276,34 +483,57 @@ class HexGrid(Grid):
     def update(self, width, height):
         self.x = int(width / (2 * self.pixel_density) - 2 * self.x_margin)
         self.y = int((height / (math.sqrt(3) * self.pixel_density / 2)) - 2 * self.y_margin)
+        self.matrix.resize(self.x, self.y)
+
+    def map_index_range(
+        self, left: float, bottom: float, right: float, top: float, guard: int = 1
+    ) -> tuple[range, range]:
+        row_height = (math.sqrt(3) / 2) * self.pixel_density
+        column_width = 3 * self.pixel_density
+
+        x_min = (left - self.x_offset) / column_width - self.x_margin
+        x_max = (right - self.x_offset) / column_width - self.x_margin
+        y_min = (bottom - self.y_offset) / row_height - self.y_margin
+        y_max = (top - self.y_offset) / row_height - self.y_margin
+
+        # Tile images are 2 * pixel_density square and drawn up and right of their index position, so a
+        # tile starting up to one column left or 2 * pixel_density / row_height rows below the rectangle
+        # can still overlap it
+        return (
+            self._index_range(x_min - 1, x_max, self.x, guard),
+            self._index_range(y_min - 2 * self.pixel_density / row_height, y_max, self.y, guard),
+        )
 
-    def tile_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
-        (sx, sy) = self.window.surface.pos
-        (px, py) = self.index_to_pixel(i, j)
-        return (sx + px, sy + py)
+    def map_tile_size(self) -> tuple[float, float]:
+        return (self.pixel_density * 2, self.pixel_density * 2)
 
-    # TODO: Fix this. I hate this, but it works and I'm tired
-    def index_to_pixel(self, x: int, y: int) -> tuple[float, float]:
-        if y % 2 == 0:
-            grid_x = (x + self.x_margin) * 3 * self.pixel_density
-        else:
-            grid_x = ((x + self.x_margin) + 1 / 2) * 3 * self.pixel_density
+    def _map_origin(self) -> tuple[float, float]:
+        # Lower left corner of the image of tile (0, 0)
+        return (
+            self.x_offset + 3 * self.x_margin * self.pixel_density,
+            self.y_offset + self.y_margin * (hexmath.SQRT3 / 2) * self.pixel_density,
+        )
 
-        px = (grid_x + self.x_offset) / self.window.zoom - self.window.x
-        py = (
-            (y + self.y_margin) * (math.sqrt(3) / 2) * self.pixel_density + self.y_offset
-        ) / self.window.zoom - self.window.y
+    def map_pos_from_index(self, i: int, j: int) -> tuple[float, float]:
+        (x0, y0) = self._map_origin()
+        return (
+            x0 + (2 * i + (j & 1)) * 1.5 * self.pixel_density,
+            y0 + j * (hexmath.SQRT3 / 2) * self.pixel_density,
+        )
 
-        return px, py
+    def map_pos_from_indices(self, xs: Sequence[int], ys: Sequence[int]) -> tuple[list[float], list[float]]:
+        (x0, y0) = self._map_origin()
+        column_width = 1.5 * self.pixel_density
+        row_height = (hexmath.SQRT3 / 2) * self.pixel_density
+        return (
+            [x0 + (2 * i + (j & 1)) * column_width for i, j in zip(xs, ys, strict=True)],
+            [y0 + j * row_height for j in ys],
+        )
 
-    # TODO: Fix this. I hate this, but it works and I'm tired
     def pixel_to_index(self, px: float, py: float) -> tuple[int, int]:
-        y = ((py + self.window.y) * self.window.zoom - self.y_offset) / (
-            (math.sqrt(3) / 2) * self.pixel_density
-        ) - self.y_margin
-
-        x = ((px + self.window.x) * self.window.zoom - self.x_offset) / (3 * self.pixel_density) - self.x_margin
-
-        y = y - int(y) % 2 if x % 1 < 1 / 2 else y - (1 - int(y) % 2)
+        # Offset from the center of tile (0, 0) in map pixels
+        (x0, y0) = self._map_origin()
+        mx = (px + self.window.x) * self.window.zoom - x0 - self.pixel_density
+        my = (py + self.window.y) * self.window.zoom - y0 - self.pixel_density
 
-        return int(x), int(y)
+        return hexmath.axial_to_offset(*hexmath.pixel_to_axial(mx, my, self.pixel_density))
@@ -0,0 +1,72 @@
+"""Axial coordinate math for the flat-topped hex layout used by HexGrid
+
+HexGrid indexes tiles by (i, j) where every row j is half a hex height above the previous one and
+odd rows are shifted right by half a column (1.5 hex sizes). In "doubled" coordinates the tile (i, j)
+sits in column 2 * i + j % 2, which maps directly onto axial (q, r) coordinates:
+
+    q = 2 * i + j % 2
+    r = (j - q) / 2
+
+Axial coordinates make distances, neighbours and pixel rounding closed-form.
+"""
+
+import math
+
+SQRT3 = math.sqrt(3)
+
+# Axial offsets of the six neighbours of a hex, counter-clockwise starting from the one above
+AXIAL_DIRECTIONS: tuple[tuple[int, int], ...] = ((0, 1), (-1, 1), (-1, 0), (0, -1), (1, -1), (1, 0))
+
+
+def offset_to_axial(i: int, j: int) -> tuple[int, int]:
+    q = 2 * i + (j & 1)
+    return (q, (j - q) // 2)
+
+
+def axial_to_offset(q: int, r: int) -> tuple[int, int]:
+    return (q >> 1, 2 * r + q)
+
+
+def cube_round(q: float, r: float) -> tuple[int, int]:
+    """Round fractional axial coordinates to the axial coordinates of the containing hex"""
+    s = -q - r
+    rq = round(q)
+    rr = round(r)
+    rs = round(s)
+
+    dq = abs(rq - q)
+    dr = abs(rr - r)
+    ds = abs(rs - s)
+
+    if dq > dr and dq > ds:
+        rq = -rr - rs
+    elif dr > ds:
+        rr = -rq - rs
+
+    return (int(rq), int(rr))
+
+
+def pixel_to_axial(x: float, y: float, size: float) -> tuple[int, int]:
+    """Axial coordinates of the hex containing (x, y), relative to the center of hex (0, 0)
+
+    Args:
+        x (float): x offset from the center of hex (0, 0)
+        y (float): y offset from the center of hex (0, 0)
+        size (float): Distance from the center of a hex to any of its corners
+
+    Returns:
+        tuple[int, int]: Axial (q, r) coordinates
+    """
+    q = (2 / 3 * x) / size
+    r = (-1 / 3 * x + SQRT3 / 3 * y) / size
+    return cube_round(q, r)
+
+
+def axial_to_pixel(q: int, r: int, size: float) -> tuple[float, float]:
+    return (size * 1.5 * q, size * SQRT3 * (r + q / 2))
+
+
+def axial_distance(a: tuple[int, int], b: tuple[int, int]) -> int:
+    dq = a[0] - b[0]
+    dr = a[1] - b[1]
+    return (abs(dq) + abs(dr) + abs(dq + dr)) // 2
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+from typing import Any
+
+JOURNAL_EXTENSION = ".journal"
+# Events of a journal being compacted, kept until the new snapshot is written
+ROTATED_EXTENSION = ".old"
+
+# Events written between calls to fsync, a crash loses at most this many
+SYNC_EVERY = 8
+# Events after which the journal is folded into a new snapshot of the campaign
+COMPACT_EVERY = 5000
+
+
+class CampaignJournal:
+    """Append-only log of the changes made to a campaign since its file (the snapshot) was written
+
+    Each event is one line of JSON carrying a sequence number. The snapshot records the sequence number
+    of the last event it contains, so events which were already compacted into it are skipped when
+    replaying even if the journal could not be truncated afterwards. A partially written last line,
+    from a crash in the middle of a write, is dropped.
+
+    Compacting rotates the journal: its events move to a second file, which is deleted once the snapshot
+    including them is written, while new events go to a fresh journal meanwhile. Both are replayed.
+    """
+
+    def __init__(self, path: str | os.PathLike):
+        self.path = path
+        self.rotated_path = os.fspath(path) + ROTATED_EXTENSION
+        self.seq = 0
+        self.pending = 0
+        self.since_snapshot = 0
+        # Descriptor events are appended through, owned by the journal until close
+        self.fd: int | None = None
+
+    @staticmethod
+    def path_for(campaign_path: str | os.PathLike) -> str:
+        return os.fspath(campaign_path) + JOURNAL_EXTENSION
+
+    @staticmethod
+    def _read_events(path: str | os.PathLike) -> tuple[list[dict[str, Any]], int]:
+        """Complete events of a journal file, and the offset after the last one"""
+        events = []
+        good_end = 0
+        if os.path.exists(path):
+            with open(path, "rb") as journal_file:
+                for line in journal_file:
+                    if not line.endswith(b"\n"):
+                        break
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        break
+                    events.append(event)
+                    good_end += len(line)
+
+        return (events, good_end)
+
+    def read(self) -> list[dict[str, Any]]:
+        """Read every complete event, rotated ones first, and open the journal for appending after the last one"""
+        (events, _) = self._read_events(self.rotated_path)
+        (current, good_end) = self._read_events(self.path)
+        events += current
+
+        if events:
+            self.seq = max(self.seq, events[-1]["seq"])
+        self.since_snapshot = len(events)
+
+        # Drop any torn write so new events start on a fresh line
+        self._open()
+        os.ftruncate(self.fd, good_end)
+        return events
+
+    def _open(self) -> None:
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def append(self, event: dict[str, Any]) -> None:
+        if self.fd is None:
+            self.read()
+
+        self.seq += 1
+        line = json.dumps({"seq": self.seq, **event}, separators=(",", ":")) + "\n"
+        os.write(self.fd, line.encode("utf-8"))
+
+        self.since_snapshot += 1
+        self.pending += 1
+        if self.pending >= SYNC_EVERY:
+            self.sync()
+
+    def sync(self) -> None:
+        """Make sure every appended event is on disk"""
+        if self.fd is None or self.pending == 0:
+            return
+
+        os.fsync(self.fd)
+        self.pending = 0
+
+    def needs_compaction(self) -> bool:
+        return self.since_snapshot >= COMPACT_EVERY
+
+    def rotate(self) -> None:
+        """Move every event to the rotated file, to be called when a snapshot including them is taken"""
+        if self.fd is None:
+            self.read()
+
+        self.sync()
+        os.close(self.fd)
+        if os.path.exists(self.rotated_path):
+            # The previous snapshot failed to be written, its events are still needed
+            with open(self.rotated_path, "ab") as rotated, open(self.path, "rb") as journal_file:
+                shutil.copyfileobj(journal_file, rotated)
+                rotated.flush()
+                os.fsync(rotated.fileno())
+            os.remove(self.path)
+        else:
+            os.replace(self.path, self.rotated_path)
+
+        self._open()
+        self.pending = 0
+        self.since_snapshot = 0
+
+    def discard_rotated(self) -> None:
+        """Delete the rotated events, to be called once the snapshot including them is written"""
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def close(self) -> None:
+        if self.fd is None:
+            return
+
+        self.sync()
+        os.close(self.fd)
+        self.fd = None
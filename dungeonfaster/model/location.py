@@ -1,11 +1,16 @@
+from typing import TYPE_CHECKING, Any
+
 from kivy.uix.widget import Widget
 
+from dungeonfaster.model.fog import FogMatrix, FogSnapshot
 from dungeonfaster.model.map import Map
+from dungeonfaster.model.schema import encode_coordinate, parse_coordinate
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
 
-class Location:
-    map: Map
 
+class Location:
     def __init__(self, name: str, location_data: dict):
         self.parent: str = location_data.get("parent", "overworld")
         if not self.parent and name != "overworld":
@@ -13,44 +18,128 @@ class Location:
         self.name: str = name
         self.type: str = location_data.get("type", "group")
         self.map_data: dict = location_data.get("map", {})
-        # self.map: Map = Map(self.map_data["map_file"])
-        self.position: tuple[int, int] = eval(location_data.get("position", "(0, 0)"))
+        # Map is created from self.map_data on first use, see Location.location_map
+        self._location_map: Map | None = None
+        # Hidden tiles of the map while it isn't built, decoded from self.map_data on first change
+        self._fog: FogMatrix | None = None
+        self.surface: Widget | None = None
+        # Called with every change to the map's hidden tiles, tagged with this location's name
+        self.on_change: Callable[[dict[str, Any]], None] | None = None
+        self.position: tuple[int, int] = parse_coordinate(location_data.get("position", [0, 0]))
         self.music: list[str] = location_data.get("music", [])
         self.combat_music: list[str] = location_data.get("combat_music", [])
 
-        # self.transitions: dict[tuple[int, int], str] = location_data.get("transitions", {})
-        self.transitions = {}
-        for transition, location in location_data.get("transitions", {}).items():
-            self.transitions[eval(transition)] = location
-
-        # self.entrances: dict[tuple[int, int], tuple[int, int]] = location_data.get("entrances", {})
-        self.entrances = {}
-        for entrance, position in location_data.get("entrances", {}).items():
-            self.entrances[eval(entrance)] = eval(position)
+        self.transitions: dict[tuple[int, int], str] = {}
+        for transition, location in location_data.get("transitions", []):
+            self.transitions[parse_coordinate(transition)] = location
+
+        self.entrances: dict[tuple[int, int], tuple[int, int]] = {}
+        for entrance, position in location_data.get("entrances", []):
+            self.entrances[parse_coordinate(entrance)] = parse_coordinate(position)
+
+    @property
+    def location_map(self) -> Map:
+        if self._location_map is None:
+            self._write_fog()
+            self._location_map = Map(self.map_data["map_file"])
+            self._location_map.load(self.map_data, self.surface)
+            self._location_map.on_change = self._map_changed
+        return self._location_map
+
+    @location_map.setter
+    def location_map(self, new_map: Map) -> None:
+        self._location_map = new_map
+        self._location_map.on_change = self._map_changed
+
+    def _map_changed(self, change: dict[str, Any]) -> None:
+        if self.on_change is not None:
+            self.on_change({**change, "location": self.name})
+
+    def _stored_fog(self) -> FogMatrix:
+        if self._fog is None:
+            grid = self.map_data.get("grid", {})
+            self._fog = FogMatrix(grid.get("width", 0), grid.get("height", 0))
+            self._fog.load(grid.get("matrix", []))
+        return self._fog
+
+    def _write_fog(self) -> None:
+        """Store the changes made to the map before it was built back in self.map_data"""
+        if self._fog is not None:
+            self.map_data.setdefault("grid", {})["matrix"] = self._fog.save()
+            self._fog = None
+
+    def fog_snapshot(self) -> FogSnapshot:
+        """Copy the hidden tiles of the map, without building it if it was never displayed"""
+        if self._location_map is not None:
+            return self._location_map.grid.matrix.snapshot()
+        return self._stored_fog().snapshot()
+
+    def load_fog(self, coordinates: list[list[int]]) -> None:
+        """Replace the hidden tiles of the map, also before it is built"""
+        if self._location_map is not None:
+            self._location_map.load_fog(coordinates)
+        else:
+            self._fog = None
+            self.map_data.setdefault("grid", {})["matrix"] = coordinates
+
+    def apply(self, change: dict[str, Any]) -> None:
+        """Repeat a change to the map's hidden tiles, see Map.apply, without building it if it wasn't yet"""
+        if self._location_map is not None:
+            self._location_map.apply(change)
+            return
+
+        fog = self._stored_fog()
+        kind = change["type"]
+        if kind == "reveal":
+            fog.reveal_many([(x, y) for x, y in change["tiles"]])
+        elif kind == "flip":
+            fog.flip(*change["tile"])
+        elif kind == "hide_all":
+            fog.hide_all()
+        elif kind == "reveal_all":
+            fog.reveal_all()
+        elif kind == "invert":
+            fog.invert()
+
+    @property
+    def map_file(self) -> str:
+        if self._location_map is not None:
+            return self._location_map.map_file
+        return self.map_data.get("map_file", "")
 
     def set_map(self, map_file: str):
-        self.map = Map(map_file=map_file)
-        self.map.load_image()
+        self.location_map = Map(map_file=map_file)
+        self.location_map.load_image()
+
+    def save(self, snapshot: bool = False) -> dict:
+        if self._location_map is not None:
+            map_dict = self._location_map.save(snapshot)
+        elif self._fog is not None:
+            # Changed since it was loaded, without being displayed
+            fog = self._fog.snapshot() if snapshot else self._fog.save()
+            map_dict = dict(self.map_data, grid=dict(self.map_data.get("grid", {}), matrix=fog))
+        else:
+            # Maps which were never displayed are saved as they were loaded
+            map_dict = self.map_data
 
-    def save(self) -> dict:
         save_dict = {
             "name": self.name,
-            "map": self.map.save(),
-            "music": self.music,
-            "combat_music": self.combat_music,
-            "position": str(self.position),
-            "transitions": self.transitions,
+            "map": map_dict,
+            "music": list(self.music),
+            "combat_music": list(self.combat_music),
+            "position": encode_coordinate(self.position),
+            "transitions": [[encode_coordinate(pos), name] for pos, name in self.transitions.items()],
+            "entrances": [
+                [encode_coordinate(from_pos), encode_coordinate(to_pos)] for from_pos, to_pos in self.entrances.items()
+            ],
             "type": self.type,
         }
 
-        save_dict["transitions"] = {str(pos): name for pos, name in self.transitions.items()}
-        save_dict["entrances"] = {str(from_pos): str(to_pos) for from_pos, to_pos in self.entrances.items()}
-
         return save_dict
 
     def load(self, surface: Widget) -> None:
-        self.map = Map(self.map_data["map_file"])
-        self.map.load(self.map_data, surface)
+        # Defer building the map (and decoding its image) until it is first displayed
+        self.surface = surface
 
         # for song_file in load_json["music"]:
         #     self.music.append(SoundLoader.load(song_file))
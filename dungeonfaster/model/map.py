@@ -1,12 +1,21 @@
 import os
+from typing import TYPE_CHECKING, Any
 
 from kivy.graphics import Rectangle
-from kivy.uix.image import Image
 from kivy.uix.widget import Widget
 
+from dungeonfaster.model.fogLayer import FogLayer
 from dungeonfaster.model.grid import Grid, HexGrid, SquareGrid
+from dungeonfaster.model.pathfinding import PathFinder
+from dungeonfaster.model.pyramid import ImagePyramid
+from dungeonfaster.model.schema import encode_polyline, parse_polyline
+from dungeonfaster.model.textureCache import TEXTURE_CACHE
+from dungeonfaster.model.visibility import LineOfSight
 from dungeonfaster.model.window import Window
 
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
 RESOURCES_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "resources")
 CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
 CAMP_FILE_DIR = os.path.join(CAMPAIGNS_DIR, "files")
@@ -16,12 +25,11 @@ GRID_TYPE_HEX = "hex"
 
 
 class Map:
-    image: Image
-
     def __init__(self, map_file: str):
-        # TODO: Down-sample very large high-resolution maps when screens are small and zoom is low
-
-        self.map_file = os.path.join(CAMP_FILE_DIR, map_file)
+        # Reference to the image as stored in the campaign, relative to the campaign files directory
+        self.map_file = map_file
+        # Path the image is decoded from
+        self.image_file = os.path.join(CAMP_FILE_DIR, map_file)
         self.width = 0
         self.height = 0
 
@@ -31,6 +39,15 @@ class Map:
         self.points_of_interest: list[tuple[int, int]] = []
         self.drawn_poi: dict[tuple[int, int], Rectangle] = {}
         self.walls: list[list[tuple[float, float]]] = []
+        # Bumped by walls_changed, caches built from the walls compare it to tell they are stale
+        self.walls_version = 0
+        # Routes and move counts over the grid, respecting walls
+        self.paths = PathFinder(self)
+        # Tiles seen from a position, blocked by walls
+        self.sight = LineOfSight(self)
+
+        # Tiled, down-sampled levels of very large maps, None if the map is drawn from a single texture
+        self.pyramid: ImagePyramid | None = None
 
         self.load_image()
         # self.tile: Image = Image(source="resources/map/highlight_grid.png")
@@ -42,14 +59,28 @@ class Map:
 
         # Does this map use hidden tiles?
         self.hidden_tiles = False
+        # Tiles within this many steps of a token, and not behind a wall, are revealed when it moves
+        self.vision_radius = 1
 
-        # List of references to grid tiles currently on canvas
-        self.drawn_tiles: list[Rectangle] = []
+        # Called with a description of every change to the hidden tiles, see Map.apply
+        self.on_change: Callable[[dict[str, Any]], None] | None = None
+
+        # Batched obscuration tiles, built on first draw
+        self.fog: FogLayer | None = None
         self.map_rect: Rectangle = None
 
     def load_image(self):
-        self.image = Image(source=self.map_file)
-        (self.width, self.height) = self.image.texture.size
+        self.pyramid = ImagePyramid.load_cached(self.image_file)
+        if self.pyramid is None:
+            texture = TEXTURE_CACHE.get(self.image_file)
+            if ImagePyramid.needed(texture):
+                self.pyramid = ImagePyramid.create(self.image_file, texture)
+                TEXTURE_CACHE.discard(self.image_file)
+
+        if self.pyramid is not None:
+            (self.width, self.height) = self.pyramid.size
+        else:
+            (self.width, self.height) = texture.size
         # if self.grid.matrix is None:
         self.grid.update(self.width, self.height)
 
@@ -65,10 +96,12 @@ class Map:
         self.map_file = load_json["map_file"]
         self.window.zoom = load_json["zoom"]
         self.hidden_tiles = load_json["hidden"]
+        self.vision_radius = load_json.get("vision_radius", 1)
         self.grid_type = load_json["grid_type"]
 
         for segment in load_json.get("walls", []):
-            self.walls.append([eval(wall) for wall in segment])
+            self.walls.append(parse_polyline(segment))
+        self.walls_changed()
 
         # Change from default (square) to hex if necessary
         if load_json["grid_type"] == GRID_TYPE_HEX:
@@ -84,17 +117,16 @@ class Map:
 
         # self.grid.scale_tiles()
 
-    def save(self):
+    def save(self, snapshot: bool = False):
         save_data = {}
         save_data["map_file"] = self.map_file
         save_data["zoom"] = self.window.zoom
         save_data["hidden"] = self.hidden_tiles
+        save_data["vision_radius"] = self.vision_radius
         save_data["grid_type"] = self.grid_type
-        save_data["grid"] = self.grid.save()
+        save_data["grid"] = self.grid.save(snapshot)
 
-        save_data["walls"] = []
-        for segment in self.walls:
-            save_data["walls"].append([str(wall) for wall in segment])
+        save_data["walls"] = [encode_polyline(segment) for segment in self.walls]
 
         save_data["window_x"] = self.window.x
         save_data["window_y"] = self.window.y
@@ -103,11 +135,19 @@ class Map:
 
     def update(self):
         self.grid.update(self.width, self.height)
-        for tile in self.drawn_tiles:
-            if tile in self.window.surface.canvas.children:
-                self.window.surface.canvas.remove(tile)
-        self.drawn_tiles = []
+        if self.fog is not None:
+            self.fog.detach()
+            self.fog = None
+        self.drawn_poi = {}
+
+    def clear_drawn(self) -> None:
+        """Forget everything drawn to the surface, to be called when its canvas is cleared"""
+        self.map_rect = None
         self.drawn_poi = {}
+        if self.fog is not None:
+            self.fog.detach()
+        if self.pyramid is not None:
+            self.pyramid.detach()
 
     def to_hex(self):
         hex_grid = HexGrid(window=self.window)
@@ -131,9 +171,19 @@ class Map:
         new_grid.pixel_density = old_grid.pixel_density
         new_grid.x_offset = old_grid.x_offset
         new_grid.y_offset = old_grid.y_offset
+        new_grid.matrix.resize(new_grid.x, new_grid.y)
+
+    def walls_changed(self) -> None:
+        """To be called after editing self.walls"""
+        self.walls_version += 1
 
     def draw_map(self) -> None:
-        texture = self.window.get_sub_texture(self.image)
+        if self.pyramid is not None:
+            self.pyramid.draw(self.window)
+            return
+
+        # Textures of maps which haven't been drawn recently may have been evicted and are re-loaded here
+        texture = self.window.get_sub_texture(TEXTURE_CACHE.get(self.image_file))
         pos = self.window.get_region_pos()
         size = self.window.get_region_size()
         if self.map_rect is None:
@@ -144,31 +194,11 @@ class Map:
             self.map_rect.pos = pos
             self.map_rect.size = size
 
-    def draw_tile(self, x: int, y: int) -> None:
-        # Obscuration tile at index
-        tile: Rectangle = self.grid.image_matrix.get((x, y), None)
-
-        if (x, y) in self.grid.matrix:
-            if tile is None:
-                tile = self.grid.get_rect(x, y, self.grid.hidden_image_path)
-                self.grid.image_matrix[(x, y)] = tile
-
-            # Tile is within display window (mostly) and has the tile been drawn already?
-            if self.window.showing(tile) and tile not in self.drawn_tiles:
-                # Add to canvas and tracking list
-                self.window.surface.canvas.add(tile)
-                self.drawn_tiles.append(tile)
-        elif tile in self.drawn_tiles:
-            self.window.surface.canvas.remove(tile)
-            self.drawn_tiles.remove(tile)
-
-        self.grid.update_tile(x, y)
-
     def draw_poi(self):
         # TODO: Seems to be an issue with PoI highlights on sub-locations
         for poi in self.points_of_interest:
             # If the PoI tile is revealed
-            if poi not in self.grid.matrix:
+            if self.grid.matrix.revealed(*poi):
                 if poi in self.drawn_poi:
                     poi_rect = self.drawn_poi[poi]
                     self.grid.update_rect(poi_rect, poi[0], poi[1])
@@ -193,10 +223,13 @@ class Map:
     def draw_tiles(self):
         self.grid.scale_tiles()
 
-        # Check if tiles need to be added/removed
-        for x in range(self.grid.x):
-            for y in range(self.grid.y):
-                self.draw_tile(x, y)
+        # (Re-)build the fog layer if the grid has been replaced
+        if self.fog is None or self.fog.grid is not self.grid:
+            if self.fog is not None:
+                self.fog.detach()
+            self.fog = FogLayer(self.grid)
+
+        self.fog.draw(self.window.surface.canvas)
 
         # Draw tiles marking revealed PoIs
         self.draw_poi()
@@ -206,28 +239,77 @@ class Map:
         self.flip_at_index(x, y)
 
     def flip_at_index(self, x: int, y: int) -> None:
-        tile = self.grid.flip_tile(x, y)
+        if not self.grid.in_bounds(x, y):
+            return
 
-        if tile in self.drawn_tiles:
-            self.drawn_tiles.remove(tile)
-            self.window.surface.canvas.remove(tile)
-        else:
-            self.drawn_tiles.append(tile)
-            self.window.surface.canvas.add(tile)
+        hidden = self.grid.flip_tile(x, y)
+        if self.fog is not None:
+            self.fog.set_tile(x, y, hidden)
+        self._changed({"type": "flip", "tile": [x, y]})
 
     def revealed(self, x: int, y: int) -> bool:
-        return (x, y) not in self.grid.matrix
+        return self.grid.matrix.revealed(x, y)
 
     def hidden(self, x: int, y: int) -> bool:
-        return (x, y) in self.grid.matrix
+        return self.grid.matrix.hidden(x, y)
 
     def reveal(self, x: int, y: int) -> None:
-        if self.hidden(x, y):
-            tile = self.grid.flip_tile(x, y)
-            if tile in self.drawn_tiles:
-                self.drawn_tiles.remove(tile)
-            if tile in self.window.surface.canvas.children:
-                self.window.surface.canvas.remove(tile)
+        self.reveal_many([(x, y)])
+
+    def reveal_many(self, coordinates: list[tuple[int, int]]) -> None:
+        changed = self.grid.matrix.reveal_many(coordinates)
+        for x, y in changed:
+            if self.fog is not None:
+                self.fog.set_tile(x, y, False)
+
+        if changed:
+            self._changed({"type": "reveal", "tiles": [[x, y] for x, y in changed]})
+
+    def reveal_visible(self, x: int, y: int) -> None:
+        """Reveal every tile which can be seen from tile (x, y) within vision_radius"""
+        self.reveal_many(self.sight.visible_tiles((x, y), self.vision_radius))
+
+    def hide_all(self) -> None:
+        self.grid.matrix.hide_all()
+        self._rebuild_fog()
+        self._changed({"type": "hide_all"})
+
+    def reveal_all(self) -> None:
+        self.grid.matrix.reveal_all()
+        self._rebuild_fog()
+        self._changed({"type": "reveal_all"})
+
+    def invert_tiles(self) -> None:
+        self.grid.matrix.invert()
+        self._rebuild_fog()
+        self._changed({"type": "invert"})
+
+    def load_fog(self, coordinates: list[list[int]]) -> None:
+        """Replace the hidden tiles with those of coordinates, as the server sends them"""
+        self.grid.matrix.load(coordinates)
+        self._rebuild_fog()
+
+    def _rebuild_fog(self) -> None:
+        if self.fog is not None:
+            self.fog.build()
+
+    def _changed(self, change: dict[str, Any]) -> None:
+        if self.on_change is not None:
+            self.on_change(change)
+
+    def apply(self, change: dict[str, Any]) -> None:
+        """Repeat a change previously passed to on_change"""
+        kind = change["type"]
+        if kind == "reveal":
+            self.reveal_many([(x, y) for x, y in change["tiles"]])
+        elif kind == "flip":
+            self.flip_at_index(*change["tile"])
+        elif kind == "hide_all":
+            self.hide_all()
+        elif kind == "reveal_all":
+            self.reveal_all()
+        elif kind == "invert":
+            self.invert_tiles()
 
     def draw(self):
         self.draw_map()
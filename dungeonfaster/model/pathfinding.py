@@ -0,0 +1,209 @@
+import itertools
+from array import array
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from dungeonfaster.model.grid import Grid
+from dungeonfaster.model.walls import segments_cross
+
+if TYPE_CHECKING:
+    from dungeonfaster.model.map import Map
+
+# Number of distance fields kept per map, the party position plus a few recently queried tiles
+MAX_FIELDS = 4
+
+UNREACHABLE = -1
+
+
+class PathFinder:
+    """Routes and move counts between tiles of a map's grid
+
+    A move goes from a tile to one of its neighbours in the grid's neighbour table, and is not allowed if
+    the line between the two tile centers crosses one of the map's walls. Hidden tiles can optionally
+    be treated as unknown and never entered.
+
+    Every move costs the same, so distance fields are breadth-first searches (Dijkstra with unit
+    weights). They are cached per source tile and only recomputed once the grid, the walls, or (when
+    avoiding hidden tiles) the fog change, as told by the version counters of the map's walls and fog.
+    Queries from the same tile, such as the party's position while the mouse moves, share one field.
+    """
+
+    def __init__(self, map_arg: "Map"):
+        self.map = map_arg
+
+        self._state: tuple = ()
+        self._blocked: set[tuple[int, int]] = set()
+        # Fog version each field was computed for, None if it goes through hidden tiles
+        self._fields: OrderedDict[tuple[tuple[int, int], bool], tuple[tuple[int, int] | None, array]] = OrderedDict()
+
+    # ==== Cache ==== #
+
+    def _refresh(self) -> Grid:
+        """Drop cached data if the grid or walls changed since it was computed"""
+        grid = self.map.grid
+        state = (id(grid), grid.geometry(), self.map.walls_version)
+        if state != self._state:
+            self._state = state
+            self._fields.clear()
+            self._blocked = self._blocked_moves(grid)
+
+        return grid
+
+    def invalidate(self) -> None:
+        self._state = ()
+        self._fields.clear()
+
+    def _blocked_moves(self, grid: Grid) -> set[tuple[int, int]]:
+        """Pairs (low, high) of linear tile indices between which a wall prevents moving"""
+        blocked = set()
+        if grid.x <= 0 or grid.y <= 0:
+            return blocked
+
+        width = grid.x
+        neighbors = grid.NEIGHBORS
+        table = grid.neighbor_table()
+        centers: dict[int, tuple[float, float]] = {}
+
+        def center(index: int) -> tuple[float, float]:
+            if index not in centers:
+                centers[index] = grid.map_center_from_index(index % width, index // width)
+            return centers[index]
+
+        for segment in self.map.walls:
+            for start, end in itertools.pairwise(segment):
+                # Only moves from tiles near the wall can cross it
+                (x_range, y_range) = grid.map_index_range(
+                    min(start[0], end[0]),
+                    min(start[1], end[1]),
+                    max(start[0], end[0]),
+                    max(start[1], end[1]),
+                    guard=2,
+                )
+                for j in y_range:
+                    for i in x_range:
+                        index = j * width + i
+                        for neighbor in table[index * neighbors : (index + 1) * neighbors]:
+                            if neighbor < 0:
+                                continue
+                            move = (min(index, neighbor), max(index, neighbor))
+                            if move in blocked:
+                                continue
+                            if segments_cross(center(index), center(neighbor), start, end):
+                                blocked.add(move)
+
+        return blocked
+
+    def _fog(self, grid: Grid, avoid_hidden: bool) -> bytearray | None:
+        """The fog bitmap itself, only read during a query"""
+        return grid.matrix.bits if avoid_hidden else None
+
+    def _fog_version(self, grid: Grid, avoid_hidden: bool) -> tuple[int, int] | None:
+        return (id(grid.matrix), grid.matrix.version) if avoid_hidden else None
+
+    # ==== Queries ==== #
+
+    def distance_field(self, source: tuple[int, int], avoid_hidden: bool = False) -> array:
+        """Number of moves from source to every tile of the grid
+
+        Args:
+            source (tuple[int, int]): Starting tile
+            avoid_hidden (bool, optional): Never enter hidden tiles. Defaults to False.
+
+        Returns:
+            array: Moves to tile (x, y) at index y * width + x, UNREACHABLE for tiles which can't be reached
+        """
+        grid = self._refresh()
+        key = (tuple(source), avoid_hidden)
+        cached = self._fields.get(key)
+        if cached is not None and cached[0] == self._fog_version(grid, avoid_hidden):
+            self._fields.move_to_end(key)
+            return cached[1]
+
+        field = self._search(grid, source, self._fog(grid, avoid_hidden))
+        self._fields[key] = (self._fog_version(grid, avoid_hidden), field)
+        self._fields.move_to_end(key)
+        while len(self._fields) > MAX_FIELDS:
+            self._fields.popitem(last=False)
+
+        return field
+
+    def _search(self, grid: Grid, source: tuple[int, int], fog: bytearray | None) -> array:
+        width = grid.x
+        neighbors = grid.NEIGHBORS
+        field = array("i", [UNREACHABLE]) * (grid.x * grid.y)
+        if not grid.in_bounds(*source):
+            return field
+
+        table = grid.neighbor_table()
+        blocked = self._blocked
+
+        start = source[1] * width + source[0]
+        field[start] = 0
+        frontier = [start]
+        moves = 0
+        while frontier:
+            moves += 1
+            next_frontier = []
+            for index in frontier:
+                for neighbor in table[index * neighbors : (index + 1) * neighbors]:
+                    if neighbor < 0 or field[neighbor] != UNREACHABLE:
+                        continue
+                    if fog is not None and fog[neighbor]:
+                        continue
+                    if blocked and (min(index, neighbor), max(index, neighbor)) in blocked:
+                        continue
+                    field[neighbor] = moves
+                    next_frontier.append(neighbor)
+            frontier = next_frontier
+
+        return field
+
+    def moves(self, start: tuple[int, int], goal: tuple[int, int], avoid_hidden: bool = False) -> int | None:
+        """Number of moves it takes to get from start to goal, None if goal can't be reached"""
+        grid = self._refresh()
+        if not grid.in_bounds(*start) or not grid.in_bounds(*goal):
+            return None
+
+        moves = self.distance_field(start, avoid_hidden)[goal[1] * grid.x + goal[0]]
+        return None if moves == UNREACHABLE else moves
+
+    def path(
+        self, start: tuple[int, int], goal: tuple[int, int], avoid_hidden: bool = False
+    ) -> list[tuple[int, int]] | None:
+        """Shortest route from start to goal
+
+        Returns:
+            list[tuple[int, int]] | None: Tiles from start to goal, both included, None if goal can't be reached
+        """
+        grid = self._refresh()
+        if not grid.in_bounds(*start) or not grid.in_bounds(*goal):
+            return None
+
+        return self._walk_back(grid, self.distance_field(start, avoid_hidden), goal)
+
+    def _walk_back(self, grid: Grid, field: array, goal: tuple[int, int]) -> list[tuple[int, int]] | None:
+        """Follow a distance field downhill from goal to its source"""
+        width = grid.x
+        neighbors = grid.NEIGHBORS
+        table = grid.neighbor_table()
+        blocked = self._blocked
+
+        index = goal[1] * width + goal[0]
+        if field[index] == UNREACHABLE:
+            return None
+
+        path = [index]
+        while field[index] > 0:
+            for neighbor in table[index * neighbors : (index + 1) * neighbors]:
+                if neighbor < 0 or field[neighbor] != field[index] - 1:
+                    continue
+                if blocked and (min(index, neighbor), max(index, neighbor)) in blocked:
+                    continue
+                index = neighbor
+                break
+            else:
+                # The field doesn't match the current moves
+                return None
+            path.append(index)
+
+        return [(index % width, index // width) for index in reversed(path)]
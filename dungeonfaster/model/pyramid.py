@@ -0,0 +1,186 @@
+import json
+import math
+import os
+
+from kivy.core.image import Image as CoreImage
+from kivy.graphics import ClearBuffers, ClearColor, Fbo, InstructionGroup, Rectangle
+
+# pylint: disable=no-name-in-module
+from kivy.graphics.texture import Texture
+
+from dungeonfaster.model.window import Window
+
+CAMPAIGNS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "campaigns")
+PYRAMIDS_DIR = os.path.join(CAMPAIGNS_DIR, "pyramids")
+
+# Edge length in pixels of each stored tile
+TILE_SIZE = 1024
+# Maps with a side longer than this are drawn from a pyramid instead of a single texture
+PYRAMID_MIN_SIZE = 4096
+
+META_FILE = "pyramid.json"
+
+
+class ImagePyramid:
+    """Multi-resolution, tiled copy of a large map image
+
+    Level 0 is the full resolution image, each following level halves the width and height of the
+    previous one until the whole map fits within a single tile. Tiles are stored as png files under
+    `campaigns/pyramids` and only the tiles of a single level which intersect the display window are
+    loaded as textures.
+    """
+
+    def __init__(self, image_file: str, width: int, height: int, levels: int):
+        self.image_file = image_file
+        self.size = (width, height)
+        self.levels = levels
+        self.directory = self.cache_dir(image_file)
+
+        self.canvas = None
+        self.group = InstructionGroup()
+        self.textures: dict[tuple[int, int, int], Texture] = {}
+        self.rects: dict[tuple[int, int, int], Rectangle] = {}
+
+    @staticmethod
+    def cache_dir(image_file: str) -> str:
+        stat = os.stat(image_file)
+        return os.path.join(PYRAMIDS_DIR, f"{os.path.basename(image_file)}-{stat.st_size}-{int(stat.st_mtime)}")
+
+    @classmethod
+    def load_cached(cls, image_file: str) -> "ImagePyramid | None":
+        """Get the previously generated pyramid for image_file without decoding the image
+
+        Returns:
+            ImagePyramid | None: None if no pyramid has been generated for the current version of the file
+        """
+        meta_path = os.path.join(cls.cache_dir(image_file), META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, encoding="utf-8") as meta_file:
+            meta = json.load(meta_file)
+        return cls(image_file, meta["width"], meta["height"], meta["levels"])
+
+    @classmethod
+    def create(cls, image_file: str, texture: Texture) -> "ImagePyramid":
+        """Generate the pyramid for image_file from its decoded full resolution texture"""
+        (width, height) = texture.size
+        levels = 1 + max(0, math.ceil(math.log2(max(width, height) / TILE_SIZE)))
+        pyramid = cls(image_file, width, height, levels)
+        pyramid.generate(texture)
+
+        return pyramid
+
+    @staticmethod
+    def needed(texture: Texture) -> bool:
+        return max(texture.size) > PYRAMID_MIN_SIZE
+
+    def generate(self, texture: Texture) -> None:
+        (width, height) = self.size
+        os.makedirs(self.directory, exist_ok=True)
+
+        fbo = Fbo(size=(TILE_SIZE, TILE_SIZE))
+        for level in range(self.levels):
+            scale = 2**level
+            (columns, rows) = self.tile_counts(level)
+            for column in range(columns):
+                for row in range(rows):
+                    # Region of the full resolution image covered by this tile
+                    src_x = column * TILE_SIZE * scale
+                    src_y = row * TILE_SIZE * scale
+                    src_width = min(TILE_SIZE * scale, width - src_x)
+                    src_height = min(TILE_SIZE * scale, height - src_y)
+
+                    tile_size = (math.ceil(src_width / scale), math.ceil(src_height / scale))
+                    fbo.size = tile_size
+                    fbo.clear()
+                    with fbo:
+                        ClearColor(0, 0, 0, 0)
+                        ClearBuffers()
+                        Rectangle(texture=texture.get_region(src_x, src_y, src_width, src_height), size=tile_size)
+                    fbo.draw()
+                    fbo.texture.save(self.tile_path(level, column, row), flipped=False)
+
+        with open(os.path.join(self.directory, META_FILE), "w", encoding="utf-8") as meta_file:
+            json.dump({"width": width, "height": height, "levels": self.levels, "tile_size": TILE_SIZE}, meta_file)
+
+    def tile_path(self, level: int, column: int, row: int) -> str:
+        return os.path.join(self.directory, f"{level}-{column}-{row}.png")
+
+    def tile_counts(self, level: int) -> tuple[int, int]:
+        span = TILE_SIZE * 2**level
+        return (math.ceil(self.size[0] / span), math.ceil(self.size[1] / span))
+
+    def level_for_zoom(self, zoom: float) -> int:
+        """Coarsest level which still has at least one pixel per screen pixel at zoom"""
+        if zoom <= 1:
+            return 0
+        return min(self.levels - 1, int(math.log2(zoom)))
+
+    def draw(self, window: Window) -> None:
+        if self.canvas is not window.surface.canvas:
+            window.surface.canvas.add(self.group)
+            self.canvas = window.surface.canvas
+
+        level = self.level_for_zoom(window.zoom)
+        span = TILE_SIZE * 2**level
+        (columns, rows) = self.tile_counts(level)
+        (sx, sy) = window.surface.pos
+
+        # Map pixels within the display window
+        left = max(0.0, window.x * window.zoom)
+        right = min(self.size[0], (window.x + window.surface.width) * window.zoom)
+        bottom = max(0.0, window.y * window.zoom)
+        top = min(self.size[1], (window.y + window.surface.height) * window.zoom)
+
+        visible = set()
+        if left < right and bottom < top:
+            visible = {
+                (level, column, row)
+                for column in range(int(left // span), min(columns, int(right // span) + 1))
+                for row in range(int(bottom // span), min(rows, int(top // span) + 1))
+            }
+
+        # Drop tiles (and their textures) which are no longer in view
+        for key in [key for key in self.rects if key not in visible]:
+            self.group.remove(self.rects.pop(key))
+            self.textures.pop(key, None)
+
+        for key in visible:
+            (_, column, row) = key
+            texture = self.textures.get(key)
+            if texture is None:
+                texture = CoreImage(self.tile_path(*key), nocache=True).texture
+                self.textures[key] = texture
+
+            rect = self.rects.get(key)
+            if rect is None:
+                rect = Rectangle()
+                self.rects[key] = rect
+                self.group.add(rect)
+
+            # Crop the tile to the part within the display window
+            tile_left = max(left, column * span)
+            tile_right = min(right, (column + 1) * span)
+            tile_bottom = max(bottom, row * span)
+            tile_top = min(top, (row + 1) * span)
+            scale = 2**level
+
+            rect.texture = texture.get_region(
+                (tile_left - column * span) / scale,
+                (tile_bottom - row * span) / scale,
+                (tile_right - tile_left) / scale,
+                (tile_top - tile_bottom) / scale,
+            )
+            rect.pos = (sx + tile_left / window.zoom - window.x, sy + tile_bottom / window.zoom - window.y)
+            rect.size = ((tile_right - tile_left) / window.zoom, (tile_top - tile_bottom) / window.zoom)
+
+    def detach(self) -> None:
+        """Take the pyramid off its canvas and release all loaded tile textures"""
+        if self.canvas is not None and self.group in self.canvas.children:
+            self.canvas.remove(self.group)
+        self.canvas = None
+
+        self.group.clear()
+        self.rects = {}
+        self.textures = {}
@@ -0,0 +1,241 @@
+"""Versioned layout of campaign files and the decoding of their coordinates
+
+Version 0 files (no "version" field) stored every coordinate as the Python repr of a tuple, such as
+"(3, 4)", including dictionary keys. From version 1 coordinates are JSON number arrays:
+
+- positions are [x, y]
+- transitions are a list of [[x, y], location name] pairs
+- entrances are a list of [[x, y], [x, y]] pairs
+- each wall polyline is a flat [x0, y0, x1, y1, ...] list
+
+`upgrade` converts a loaded file of any known version to the current one and validates it, so the
+model classes only ever read the current layout. Nothing in a file is ever evaluated as code.
+"""
+
+from collections.abc import Callable, Iterable, Sequence
+from typing import Any
+
+SCHEMA_VERSION = 1
+
+Number = int | float
+
+
+class SchemaError(ValueError):
+    """A campaign file, or part of one, doesn't match the expected layout"""
+
+
+# ==== Coordinates ==== #
+
+
+def _number(text: str) -> Number:
+    try:
+        return int(text)
+    except ValueError:
+        return float(text)
+
+
+def parse_coordinate(value: Any) -> tuple:
+    """Decode a coordinate stored as a number array or as a version 0 tuple string like "(3, 4)"
+
+    Raises:
+        SchemaError: value isn't a sequence of numbers
+    """
+    if isinstance(value, str):
+        try:
+            return tuple(_number(part) for part in value.strip("()[] ").split(","))
+        except ValueError as error:
+            raise SchemaError(f"Invalid coordinate {value!r}") from error
+
+    if isinstance(value, list | tuple) and all(_is_number(part) for part in value):
+        return tuple(value)
+
+    raise SchemaError(f"Invalid coordinate {value!r}")
+
+
+def encode_coordinate(point: Iterable[Number]) -> list[Number]:
+    return list(point)
+
+
+def parse_polyline(values: Sequence[Number]) -> list[tuple[Number, Number]]:
+    """Points of a wall stored as a flat [x0, y0, x1, y1, ...] list"""
+    if len(values) % 2:
+        raise SchemaError("Wall has an odd number of coordinates")
+    return list(zip(values[0::2], values[1::2], strict=True))
+
+
+def encode_polyline(points: Iterable[Sequence[Number]]) -> list[Number]:
+    return [value for point in points for value in point]
+
+
+# ==== Validation ==== #
+
+
+def _is_number(value: Any) -> bool:
+    return isinstance(value, int | float) and not isinstance(value, bool)
+
+
+def _coordinate(value: Any) -> bool:
+    return isinstance(value, list) and len(value) == 2 and all(_is_number(part) for part in value)
+
+
+def _list_of(check: Callable[[Any], bool]) -> Callable[[Any], bool]:
+    return lambda value: isinstance(value, list) and all(check(item) for item in value)
+
+
+def _pairs(check: Callable[[Any], bool]) -> Callable[[Any], bool]:
+    """[coordinate, value] pairs, each value passing check"""
+
+    def is_pair(pair: Any) -> bool:
+        return isinstance(pair, list) and len(pair) == 2 and _coordinate(pair[0]) and check(pair[1])
+
+    return _list_of(is_pair)
+
+
+def _flat_numbers(value: Any) -> bool:
+    return isinstance(value, list) and len(value) % 2 == 0 and all(_is_number(part) for part in value)
+
+
+def _string(value: Any) -> bool:
+    return isinstance(value, str)
+
+
+def _boolean(value: Any) -> bool:
+    return isinstance(value, bool)
+
+
+def _asset(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and _string(value.get("digest"))
+        and _is_number(value.get("size"))
+        and _string(value.get("mime"))
+    )
+
+
+# Field name -> (required, check) for each object of the current version
+GRID_FIELDS: dict[str, tuple[bool, Callable[[Any], bool]]] = {
+    "width": (True, _is_number),
+    "height": (True, _is_number),
+    "x_offset": (True, _is_number),
+    "y_offset": (True, _is_number),
+    "x_margin": (True, _is_number),
+    "y_margin": (True, _is_number),
+    "pixel_density": (True, _is_number),
+    "matrix": (False, _list_of(_coordinate)),
+}
+
+MAP_FIELDS: dict[str, tuple[bool, Callable[[Any], bool]]] = {
+    "map_file": (True, _string),
+    "zoom": (True, _is_number),
+    "hidden": (True, _boolean),
+    "grid_type": (True, _string),
+    "grid": (True, lambda value: isinstance(value, dict)),
+    "walls": (False, _list_of(_flat_numbers)),
+    "window_x": (False, _is_number),
+    "window_y": (False, _is_number),
+    "vision_radius": (False, _is_number),
+}
+
+LOCATION_FIELDS: dict[str, tuple[bool, Callable[[Any], bool]]] = {
+    "map": (False, lambda value: isinstance(value, dict)),
+    "position": (False, _coordinate),
+    "transitions": (False, _pairs(_string)),
+    "entrances": (False, _pairs(_coordinate)),
+    "music": (False, _list_of(_string)),
+    "combat_music": (False, _list_of(_string)),
+    "type": (False, _string),
+}
+
+CAMPAIGN_FIELDS: dict[str, tuple[bool, Callable[[Any], bool]]] = {
+    "version": (True, _is_number),
+    "name": (True, _string),
+    "position": (True, _coordinate),
+    "current_location": (True, _string),
+    "party": (False, _list_of(lambda value: isinstance(value, dict))),
+    "locations": (True, lambda value: isinstance(value, dict)),
+    "journal_seq": (False, _is_number),
+    "assets": (False, lambda value: isinstance(value, dict) and all(_asset(info) for info in value.values())),
+}
+
+
+def _check(data: Any, fields: dict[str, tuple[bool, Callable[[Any], bool]]], path: str) -> None:
+    if not isinstance(data, dict):
+        raise SchemaError(f"{path} is not an object")
+
+    for name, (required, check) in fields.items():
+        if name not in data:
+            if required:
+                raise SchemaError(f"{path}.{name} is missing")
+            continue
+        if not check(data[name]):
+            raise SchemaError(f"{path}.{name} has an invalid value")
+
+
+def validate(data: dict) -> None:
+    """Check a campaign of the current version
+
+    Raises:
+        SchemaError: Describing the first field which doesn't match the schema
+    """
+    _check(data, CAMPAIGN_FIELDS, "campaign")
+
+    for name, location in data["locations"].items():
+        path = f"campaign.locations[{name!r}]"
+        _check(location, LOCATION_FIELDS, path)
+        if location.get("map"):
+            _check(location["map"], MAP_FIELDS, f"{path}.map")
+            _check(location["map"]["grid"], GRID_FIELDS, f"{path}.map.grid")
+
+
+# ==== Versions ==== #
+
+
+def _upgrade_v0(data: dict) -> dict:
+    data["position"] = list(parse_coordinate(data.get("position", "(0, 0)")))
+
+    for location in data.get("locations", {}).values():
+        if "position" in location:
+            location["position"] = list(parse_coordinate(location["position"]))
+        location["transitions"] = [
+            [list(parse_coordinate(tile)), name] for tile, name in location.get("transitions", {}).items()
+        ]
+        location["entrances"] = [
+            [list(parse_coordinate(tile)), list(parse_coordinate(position))]
+            for tile, position in location.get("entrances", {}).items()
+        ]
+
+        map_data = location.get("map")
+        if map_data and "walls" in map_data:
+            map_data["walls"] = [
+                [value for point in polyline for value in parse_coordinate(point)] for polyline in map_data["walls"]
+            ]
+
+    data["version"] = 1
+    return data
+
+
+# Functions taking a file from version n to n + 1
+UPGRADES: dict[int, Callable[[dict], dict]] = {0: _upgrade_v0}
+
+
+def upgrade(data: dict) -> dict:
+    """Bring a loaded campaign file up to SCHEMA_VERSION and validate it
+
+    The dictionary is modified in place and returned.
+
+    Raises:
+        SchemaError: The file is from a newer version or doesn't match the schema
+    """
+    if not isinstance(data, dict):
+        raise SchemaError("campaign is not an object")
+
+    version = data.get("version", 0)
+    if not isinstance(version, int) or version > SCHEMA_VERSION:
+        raise SchemaError(f"Unsupported campaign version {version!r}")
+
+    while version < SCHEMA_VERSION:
+        data = UPGRADES[version](data)
+        version = data["version"]
+
+    validate(data)
+    return data
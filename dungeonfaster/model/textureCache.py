@@ -0,0 +1,53 @@
+from collections import OrderedDict
+
+from kivy.core.image import Image as CoreImage
+
+# pylint: disable=no-name-in-module
+from kivy.graphics.texture import Texture
+
+# Upper bound on the (uncompressed, RGBA) size of map textures kept in memory
+MAX_TEXTURE_BYTES = 512 * 1024 * 1024
+
+
+class TextureCache:
+    """Least recently used cache of decoded map textures, bounded by their total size in bytes
+
+    The most recently requested texture is never evicted, even if it alone exceeds the budget.
+    """
+
+    def __init__(self, max_bytes: int = MAX_TEXTURE_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.textures: OrderedDict[str, Texture] = OrderedDict()
+
+    @staticmethod
+    def texture_bytes(texture: Texture) -> int:
+        (width, height) = texture.size
+        return width * height * 4
+
+    def get(self, image_file: str) -> Texture:
+        texture = self.textures.get(image_file)
+        if texture is not None:
+            self.textures.move_to_end(image_file)
+            return texture
+
+        # Bypass kivy's own texture cache so evicted textures are actually released
+        texture = CoreImage(image_file, nocache=True).texture
+        self.textures[image_file] = texture
+        self.total_bytes += self.texture_bytes(texture)
+        self.evict()
+
+        return texture
+
+    def discard(self, image_file: str) -> None:
+        texture = self.textures.pop(image_file, None)
+        if texture is not None:
+            self.total_bytes -= self.texture_bytes(texture)
+
+    def evict(self) -> None:
+        while self.total_bytes > self.max_bytes and len(self.textures) > 1:
+            (_, texture) = self.textures.popitem(last=False)
+            self.total_bytes -= self.texture_bytes(texture)
+
+
+TEXTURE_CACHE = TextureCache()
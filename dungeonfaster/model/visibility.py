@@ -0,0 +1,103 @@
+import math
+from typing import TYPE_CHECKING
+
+from dungeonfaster.model.walls import Point, Segment, WallIndex, segments_cross
+
+if TYPE_CHECKING:
+    from dungeonfaster.model.map import Map
+
+# Number of angular sectors shadows are sorted into around the viewer
+SECTORS = 720
+
+
+class LineOfSight:
+    """Tiles which can be seen from a tile, with the map's walls blocking sight
+
+    Every wall segment near the viewer casts a shadow: the sectors of angle it covers as seen from the
+    center of the viewer's tile. A tile is visible unless the line from the viewer to its center crosses
+    one of the segments casting a shadow over the sector it lies in, so each tile is only tested against
+    the few walls in its direction.
+    """
+
+    def __init__(self, map_arg: "Map"):
+        self.map = map_arg
+
+        self._walls_version: int | None = None
+        self._index = WallIndex([])
+
+    def wall_index(self) -> WallIndex:
+        if self.map.walls_version != self._walls_version:
+            self._walls_version = self.map.walls_version
+            self._index = WallIndex(self.map.walls)
+
+        return self._index
+
+    def visible_tiles(self, origin: tuple[int, int], radius: int) -> list[tuple[int, int]]:
+        """Every tile within radius moves of origin which isn't hidden behind a wall, including origin
+
+        Args:
+            origin (tuple[int, int]): Tile being looked from
+            radius (int): Maximum distance in tiles
+
+        Returns:
+            list[tuple[int, int]]: Visible tiles within the grid
+        """
+        grid = self.map.grid
+        tiles = grid.within_radius(*origin, radius)
+        if not tiles or not self.map.walls:
+            return tiles
+
+        xs = [x for x, _ in tiles]
+        ys = [y for _, y in tiles]
+        (mxs, mys) = grid.map_pos_from_indices(xs, ys)
+        (width, height) = grid.map_tile_size()
+        cxs = [mx + width / 2 for mx in mxs]
+        cys = [my + height / 2 for my in mys]
+
+        segments = self.wall_index().segments_in(min(cxs), min(cys), max(cxs), max(cys))
+        if not segments:
+            return tiles
+
+        viewer = grid.map_center_from_index(*origin)
+        shadows = self.cast_shadows(viewer, segments)
+
+        (vx, vy) = viewer
+        visible = []
+        for tile, cx, cy in zip(tiles, cxs, cys, strict=True):
+            if (cx, cy) != viewer:
+                sector = shadows[_sector(cy - vy, cx - vx)]
+                if sector and any(segments_cross(viewer, (cx, cy), *segment) for segment in sector):
+                    continue
+            visible.append(tile)
+
+        return visible
+
+    @staticmethod
+    def cast_shadows(viewer: Point, segments: list[Segment]) -> list[list[Segment]]:
+        """Sort segments into the angular sectors around viewer which they cover"""
+        (vx, vy) = viewer
+        shadows: list[list[Segment]] = [[] for _ in range(SECTORS)]
+        for segment in segments:
+            ((x1, y1), (x2, y2)) = segment
+            start = math.atan2(y1 - vy, x1 - vx)
+            end = math.atan2(y2 - vy, x2 - vx)
+
+            # Walk the shorter way around from one end of the segment to the other
+            span = (end - start + math.pi) % (2 * math.pi) - math.pi
+            if span < 0:
+                (start, span) = (end, -span)
+
+            first = _sector_of_angle(start)
+            last = first + int(span / (2 * math.pi) * SECTORS) + 1
+            for sector in range(first, last + 1):
+                shadows[sector % SECTORS].append(segment)
+
+        return shadows
+
+
+def _sector_of_angle(angle: float) -> int:
+    return int((angle + math.pi) / (2 * math.pi) * SECTORS) % SECTORS
+
+
+def _sector(dy: float, dx: float) -> int:
+    return _sector_of_angle(math.atan2(dy, dx))
@@ -0,0 +1,159 @@
+import itertools
+import math
+from collections.abc import Iterable, Sequence
+
+Point = tuple[float, float]
+Segment = tuple[Point, Point]
+
+# Edge length in map pixels of the cells segments are bucketed into
+CELL_SIZE = 256.0
+
+
+def _cross(o: Point, a: Point, b: Point) -> float:
+    return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+
+def segments_cross(p1: Point, p2: Point, q1: Point, q2: Point) -> bool:
+    """Does segment p1-p2 cross or touch segment q1-q2? Collinear segments are not considered crossing"""
+    d1 = _cross(q1, q2, p1)
+    d2 = _cross(q1, q2, p2)
+    d3 = _cross(p1, p2, q1)
+    d4 = _cross(p1, p2, q2)
+
+    if d1 == 0 and d2 == 0:
+        return False
+
+    return d1 * d2 <= 0 and d3 * d4 <= 0
+
+
+class _CellGrid:
+    """Uniform grid of buckets over the map, each holding the keys of the items overlapping the cell"""
+
+    def __init__(self, cell_size: float):
+        self.cell_size = cell_size
+        self.cells: dict[tuple[int, int], set] = {}
+
+    def cell_range(self, left: float, bottom: float, right: float, top: float) -> tuple[range, range]:
+        size = self.cell_size
+        return (
+            range(math.floor(left / size), math.floor(right / size) + 1),
+            range(math.floor(bottom / size), math.floor(top / size) + 1),
+        )
+
+    def insert(self, key, left: float, bottom: float, right: float, top: float) -> None:
+        (columns, rows) = self.cell_range(left, bottom, right, top)
+        for column in columns:
+            for row in rows:
+                self.cells.setdefault((column, row), set()).add(key)
+
+    def discard(self, key, left: float, bottom: float, right: float, top: float) -> None:
+        (columns, rows) = self.cell_range(left, bottom, right, top)
+        for column in columns:
+            for row in rows:
+                cell = self.cells.get((column, row))
+                if cell is None:
+                    continue
+                cell.discard(key)
+                if not cell:
+                    del self.cells[(column, row)]
+
+    def query(self, left: float, bottom: float, right: float, top: float) -> set:
+        (columns, rows) = self.cell_range(left, bottom, right, top)
+        if len(columns) * len(rows) > len(self.cells):
+            # Rectangle covers more cells than are occupied, walk the occupied ones instead
+            return {
+                key for (column, row), keys in self.cells.items() if column in columns and row in rows for key in keys
+            }
+
+        found = set()
+        for column in columns:
+            for row in rows:
+                found.update(self.cells.get((column, row), ()))
+        return found
+
+
+class WallIndex:
+    """Spatial index of the wall segments of a map
+
+    Segments are the consecutive point pairs of every wall polyline, in map (source image) pixels. The
+    segment from point i to point i + 1 of polyline p is stored under the key (p, i), the index is rebuilt
+    when the walls change.
+    """
+
+    def __init__(self, walls: Iterable[Sequence[Point]] = (), cell_size: float = CELL_SIZE):
+        self.grid = _CellGrid(cell_size)
+        self.segments: dict[tuple[int, int], Segment] = {}
+
+        for polyline_index, polyline in enumerate(walls):
+            for point_index, (start, end) in enumerate(itertools.pairwise(polyline)):
+                self.add((polyline_index, point_index), (tuple(start), tuple(end)))
+
+    @staticmethod
+    def _bounds(segment: Segment) -> tuple[float, float, float, float]:
+        ((x1, y1), (x2, y2)) = segment
+        return (min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+
+    def add(self, key: tuple[int, int], segment: Segment) -> None:
+        self.segments[key] = segment
+        self.grid.insert(key, *self._bounds(segment))
+
+    def segments_in(self, left: float, bottom: float, right: float, top: float) -> list[Segment]:
+        """Segments whose bounding box may overlap the given rectangle of the map"""
+        return [self.segments[key] for key in sorted(self.grid.query(left, bottom, right, top))]
+
+
+class VertexIndex:
+    """Spatial index of the points of a map's wall polylines
+
+    Point i of polyline p is stored under the key (p, i), moving a point only touches the cells it leaves
+    and enters.
+    """
+
+    def __init__(self, walls: Iterable[Sequence[Point]] = (), cell_size: float = CELL_SIZE):
+        self.grid = _CellGrid(cell_size)
+        self.points: dict[tuple[int, int], Point] = {}
+
+        for polyline_index, polyline in enumerate(walls):
+            for point_index, point in enumerate(polyline):
+                self.add((polyline_index, point_index), tuple(point))
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def add(self, key: tuple[int, int], point: Point) -> None:
+        self.remove(key)
+        self.points[key] = point
+        self.grid.insert(key, point[0], point[1], point[0], point[1])
+
+    def move(self, key: tuple[int, int], point: Point) -> None:
+        self.add(key, point)
+
+    def remove(self, key: tuple[int, int]) -> None:
+        point = self.points.pop(key, None)
+        if point is not None:
+            self.grid.discard(key, point[0], point[1], point[0], point[1])
+
+    def nearest(self, point: Point, max_distance: float, exclude_polyline: int | None = None) -> tuple[int, int] | None:
+        """Key of the point closest to point, None if there is none within max_distance
+
+        Args:
+            point (Point): Position in map pixels
+            max_distance (float): Search radius in map pixels
+            exclude_polyline (int | None, optional): Polyline whose points are ignored, such as the one of the
+                point being dragged
+
+        Returns:
+            tuple[int, int] | None: Key of the closest point
+        """
+        (x, y) = point
+        best = None
+        best_distance = max_distance
+        for key in self.grid.query(x - max_distance, y - max_distance, x + max_distance, y + max_distance):
+            if key[0] == exclude_polyline:
+                continue
+            (px, py) = self.points[key]
+            distance = math.hypot(px - x, py - y)
+            if distance <= best_distance:
+                (best, best_distance) = (key, distance)
+
+        return best
@@ -4,7 +4,6 @@ from kivy.graphics import Rectangle
 
 # pylint: disable=no-name-in-module
 from kivy.graphics.texture import Texture
-from kivy.uix.image import Image
 
 if TYPE_CHECKING:
     from kivy.uix.widget import Widget
@@ -20,17 +19,17 @@ class Window:
         self.region_width = 0
         self.region_height = 0
 
-    def get_sub_texture(self, image: Image) -> Texture:
-        """Get a sub-texture of the given image which is zoomed, shifted, and cropped to be
+    def get_sub_texture(self, texture: Texture) -> Texture:
+        """Get a sub-texture of the given map texture which is zoomed, shifted, and cropped to be
         displayed within the current window.
 
         Args:
-            image (Image): Image object for the map
+            texture (Texture): Full texture of the map
 
         Returns:
             Texture: Scaled region of the map for drawing on self.surface's canvas
         """
-        (image_width, image_height) = image.texture.size
+        (image_width, image_height) = texture.size
 
         self.region_width = min(self.surface.width * self.zoom, image_width - self.x * self.zoom)
         if self.x < 0:
@@ -40,7 +39,7 @@ class Window:
         if self.y < 0:
             self.region_height += self.y * self.zoom
 
-        return image.texture.get_region(
+        return texture.get_region(
             max(0, self.x) * self.zoom,
             max(0, self.y) * self.zoom,
             self.region_width,
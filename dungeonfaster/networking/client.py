@@ -1,22 +1,113 @@
+import asyncio
 import os
-import socket
-import struct
-import threading
-from select import EPOLLHUP, EPOLLIN, epoll
+import zlib
+from dataclasses import dataclass
+
+from kivy.clock import Clock
 
 from dungeonfaster.gui.mapView import MapView
-from dungeonfaster.model.campaign import Campaign
+from dungeonfaster.model.assets import AssetInfo, AssetStore, file_digest
+from dungeonfaster.model.campaign import FILES_PATH, Campaign
+from dungeonfaster.model.campaignFile import BINARY_EXTENSION
 from dungeonfaster.networking.comms import Comms
+from dungeonfaster.networking.protocol import (
+    DELTA,
+    FILE,
+    FILE_CHUNK,
+    POS,
+    SNAPSHOT,
+    ProtocolError,
+    decode_delta,
+    decode_file,
+    decode_pos,
+    decode_snapshot,
+    encode_file_request,
+    encode_hello,
+    encode_sync_request,
+    read_frame,
+)
+from dungeonfaster.networking.transport import EventLoopThread
 
 USERS_DIR = os.path.join(os.environ["DUNGEONFASTER_PATH"], "users")
-RECV_SIZE = 256
+
+# Times a chunk failing its checksum is requested again before the file is given up on
+MAX_CHUNK_RETRIES = 3
+# Files requested at a time in the background, few enough that urgent requests aren't queued behind many
+MAX_FETCHES = 2
+
+
+def campaign_path(username: str) -> str:
+    """Where the campaign received by a player is kept"""
+    return os.path.join(USERS_DIR, f"{username}{BINARY_EXTENSION}")
+
+
+def _write_snapshot(path: str, compressed: memoryview):
+    try:
+        contents = zlib.decompress(compressed)
+    except zlib.error as error:
+        raise ProtocolError(f"Corrupt snapshot: {error}") from error
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Replaced whole, a resync never leaves the campaign half written
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as destination:
+        destination.write(contents)
+    os.replace(temp_path, path)
+
+
+def _write_chunk(path: str, offset: int, data: memoryview):
+    with open(path, "r+b" if offset else "wb") as destination:
+        destination.seek(offset)
+        destination.write(data)
+
+
+@dataclass
+class Transfer:
+    """A file being received, chunk by chunk, into temp_path"""
+
+    reference: str
+    info: AssetInfo | None
+    module_path: str = ""
+    temp_path: str = ""
+    # Offset of the next chunk expected, everything before it is written and checked
+    offset: int = 0
+    retries: int = 0
+
+
+@dataclass
+class FetchProgress:
+    files_done: int = 0
+    files_total: int = 0
+    # Sizes from the campaign's manifest, files without an entry only count once received
+    bytes_done: int = 0
+    bytes_total: int = 0
+
+
+def _is_current(reference: str, info: AssetInfo | None) -> bool:
+    store = AssetStore()
+    if info is None:
+        # Without a manifest entry any local copy is assumed to be current
+        return os.path.exists(store.path(reference))
+    return store.matches(reference, info)
+
+
+def _install(transfer: Transfer) -> bool:
+    """Replace the local copy of a file by the one received, if it is what the campaign references"""
+    info = transfer.info
+    if info is not None and (
+        os.path.getsize(transfer.temp_path) != info.size or file_digest(transfer.temp_path) != info.digest
+    ):
+        print(f"ERROR: File does not match the campaign: {transfer.module_path}")
+        os.remove(transfer.temp_path)
+        return False
+
+    os.replace(transfer.temp_path, transfer.module_path)
+    return True
 
 
 class CampaignClient(Comms):
     campaign: Campaign
-    sock: socket.socket
-    server: socket.socket
-    thread: threading.Thread
+    writer: asyncio.StreamWriter | None
 
     established: bool
 
@@ -26,112 +117,252 @@ class CampaignClient(Comms):
 
         self.player_view = player_view
         self.username = name
+        self.writer = None
+        # Sequence number of the last delta applied, and whether a snapshot was asked for after a missed one
+        self.seq = 0
+        self.resyncing = False
+        # Files being received by path relative to DUNGEONFASTER_PATH, and files waiting to be requested,
+        # in the order they will be, only touched on the transport's loop
+        self.transfers: dict[str, Transfer] = {}
+        self.waiting: dict[str, Transfer] = {}
+        self.progress = FetchProgress()
+        self.fetch_lock = asyncio.Lock()
+
+        self.transport = EventLoopThread("campaign-client")
         # TODO: Add on_update function arg to Campaign to update parent
 
     def start_client(self, address: tuple[str, int]):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.running = True
+        self.transport.start()
+        self.transport.submit(self._run_client(*address))
 
-        self.thread = threading.Thread(target=self._run_client, args=(address))
-        self.thread.start()
-
-    def _run_client(self, addr: str, port: int):
-        self.sock.connect((addr, port))
-        self._establish_session()
-
-        with epoll(sizehint=5) as poller:
-            poller.register(self.sock, EPOLLIN | EPOLLHUP)
-
-            while self.running:
-                events: list[tuple[int, int]] = poller.poll(0.5)
-
-                for fd, event in events:
-                    if fd == self.sock.fileno():
-                        if event & EPOLLIN:
-                            self._receive_update(self.sock)
-                        if event & EPOLLHUP:
-                            self._shutdown()
-
-    def _establish_session(self):
-        campaign_path = os.path.join(USERS_DIR, f"{self.username}.json")
-
+    async def _run_client(self, addr: str, port: int):
+        try:
+            (reader, self.writer) = await asyncio.open_connection(addr, port)
+            if not await self._establish_session(reader):
+                print("closed by server")
+                return
+            self._to_kivy(self.player_view.on_session, True)
+
+            while True:
+                (kind, body) = await read_frame(reader)
+                await self._receive_update(kind, body)
+        except (asyncio.IncompleteReadError, OSError, ProtocolError) as error:
+            print(f"Disconnected from server: {error!r}")
+        finally:
+            self._shutdown()
+            self._to_kivy(self.player_view.on_session, False)
+
+    async def _establish_session(self, reader: asyncio.StreamReader) -> bool:
         # Send username and password
-        self.sock.send(f"{self.username}:password".encode())
+        self.writer.write(encode_hello(self.username, "password"))
+        await self.writer.drain()
 
-        # Receive campaign json from server
-        self._receive_campaign(campaign_path)
-
-        self.message_buffers[self.sock.fileno()] = b""
+        # The server starts with a snapshot of the campaign
+        (kind, body) = await read_frame(reader)
+        if kind != SNAPSHOT:
+            return False
 
+        await self._receive_snapshot(body)
         self.established = True
+        return True
+
+    async def _receive_update(self, kind: int, body: memoryview):
+        if kind == POS:
+            (player, pos) = decode_pos(body)
+            # print(f"Updated for {player}: {pos}")
+            self.player_view.receive_player_pos(player, pos)
+        elif kind == DELTA:
+            self._receive_delta(body)
+        elif kind == SNAPSHOT:
+            await self._receive_snapshot(body)
+            self._to_kivy(self.player_view.on_snapshot, campaign_path(self.username))
+        elif kind == FILE:
+            await self._receive_file(body)
+
+    # ==== State sync ==== #
+
+    async def _receive_snapshot(self, body: memoryview):
+        (seq, compressed) = decode_snapshot(body)
+        await asyncio.to_thread(_write_snapshot, campaign_path(self.username), compressed)
+        self.seq = seq
+        self.resyncing = False
+
+    def _receive_delta(self, body: memoryview):
+        """Apply deltas in sequence, any missing one means the campaign is out of date and is sent again"""
+        (seq, kind, update) = decode_delta(body)
+        if self.resyncing or seq <= self.seq:
+            # Included in the snapshot on its way
+            return
+
+        if seq != self.seq + 1:
+            print(f"Missed changes {self.seq + 1} to {seq - 1}, resyncing")
+            self.resyncing = True
+            self._write(encode_sync_request())
+            return
+
+        self.seq = seq
+        self._to_kivy(self.player_view.receive_delta, kind, update)
+
+    # ==== Files ==== #
+
+    def fetch_files(self, files: dict[str, AssetInfo | None], urgent: bool = False):
+        """Receive the files which are missing or out of date, without waiting for them
+
+        Files are requested a few at a time in the order given, after files queued earlier. Urgent files
+        are requested at once. The player view's on_file_received is called with each file once it is
+        current, and on_fetch_progress as data arrives. Files interrupted by a lost connection are
+        resumed the next time they are fetched.
+
+        Args:
+            files (dict[str, AssetInfo | None]): Manifest entries by reference, relative to the campaign
+                files directory
+        """
+        self.transport.submit(self._queue_fetches(files, urgent))
+
+    async def _queue_fetches(self, files: dict[str, AssetInfo | None], urgent: bool):
+        if urgent:
+            await self._queue_files(files, urgent)
+        else:
+            # Keeps background files in the order they were fetched in
+            async with self.fetch_lock:
+                await self._queue_files(files, urgent)
+
+    async def _queue_files(self, files: dict[str, AssetInfo | None], urgent: bool):
+        for reference, info in files.items():
+            file = os.path.join(FILES_PATH, reference)
+            if file in self.transfers:
+                continue
+            if file in self.waiting:
+                if urgent:
+                    self._start_transfer(file, self.waiting.pop(file))
+                continue
+
+            transfer = Transfer(reference, info)
+            self.progress.files_total += 1
+            self.progress.bytes_total += info.size if info is not None else 0
+            # Queued while it is checked, so it isn't queued twice meanwhile
+            self.waiting[file] = transfer
+
+            # Legacy files are hashed to be checked
+            current = await asyncio.to_thread(_is_current, reference, info)
+            if self.waiting.get(file) is not transfer:
+                # Requested meanwhile
+                continue
+
+            if current:
+                del self.waiting[file]
+                self.progress.bytes_done += info.size if info is not None else 0
+                self._file_done(transfer, True)
+            elif urgent:
+                self._start_transfer(file, self.waiting.pop(file))
+
+        self._fetch_next()
+        self._report_progress()
+
+    def _fetch_next(self):
+        while self.waiting and len(self.transfers) < MAX_FETCHES:
+            file = next(iter(self.waiting))
+            self._start_transfer(file, self.waiting.pop(file))
+
+    def _start_transfer(self, file: str, transfer: Transfer):
+        """Request a file, from the end of what an earlier interrupted transfer left behind"""
+        root = os.path.realpath(os.environ["DUNGEONFASTER_PATH"])
+        transfer.module_path = os.path.realpath(os.path.join(root, file))
+        if os.path.commonpath((root, transfer.module_path)) != root:
+            self._file_done(transfer, False)
+            return
+
+        # Written next to the file, only replacing the old version once it is checked
+        transfer.temp_path = f"{transfer.module_path}.part"
+        try:
+            # Chunks are only written once checked, but the last one may have been cut short
+            size = os.path.getsize(transfer.temp_path)
+            transfer.offset = (size - 1) // FILE_CHUNK * FILE_CHUNK if size else 0
+            os.truncate(transfer.temp_path, transfer.offset)
+        except OSError:
+            transfer.offset = 0
+        os.makedirs(os.path.dirname(transfer.module_path), exist_ok=True)
+
+        print(f"file - {file}")
+        self.progress.bytes_done += transfer.offset
+        self.transfers[file] = transfer
+        self._write(encode_file_request(file, transfer.offset))
+
+    async def _receive_file(self, body: memoryview):
+        (file, chunk) = decode_file(body)
+        transfer = self.transfers.get(file)
+        if transfer is None:
+            return
+
+        if chunk is None:
+            print(f"ERROR: File not found: {transfer.module_path}")
+            self._file_done(self.transfers.pop(file), False)
+            return
+
+        if chunk.offset != transfer.offset:
+            if chunk.size < transfer.offset:
+                # What an earlier transfer left is longer than the file, start over
+                self.progress.bytes_done -= transfer.offset
+                transfer.offset = 0
+                self._write(encode_file_request(file))
+            # Otherwise what is left of a response to a request made again
+            return
+
+        if zlib.crc32(chunk.data) != chunk.crc:
+            transfer.retries += 1
+            if transfer.retries > MAX_CHUNK_RETRIES:
+                print(f"ERROR: Chunk at {chunk.offset} of {file} is corrupt")
+                self._file_done(self.transfers.pop(file), False)
+                return
+            self._write(encode_file_request(file, chunk.offset))
+            return
 
-    def _receive_campaign(self, campaign_path):
-        with open(campaign_path, "wb") as user_file:
-            buf = self.sock.recv(RECV_SIZE)
-            total = 0
-            while len(buf) == RECV_SIZE:
-                user_file.write(buf)
-                buf = self.sock.recv(RECV_SIZE)
-                total += len(buf)
+        await asyncio.to_thread(_write_chunk, transfer.temp_path, chunk.offset, chunk.data)
+        transfer.offset += len(chunk.data)
+        self.progress.bytes_done += len(chunk.data)
+        if transfer.info is None:
+            self.progress.bytes_total += len(chunk.data)
 
-            if total == 0:
-                print("closed by server")
-                self.running = False
-                return
+        if transfer.offset >= chunk.size:
+            del self.transfers[file]
+            self._file_done(transfer, await asyncio.to_thread(_install, transfer))
+        else:
+            self._report_progress()
 
-            user_file.write(buf)
+    def _file_done(self, transfer: Transfer, received: bool):
+        self.progress.files_done += 1
+        self._to_kivy(self.player_view.on_file_received, transfer.reference, received)
+        self._fetch_next()
+        self._report_progress()
 
-            user_file.close()
+    def _report_progress(self):
+        progress = FetchProgress(**vars(self.progress))
+        self._to_kivy(self.player_view.on_fetch_progress, progress)
 
-            # TODO: Receive any missing files
+    def _to_kivy(self, callback, *args):
+        """Call callback(*args) on the Kivy thread, unless the view has been connected again meanwhile"""
 
-    def _receive_update(self, sock: socket.socket):
-        updates = self._receive(sock)
-        for update in updates:
-            message: list[str] = update.split(":")
+        def run(dt):
+            if self.player_view.comms is self:
+                callback(*args)
 
-            command = message[0]
+        Clock.schedule_once(run)
 
-            if command == "POS":
-                player: str = message[1]
-                pos: tuple[float, float] = eval(message[2])
-                # print(f"Updated for {player}: {pos}")
-                self.player_view.receive_player_pos(player, pos)
-            if command == "INDEX":
-                player: str = message[1]
-                index: tuple[int, int] = eval(message[2])
-                # print(f"Updated for {player}: {pos}")
-                self.player_view.receive_player_index(player, index)
+    def _write(self, frame: bytes):
+        if self.writer is not None and not self.writer.is_closing():
+            self.writer.write(frame)
 
-    def send_update(self, message: str):
-        self.sock.send(message.encode() + b"|")
+    def send_update(self, frame: bytes):
+        self.transport.call(self._write, frame)
+
+    def _shutdown(self):
+        self.running = False
+        if self.writer is not None:
+            self.writer.close()
+        # Requested again, and resumed, by the next fetch
+        self.waiting.clear()
+        self.transfers.clear()
 
     def stop(self):
-        pass
-
-    def request_files(self, files_needed: list[str]):
-        for file in files_needed:
-            module_path = os.path.join(os.environ["DUNGEONFASTER_PATH"], file)
-            print(f"file - {file}")
-            if not os.path.exists(module_path):
-                self.sock.send(f"FILE:{file}|".encode())
-
-                # Receive file - first four bytes are size
-                size_bytes: bytes = self.sock.recv(struct.calcsize("!I"))
-                if size_bytes == b"\xff\xff\xff\xff":
-                    print(f"ERROR: File not found: {module_path}")
-                    return
-
-                file_size = struct.unpack("!I", size_bytes)[0]
-                # Receive loop for file contents
-                with open(module_path, "wb+") as module_file:
-                    nrecv = 0
-                    while nrecv < file_size:
-                        recv_buf = self.sock.recv(min(1024, file_size - nrecv))
-                        if len(recv_buf) == 0:
-                            print("Server closed mid stream")
-                            return
-                        nrecv += len(recv_buf)
-
-                        # Write buffer to file
-                        module_file.write(recv_buf)
+        self.transport.stop()
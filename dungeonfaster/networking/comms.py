@@ -1,23 +1,15 @@
-import socket
 from abc import ABC, abstractmethod
 
+from dungeonfaster.networking.transport import EventLoopThread
 
-class Comms(ABC):
-    # Buffers for handling partila messages: socket.fileno() -> bytes
-    message_buffers: dict[int, bytes] = {}  # noqa: RUF012
-
-    def _receive(self, sock: socket.socket) -> list[str]:
-        buffer = self.message_buffers[sock.fileno()]
-
-        buffer = buffer + sock.recv(1024)
-        updates = buffer.decode("utf-8").split("|")
-        self.message_buffers[sock.fileno()] = updates[-1].encode("utf-8")
 
-        return updates[:-1]
+class Comms(ABC):
+    # Runs the connections, received updates are handed to the Kivy thread with Clock.schedule_once
+    transport: EventLoopThread
 
     @abstractmethod
-    def send_update(self, message: str):
-        pass
+    def send_update(self, frame: bytes):
+        """Send a frame to the peers, from the Kivy thread"""
 
     @abstractmethod
     def stop(self):
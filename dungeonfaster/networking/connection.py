@@ -0,0 +1,214 @@
+import asyncio
+import contextlib
+from collections import deque
+from collections.abc import Coroutine, Hashable
+from typing import Any, NamedTuple
+
+# Bytes waiting for a client above which frames with a key are held back rather than queued
+MAX_BACKLOG = 256 * 1024
+# Bytes waiting for a client above which it is disconnected rather than sent anything else
+DISCONNECT_BACKLOG = 64 * 1024 * 1024
+# Bytes the transport buffers before the writer waits, frames still in the queue can be coalesced
+WRITE_BUFFER_HIGH = 64 * 1024
+
+
+class FileRegion(NamedTuple):
+    """Part of a file sent straight from disk with sendfile, in place of bytes"""
+
+    path: str
+    offset: int
+    count: int
+
+
+class SlowConsumerError(ConnectionError):
+    """A client stopped reading while frames which can't be dropped kept being sent to it"""
+
+
+class ConnectionStats:
+    """Outbound counters of a connection, for spotting clients which can't keep up"""
+
+    def __init__(self):
+        self.frames_queued = 0
+        self.bytes_sent = 0
+        # Frames replaced by a newer frame with the same key before being sent
+        self.coalesced = 0
+        # Frames held back because the backlog was over MAX_BACKLOG
+        self.deferred = 0
+        self.peak_backlog = 0
+
+    def __repr__(self) -> str:
+        return (
+            f"queued {self.frames_queued} frames, sent {self.bytes_sent} B, coalesced {self.coalesced}, "
+            f"deferred {self.deferred}, peak backlog {self.peak_backlog} B"
+        )
+
+
+class Connection:
+    """The streams of a client connection, with an outbound queue in front of its writer
+
+    Frames are queued without waiting and written by the connection's writer task, which only hands the
+    transport more once it has drained below WRITE_BUFFER_HIGH. Frames queued with a key replace a frame
+    with the same key still waiting in the queue, which suits updates where only the latest matters.
+    While the backlog is over max_backlog they are held back instead, one per key, and queued once it
+    has drained, so the latest one is always delivered. Frames without a key are always delivered,
+    unless the backlog reaches disconnect_backlog, in which case the client is considered gone.
+
+    File data is queued as FileRegions and sent with loop.sendfile, which copies it from the page cache
+    to the socket without passing through Python. It is counted apart from the backlog since it isn't
+    held in memory: senders pace themselves with wait_for_file_room instead.
+
+    Used from the event loop thread only.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        max_backlog: int = MAX_BACKLOG,
+        disconnect_backlog: int = DISCONNECT_BACKLOG,
+    ):
+        self.reader = reader
+        self.writer = writer
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+
+        self.max_backlog = max_backlog
+        self.disconnect_backlog = disconnect_backlog
+        self.stats = ConnectionStats()
+
+        # [key, data] of each frame part waiting to be written
+        self.outbound: deque[list] = deque()
+        self.pending: dict[Hashable, list] = {}
+        # Latest frame of each key held back while the backlog is over max_backlog
+        self.held: dict[Hashable, bytes] = {}
+        self.queued = 0
+        self.file_queued = 0
+        self.ready = asyncio.Event()
+        # Set whenever a queued part has been written
+        self.progress = asyncio.Event()
+        self.writer_task = asyncio.create_task(self._write_queued())
+        # Tasks sending on this connection, cancelled when it closes
+        self.tasks: set[asyncio.Task] = set()
+
+    @property
+    def backlog(self) -> int:
+        """Bytes waiting for the client, queued or buffered by the transport"""
+        return self.queued + self.writer.transport.get_write_buffer_size()
+
+    def send(self, *parts: bytes | FileRegion, key: Hashable | None = None) -> None:
+        """Queue a frame, given as one or more consecutive parts
+
+        Args:
+            key (Hashable | None, optional): Frames with the same key supersede each other
+
+        Raises:
+            SlowConsumerError: The backlog is over disconnect_backlog
+        """
+        size = sum(len(part) for part in parts if not isinstance(part, FileRegion))
+        backlog = self.backlog
+        if key is not None:
+            entry = self.pending.get(key)
+            if entry is not None and len(parts) == 1:
+                self.queued += size - len(entry[1])
+                entry[1] = parts[0]
+                self.stats.coalesced += 1
+                return
+            if len(parts) == 1 and (key in self.held or backlog + size > self.max_backlog):
+                if key in self.held:
+                    self.stats.coalesced += 1
+                else:
+                    self.stats.deferred += 1
+                self.held[key] = parts[0]
+                self.ready.set()
+                return
+        else:
+            if backlog > self.disconnect_backlog:
+                raise SlowConsumerError(f"{backlog} bytes waiting for client")
+            # Frames queued before this one go out before it, newer ones of the same key go after it
+            self._queue_held()
+            self.pending.clear()
+
+        for part in parts:
+            entry = [key, part]
+            self.outbound.append(entry)
+        if key is not None and len(parts) == 1:
+            self.pending[key] = entry
+
+        self.queued += size
+        self.file_queued += sum(part.count for part in parts if isinstance(part, FileRegion))
+        self.stats.peak_backlog = max(self.stats.peak_backlog, backlog + size)
+        self.stats.frames_queued += 1
+        self.ready.set()
+
+    async def _write_queued(self) -> None:
+        try:
+            while True:
+                await self.ready.wait()
+                while self.outbound or self.held:
+                    if self.held and (not self.outbound or self.backlog <= self.max_backlog):
+                        self._queue_held()
+
+                    entry = self.outbound.popleft()
+                    (key, data) = entry
+                    if key is not None and self.pending.get(key) is entry:
+                        # Handed to the transport, can't be swapped any more
+                        del self.pending[key]
+                    if isinstance(data, FileRegion):
+                        await self._send_region(data)
+                    else:
+                        self.queued -= len(data)
+                        self.writer.write(data)
+                        self.stats.bytes_sent += len(data)
+                        await self.writer.drain()
+                    self.progress.set()
+                self.ready.clear()
+        except OSError:
+            # A frame may be cut short, the read loop sees the connection is gone and closes it
+            self.abort()
+
+    async def _send_region(self, region: FileRegion) -> None:
+        # Opening may wait on the disk, which would hold up every other client
+        source = await asyncio.to_thread(open, region.path, "rb")
+        with source:
+            sent = await asyncio.get_running_loop().sendfile(self.writer.transport, source, region.offset, region.count)
+        self.file_queued -= region.count
+        self.stats.bytes_sent += sent
+        if sent < region.count:
+            raise ConnectionError(f"{region.path} shrank while being sent")
+
+    async def wait_for_file_room(self, limit: int) -> None:
+        """Wait until at most limit bytes of file data are queued"""
+        while self.file_queued > limit:
+            self.progress.clear()
+            await self.progress.wait()
+
+    def spawn(self, coro: Coroutine[Any, Any, Any]) -> asyncio.Task:
+        """Run a coroutine sending on this connection alongside its read loop"""
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return task
+
+    def _queue_held(self) -> None:
+        for key, data in self.held.items():
+            entry = [key, data]
+            self.outbound.append(entry)
+            self.pending[key] = entry
+            self.queued += len(data)
+        self.held.clear()
+
+    def abort(self) -> None:
+        """Drop the connection without flushing, which ends the client's read loop with an error"""
+        self.writer.transport.abort()
+
+    async def close(self) -> None:
+        for task in list(self.tasks):
+            task.cancel()
+        self.writer_task.cancel()
+        self.outbound.clear()
+        self.pending.clear()
+        self.held.clear()
+        self.queued = 0
+
+        self.writer.close()
+        with contextlib.suppress(OSError):
+            await self.writer.wait_closed()
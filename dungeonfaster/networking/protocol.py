@@ -0,0 +1,318 @@
+"""Binary framing of the messages exchanged by CampaignServer and CampaignClient
+
+Every message is a frame:
+
+    header:  body length (u32), message type (u8)
+    body:    fields packed with struct, integers big-endian
+
+Strings are a u16 length followed by utf-8 bytes. Token positions are map pixels as int32 in 1/16 pixel
+steps, tile indices are int16 pairs. Sets of tiles are a bitmap of their bounding box, one bit per tile,
+row by row and most significant bit first. The fog of a whole map is run-length encoded as in binary
+campaign files.
+
+Files are sent as FILE frames of at most FILE_CHUNK bytes each, carrying their offset, the size of the
+whole file and a CRC-32 of their data, so a client can check every chunk as it arrives and resume an
+interrupted transfer by requesting the file from the end of the chunks it already has.
+
+Clients are synced with a SNAPSHOT of the campaign, then every change to it is sent as a DELTA wrapping
+the frame of the change with a sequence number. The snapshot carries the sequence number of the last
+change it includes, so a client can tell whether it missed one and ask for a new snapshot.
+
+Frames are read from asyncio streams, one readexactly for the header and one for the body, and fields are
+decoded from a memoryview of the body without copying.
+"""
+
+import asyncio
+import struct
+from collections.abc import Iterable
+from typing import NamedTuple
+
+from dungeonfaster.model.campaignFile import decode_fog, encode_fog_bits
+from dungeonfaster.model.fog import FogSnapshot
+
+HEADER = struct.Struct("!IB")
+
+# Client -> server: user name, password
+HELLO = 1
+# Server -> client: sequence number (u64), campaign as players see it, binary campaign file compressed with zlib
+SNAPSHOT = 2
+# Either way: player name, token position while it is dragged
+POS = 3
+# Either way: player name, tile index the token was dropped on
+INDEX = 4
+# Client -> server: path of a campaign file, relative to DUNGEONFASTER_PATH, offset (u64) to send it from
+FILE_REQUEST = 5
+# Server -> client: path, found (u8), then if found: file size (u64), offset (u64), CRC-32 (u32), data
+FILE = 6
+# Server -> client: sequence number (u64), frame of a change to the campaign
+DELTA = 7
+# Client -> server: nothing, the client missed a delta and needs a new snapshot
+SYNC_REQUEST = 8
+# Server -> client: location name, change (u8, index in FOG_CHANGES), then for reveal and flip the tiles
+FOG = 9
+# Server -> client: tile index the party moved to
+PARTY = 10
+# Server -> client: location name the party arrived at, its grid width and height (u32), then its fog
+LOCATION = 11
+
+# Changes to the hidden tiles of a map, as passed to Map.apply
+FOG_CHANGES = ("reveal", "flip", "hide_all", "reveal_all", "invert")
+
+POSITION = struct.Struct("!ii")
+TILE = struct.Struct("!hh")
+POSITION_STEPS = 16
+OFFSET = struct.Struct("!Q")
+SEQ = struct.Struct("!Q")
+CHUNK = struct.Struct("!QQI")
+# Bounding box of a tile bitmap: left, bottom, width and height in tiles
+BOX = struct.Struct("!HHHH")
+GRID_SIZE = struct.Struct("!II")
+
+# Bytes of file data in a FILE frame, requests are answered from a multiple of it
+FILE_CHUNK = 1 << 20
+
+# Frames larger than this are refused, the connection is corrupt or hostile
+MAX_FRAME = 1 << 30
+
+
+class ProtocolError(ValueError):
+    """A peer sent a frame which can't be decoded"""
+
+
+# ==== Encoding ==== #
+
+
+def frame(kind: int, *fields: bytes) -> bytes:
+    body = b"".join(fields)
+    return HEADER.pack(len(body), kind) + body
+
+
+def pack_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    return struct.pack("!H", len(encoded)) + encoded
+
+
+def unpack_string(body: memoryview, offset: int = 0) -> tuple[str, int]:
+    if offset + 2 > len(body):
+        raise ProtocolError("Truncated string")
+    (length,) = struct.unpack_from("!H", body, offset)
+    offset += 2
+    if offset + length > len(body):
+        raise ProtocolError("Truncated string")
+    return (str(body[offset : offset + length], "utf-8"), offset + length)
+
+
+def encode_hello(username: str, password: str) -> bytes:
+    return frame(HELLO, pack_string(username), pack_string(password))
+
+
+def decode_hello(body: memoryview) -> tuple[str, str]:
+    (username, offset) = unpack_string(body)
+    (password, _) = unpack_string(body, offset)
+    return (username, password)
+
+
+def encode_pos(player: str, pos: tuple[float, float]) -> bytes:
+    x = round(pos[0] * POSITION_STEPS)
+    y = round(pos[1] * POSITION_STEPS)
+    return frame(POS, pack_string(player), POSITION.pack(x, y))
+
+
+def decode_pos(body: memoryview) -> tuple[str, tuple[float, float]]:
+    (player, offset) = unpack_string(body)
+    try:
+        (x, y) = POSITION.unpack_from(body, offset)
+    except struct.error as error:
+        raise ProtocolError("Truncated position") from error
+    return (player, (x / POSITION_STEPS, y / POSITION_STEPS))
+
+
+def encode_index(player: str, index: tuple[int, int]) -> bytes:
+    return frame(INDEX, pack_string(player), TILE.pack(*index))
+
+
+def decode_index(body: memoryview) -> tuple[str, tuple[int, int]]:
+    (player, offset) = unpack_string(body)
+    try:
+        return (player, TILE.unpack_from(body, offset))
+    except struct.error as error:
+        raise ProtocolError("Truncated tile index") from error
+
+
+def encode_file_request(path: str, offset: int = 0) -> bytes:
+    return frame(FILE_REQUEST, pack_string(path), OFFSET.pack(offset))
+
+
+def decode_file_request(body: memoryview) -> tuple[str, int]:
+    (path, offset) = unpack_string(body)
+    try:
+        return (path, OFFSET.unpack_from(body, offset)[0])
+    except struct.error as error:
+        raise ProtocolError("Truncated file request") from error
+
+
+def encode_file_missing(path: str) -> bytes:
+    return frame(FILE, pack_string(path), b"\x00")
+
+
+def encode_chunk_header(path: str, size: int, offset: int, crc: int, length: int) -> bytes:
+    """Start of a FILE frame carrying length bytes of data, which follow it on the stream"""
+    fields = pack_string(path) + b"\x01" + CHUNK.pack(size, offset, crc)
+    return HEADER.pack(len(fields) + length, FILE) + fields
+
+
+class FileChunk(NamedTuple):
+    size: int
+    offset: int
+    crc: int
+    data: memoryview
+
+
+def decode_file(body: memoryview) -> tuple[str, FileChunk | None]:
+    """Path and chunk of a FILE frame, no chunk if the server doesn't have the file"""
+    (path, offset) = unpack_string(body)
+    if offset >= len(body):
+        raise ProtocolError("Truncated file")
+    if not body[offset]:
+        return (path, None)
+
+    try:
+        (size, chunk_offset, crc) = CHUNK.unpack_from(body, offset + 1)
+    except struct.error as error:
+        raise ProtocolError("Truncated file chunk") from error
+    return (path, FileChunk(size, chunk_offset, crc, body[offset + 1 + CHUNK.size :]))
+
+
+def encode_snapshot(seq: int, compressed: bytes) -> bytes:
+    return frame(SNAPSHOT, SEQ.pack(seq), compressed)
+
+
+def decode_snapshot(body: memoryview) -> tuple[int, memoryview]:
+    """Sequence number and compressed campaign of a SNAPSHOT frame"""
+    try:
+        (seq,) = SEQ.unpack_from(body)
+    except struct.error as error:
+        raise ProtocolError("Truncated snapshot") from error
+    return (seq, body[SEQ.size :])
+
+
+def encode_delta(seq: int, update: bytes) -> bytes:
+    return frame(DELTA, SEQ.pack(seq), update)
+
+
+def decode_delta(body: memoryview) -> tuple[int, int, memoryview]:
+    """Sequence number, message type and body of the frame a DELTA frame wraps"""
+    try:
+        (seq,) = SEQ.unpack_from(body)
+        (length, kind) = HEADER.unpack_from(body, SEQ.size)
+    except struct.error as error:
+        raise ProtocolError("Truncated delta") from error
+    update = body[SEQ.size + HEADER.size :]
+    if len(update) != length:
+        raise ProtocolError("Truncated delta")
+    return (seq, kind, update)
+
+
+def encode_sync_request() -> bytes:
+    return frame(SYNC_REQUEST)
+
+
+def pack_tiles(tiles: Iterable[tuple[int, int]]) -> bytes:
+    tiles = list(tiles)
+    if not tiles:
+        return BOX.pack(0, 0, 0, 0)
+
+    left = min(x for x, _ in tiles)
+    bottom = min(y for _, y in tiles)
+    width = max(x for x, _ in tiles) - left + 1
+    height = max(y for _, y in tiles) - bottom + 1
+
+    bits = bytearray((width * height + 7) // 8)
+    for x, y in tiles:
+        index = (y - bottom) * width + x - left
+        bits[index >> 3] |= 0x80 >> (index & 7)
+    return BOX.pack(left, bottom, width, height) + bits
+
+
+def unpack_tiles(body: memoryview, offset: int = 0) -> list[list[int]]:
+    try:
+        (left, bottom, width, height) = BOX.unpack_from(body, offset)
+    except struct.error as error:
+        raise ProtocolError("Truncated tiles") from error
+    count = width * height
+    bits = body[offset + BOX.size : offset + BOX.size + (count + 7) // 8]
+    if len(bits) < (count + 7) // 8:
+        raise ProtocolError("Truncated tiles")
+
+    tiles = []
+    for byte_index, byte in enumerate(bits):
+        # Most bytes of a sparse set are empty
+        if not byte:
+            continue
+        for bit in range(8):
+            index = byte_index * 8 + bit
+            if byte & (0x80 >> bit) and index < count:
+                tiles.append([left + index % width, bottom + index // width])
+    return tiles
+
+
+def encode_fog_change(location: str, change: str, tiles: Iterable[tuple[int, int]] = ()) -> bytes:
+    code = FOG_CHANGES.index(change)
+    fields = [pack_string(location), bytes([code])]
+    if change in ("reveal", "flip"):
+        fields.append(pack_tiles(tiles))
+    return frame(FOG, *fields)
+
+
+def decode_fog_change(body: memoryview) -> tuple[str, str, list[list[int]]]:
+    """Location, change and tiles of a FOG frame, no tiles for changes to the whole map"""
+    (location, offset) = unpack_string(body)
+    if offset >= len(body) or body[offset] >= len(FOG_CHANGES):
+        raise ProtocolError("Unknown fog change")
+    change = FOG_CHANGES[body[offset]]
+    tiles = unpack_tiles(body, offset + 1) if change in ("reveal", "flip") else []
+    return (location, change, tiles)
+
+
+def encode_party(position: tuple[int, int]) -> bytes:
+    return frame(PARTY, TILE.pack(*position))
+
+
+def decode_party(body: memoryview) -> tuple[int, int]:
+    try:
+        return TILE.unpack_from(body)
+    except struct.error as error:
+        raise ProtocolError("Truncated party position") from error
+
+
+def encode_location(location: str, fog: FogSnapshot) -> bytes:
+    return frame(LOCATION, pack_string(location), GRID_SIZE.pack(fog.width, fog.height), encode_fog_bits(fog.bits))
+
+
+def decode_location(body: memoryview) -> tuple[str, list[list[int]]]:
+    """Location name and hidden tiles of a LOCATION frame"""
+    (location, offset) = unpack_string(body)
+    try:
+        (width, _) = GRID_SIZE.unpack_from(body, offset)
+        return (location, decode_fog(bytes(body[offset + GRID_SIZE.size :]), width))
+    except (struct.error, IndexError) as error:
+        raise ProtocolError("Truncated location") from error
+
+
+# ==== Decoding ==== #
+
+
+async def read_frame(stream: asyncio.StreamReader) -> tuple[int, memoryview]:
+    """Wait for the next frame of a stream
+
+    Raises:
+        asyncio.IncompleteReadError: The peer closed the connection
+        ProtocolError: The frame is too large
+
+    Returns:
+        tuple[int, memoryview]: Message type and body
+    """
+    (length, kind) = HEADER.unpack(await stream.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ProtocolError(f"Frame of {length} bytes is too large")
+    return (kind, memoryview(await stream.readexactly(length)))
@@ -1,155 +1,360 @@
+import asyncio
+import concurrent.futures
 import os
-import socket
-import struct
-import threading
-from select import EPOLLHUP, EPOLLIN, epoll
+import zlib
+from collections.abc import Callable
+from typing import Any
+
+from kivy.clock import Clock
 
 from dungeonfaster.gui.mapView import MapView
-from dungeonfaster.model.campaign import Campaign
+from dungeonfaster.model.assets import chunk_checksums
+from dungeonfaster.model.campaign import FILES_PATH, Campaign
+from dungeonfaster.model.campaignFile import dumps
+from dungeonfaster.model.player import Player
+from dungeonfaster.model.schema import parse_coordinate
 from dungeonfaster.networking.comms import Comms
+from dungeonfaster.networking.connection import Connection, FileRegion, SlowConsumerError
+from dungeonfaster.networking.protocol import (
+    FILE_CHUNK,
+    FILE_REQUEST,
+    HEADER,
+    HELLO,
+    INDEX,
+    POS,
+    SYNC_REQUEST,
+    ProtocolError,
+    decode_file_request,
+    decode_hello,
+    decode_index,
+    decode_pos,
+    encode_chunk_header,
+    encode_delta,
+    encode_file_missing,
+    encode_fog_change,
+    encode_index,
+    encode_location,
+    encode_party,
+    encode_snapshot,
+    frame,
+    read_frame,
+    unpack_string,
+)
+from dungeonfaster.networking.transport import EventLoopThread
+
+# Seconds a new client has to log in
+HANDSHAKE_TIMEOUT = 5.0
+# Bytes of file data queued ahead of the socket for each client, enough to keep a fast link busy
+FILE_WINDOW = 8 * FILE_CHUNK
+
+
+def _compress_snapshot(data: dict[str, Any]) -> bytes:
+    return zlib.compress(dumps(data))
+
+
+def _served_file(file_path: str) -> tuple[str, int] | None:
+    """Absolute path and size of a requested file, None unless it is one of the campaign files
+
+    Campaigns, journals and users are never sent. Touches the disk, so run off the event loop.
+    """
+    data_path = os.environ["DUNGEONFASTER_PATH"]
+    root = os.path.realpath(os.path.join(data_path, FILES_PATH))
+    abs_path = os.path.realpath(os.path.join(data_path, file_path))
+    if os.path.commonpath((root, abs_path)) != root or not os.path.isfile(abs_path):
+        return None
+
+    return (abs_path, os.path.getsize(abs_path))
 
 
 class CampaignServer(Comms):
     map_view: MapView
     campaign: Campaign
-    sock: socket.socket
-    clients: dict[int, socket.socket]
-    thread: threading.Thread
-    poller: epoll
 
     def __init__(self, port=9191):
         self.port = port
+        self.server: asyncio.Server | None = None
 
-        # socket file descriptors to sockets
-        self.clients = {}
-        # socket to player
-        self.players = {}
+        # connection to player, only touched on the transport's loop
+        self.players: dict[Connection, Player] = {}
+        # Deltas published while a snapshot is taken for a connection, with their sequence numbers
+        self.syncing: dict[Connection, list[tuple[int, bytes]]] = {}
+        # Task sending each file a connection requested, a file requested again is sent by a new task
+        self.file_tasks: dict[tuple[Connection, str], asyncio.Task] = {}
+        # Sequence number of the last delta published, only touched on the Kivy thread
+        self.seq = 0
+        # Location, change and tiles of the reveals or flips made since the last frame, sent as one delta
+        self.fog_batch: tuple[str, str, set[tuple[int, int]]] | None = None
 
-        self.running = False
+        self.transport = EventLoopThread("campaign-server")
         # TODO: Add on_update function arg to Campaign to update parent
 
+    @property
+    def running(self) -> bool:
+        return self.transport.running
+
     def start_server(self, map_view: MapView):
+        """Start listening, returns once the port is bound
+
+        Raises:
+            OSError: The port can't be bound
+        """
         self.map_view: MapView = map_view
         self.campaign: Campaign = map_view.campaign
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-        self.sock.bind(("0.0.0.0", self.port))
-        self.sock.listen(5)
-        self.running = True
-
-        self.thread = threading.Thread(target=self._run_server, args=())
-        self.thread.start()
-
-    def _run_server(self):
-        with epoll(sizehint=5) as poller:
-            self.poller = poller
-            poller.register(self.sock, EPOLLIN | EPOLLHUP)
-
-            while self.running:
-                events: list[tuple[int, int]] = poller.poll(0.5)
-                for fd, event in events:
-                    if fd == self.sock.fileno():
-                        if event & EPOLLIN:
-                            self._accept_client(self.sock)
-
-                    elif fd in self.clients:
-                        if event & EPOLLIN:
-                            self._receive_message(self.clients[fd])
-                        elif event & EPOLLHUP:
-                            self._remove_client(self.clients[fd])
-
-    def _accept_client(self, sock: socket.socket):
-        new_client, _ = sock.accept()
-        # Receive username:password
-        user_buf: bytes = new_client.recv(1028)
-        username = user_buf.decode().split(":")[0]
-
-        if username not in [player.name for player in self.campaign.party]:
-            print(f"Invalid user name {username}")
-            new_client.close()
+        self.campaign.on_change = self._campaign_changed
+
+        self.transport.start()
+        try:
+            self.server = self.transport.submit(
+                asyncio.start_server(self._serve_client, "0.0.0.0", self.port, reuse_address=True)
+            ).result()
+        except OSError:
+            self.transport.stop()
+            raise
+
+    async def _serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Log a client in, send it the campaign, then handle what it sends until it leaves
+
+        Each client is served by its own task, a slow client only holds up itself.
+        """
+        player = None
+        try:
+            player = await asyncio.wait_for(self._log_in(reader), HANDSHAKE_TIMEOUT)
+        except (TimeoutError, asyncio.IncompleteReadError, ConnectionError, ProtocolError) as error:
+            print(f"Failed to log in client: {error!r}")
+        finally:
+            # Also when the server stops during the handshake
+            if player is None:
+                writer.close()
+
+        if player is None:
             return
 
-        with open(self.campaign.path, "rb") as campaign_file:
-            campaign_bytes: bytes = campaign_file.read()
-            new_client.send(campaign_bytes)
+        conn = Connection(reader, writer)
+        self.players[conn] = player
+        try:
+            await self._sync(conn)
+
+            while True:
+                (kind, body) = await read_frame(reader)
+                if kind in (POS, INDEX):
+                    self._handle_update(conn, kind, body)
+
+                elif kind == FILE_REQUEST:
+                    (path, offset) = decode_file_request(body)
+                    print(f"File requested: {path} from {offset}")
+                    self._spawn_file(conn, path, offset)
+
+                elif kind == SYNC_REQUEST and conn not in self.syncing:
+                    print(f"Resyncing {player.name}")
+                    conn.spawn(self._sync(conn))
+        except (asyncio.IncompleteReadError, ConnectionError, ProtocolError):
+            pass
+        finally:
+            del self.players[conn]
+            self.syncing.pop(conn, None)
+            await conn.close()
+
+    async def _log_in(self, reader: asyncio.StreamReader) -> Player | None:
+        """Receive user name and password, and find the player logging in"""
+        while True:
+            (kind, body) = await read_frame(reader)
+            if kind == HELLO:
+                break
+        (username, _) = decode_hello(body)
 
-        self.clients[new_client.fileno()] = new_client
-        self.players[new_client] = next(player for player in self.campaign.party if player.name == username)
-        self.message_buffers[new_client.fileno()] = b""
+        player = next((player for player in self.campaign.party if player.name == username), None)
+        if player is None:
+            print(f"Invalid user name {username}")
+        return player
+
+    # ==== State sync ==== #
+
+    async def _sync(self, conn: Connection):
+        """Send a client a snapshot of the campaign, then the deltas published since it was taken
 
-        self.poller.register(new_client, EPOLLIN | EPOLLHUP)
+        Deltas are held back while the snapshot is taken and compressed, and those it already includes are
+        dropped, so the client gets every change exactly once whatever the timing.
+        """
+        self.syncing[conn] = []
+        (seq, data) = await self._on_kivy(self._take_snapshot)
+        compressed = await asyncio.to_thread(_compress_snapshot, data)
+        self._send(conn, encode_snapshot(seq, compressed))
 
-    def _receive_message(self, sock: socket.socket):
-        updates: list[str] = self._receive(sock)
-        for update in updates:
-            message: list[str] = update.split(":")
+        for delta_seq, update in self.syncing.pop(conn):
+            if delta_seq > seq:
+                self._send(conn, update)
 
-            command = message[0]
+    def _take_snapshot(self) -> tuple[int, dict[str, Any]]:
+        # Flips aren't idempotent, the snapshot can't include changes still to be sent
+        self._flush_fog()
+        return (self.seq, self.campaign.player_data())
 
-            if command in ["POS", "INDEX"]:
-                self._handle_update(message)
-                self._forward_update(sock, update.encode("utf-8"))
+    def _publish(self, update: bytes):
+        """Send every client a change to the campaign, called on the Kivy thread once it is made"""
+        # Batched fog changes were made first
+        self._flush_fog()
+        self._send_delta(update)
 
-            elif command == "FILE":
-                print(f"File requested: {message[1]}")
-                self._send_file(sock, message[1])
+    def _send_delta(self, update: bytes):
+        self.seq += 1
+        self.transport.call(self._forward_update, None, encode_delta(self.seq, update), self.seq)
 
-    def _send_file(self, sock: socket.socket, file_path: str):
-        abs_path = os.path.join(os.environ["DUNGEONFASTER_PATH"], file_path)
+    def _campaign_changed(self, event: dict[str, Any]):
+        """Publish a change recorded by the campaign, on the Kivy thread"""
+        kind = event["type"]
+        if kind == "party":
+            self._publish(encode_party(parse_coordinate(event["position"])))
+        elif kind == "location":
+            # Players only have the fog of the location the party was at
+            location = self.campaign.get_location(event["location"])
+            self._publish(encode_location(location.name, location.fog_snapshot()))
+        elif kind in ("reveal", "flip"):
+            if event["location"] == self.campaign.current_location.name:
+                tiles = event["tiles"] if kind == "reveal" else [event["tile"]]
+                self._batch_fog(event["location"], kind, [(x, y) for x, y in tiles])
+        elif "location" in event and event["location"] == self.campaign.current_location.name:
+            self._publish(encode_fog_change(event["location"], kind))
+        # Token moves are published as they are received, see _move_player and send_update
 
-        # Check file exists
-        if not os.path.exists(abs_path):
-            sock.send(b"\xff\xff\xff\xff")
+    def _batch_fog(self, location: str, change: str, tiles: list[tuple[int, int]]):
+        """Gather the reveals or flips of a location made until the next frame, to be sent as one delta"""
+        if self.fog_batch is None or self.fog_batch[:2] != (location, change):
+            self._flush_fog()
+            self.fog_batch = (location, change, set())
+            Clock.schedule_once(lambda dt: self._flush_fog())
+
+        if change == "reveal":
+            self.fog_batch[2].update(tiles)
         else:
-            # Get file size and serialize
-            size = os.stat(abs_path).st_size
-            sock.send(struct.pack("!I", size))
-            nsent = 0
-
-            # Read & send loop
-            with open(abs_path, "rb") as send_file:
-                while nsent < size:
-                    send_bytes = send_file.read(min(1024, size - nsent))
-
-                    s = sock.send(send_bytes)
-                    if s <= 0:
-                        return
-                    nsent += s
-
-    def _handle_update(self, message: list[str]):
-        command = message[0]
-        if command == "POS":
-            player: str = message[1]
-            pos: tuple[float, float] = eval(message[2])
+            # Flipping a tile twice leaves it as it was
+            self.fog_batch[2].symmetric_difference_update(tiles)
+
+    def _flush_fog(self):
+        if self.fog_batch is None:
+            return
+
+        (location, change, tiles) = self.fog_batch
+        self.fog_batch = None
+        if tiles:
+            self._send_delta(encode_fog_change(location, change, tiles))
+
+    def _on_kivy(self, callback: Callable[..., Any], *args) -> asyncio.Future:
+        """Call callback(*args) on the Kivy thread, and await its result on the loop"""
+        future = concurrent.futures.Future()
+
+        def run(dt):
+            try:
+                future.set_result(callback(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+        Clock.schedule_once(run)
+        return asyncio.wrap_future(future)
+
+    # ==== Outbound queues ==== #
+
+    def _send(self, conn: Connection, *parts: bytes, key=None):
+        try:
+            conn.send(*parts, key=key)
+        except SlowConsumerError as error:
+            print(f"Disconnecting {self.players[conn].name}: {error} ({conn.stats})")
+            conn.abort()
+
+    def _update_key(self, update: bytes):
+        """Drag positions only matter until the next one of the same player, any other update must be delivered"""
+        if update[HEADER.size - 1] != POS:
+            return None
+        (player, _) = unpack_string(memoryview(update)[HEADER.size :])
+        return ("pos", player)
+
+    def backlog_report(self) -> list[str]:
+        """Outbound statistics of every client, to spot the ones which can't keep up"""
+        return [f"{player.name}: {conn.backlog} B waiting, {conn.stats}" for conn, player in list(self.players.items())]
+
+    def _spawn_file(self, conn: Connection, file_path: str, offset: int):
+        """Send a file, stopping any earlier sending of it to the same connection
+
+        Files are requested again from another offset after a corrupt chunk or a size change, the chunks
+        left of the earlier request would only be dropped by the client.
+        """
+        key = (conn, file_path)
+        if key in self.file_tasks:
+            self.file_tasks[key].cancel()
+
+        task = conn.spawn(self._send_file(conn, file_path, offset))
+        self.file_tasks[key] = task
+
+        def forget(done: asyncio.Task):
+            if self.file_tasks.get(key) is done:
+                del self.file_tasks[key]
+
+        task.add_done_callback(forget)
+
+    async def _send_file(self, conn: Connection, file_path: str, offset: int):
+        """Send a file from offset to its end, one FILE frame per chunk
+
+        Chunks are queued a few at a time, so updates sent meanwhile aren't held up by the whole file.
+        """
+        served = await asyncio.to_thread(_served_file, file_path)
+        if served is None:
+            self._send(conn, encode_file_missing(file_path))
+            return
+
+        (abs_path, size) = served
+        checksums = await asyncio.to_thread(chunk_checksums, abs_path, FILE_CHUNK)
+        if not checksums:
+            self._send(conn, encode_chunk_header(file_path, 0, 0, 0, 0))
+            return
+
+        # A client holding the whole file still gets its last chunk, to learn the transfer is complete
+        first = min(offset // FILE_CHUNK, len(checksums) - 1)
+        for index in range(first, len(checksums)):
+            start = index * FILE_CHUNK
+            count = min(FILE_CHUNK, size - start)
+            await conn.wait_for_file_room(FILE_WINDOW)
+            self._send(
+                conn,
+                encode_chunk_header(file_path, size, start, checksums[index], count),
+                FileRegion(abs_path, start, count),
+            )
+
+    def _handle_update(self, sender: Connection, kind: int, body: memoryview):
+        if kind == POS:
+            (player, pos) = decode_pos(body)
             # print(f"Updated for {player}: {pos}")
             self.map_view.receive_player_pos(player, pos)
-        elif command == "INDEX":
-            player: str = message[1]
-            index: tuple[int, int] = eval(message[2])
+            self._forward_update(sender, frame(kind, body))
+        elif kind == INDEX:
+            (player, index) = decode_index(body)
             # print(f"Updated for {player}: {pos}")
-            self.map_view.receive_player_index(player, index)
-
-    def _forward_update(self, sock: socket.socket, update: bytes):
-        recipients = [client for client in self.clients.values() if client != sock]
+            Clock.schedule_once(lambda dt: self._move_player(player, index))
 
-        for recipient in recipients:
-            recipient.send(update)
+    def _move_player(self, player: str, index: tuple[int, int]):
+        self.map_view.receive_player_index(player, index)
+        # Also back to the sender, whose client counts every delta
+        self._publish(encode_index(player, index))
 
-    def _remove_client(self, sock: socket.socket):
-        sock.close()
-        del self.clients[sock.fileno()]
-        del self.players[sock]
+    def _forward_update(self, sender: Connection | None, update: bytes, seq: int | None = None):
+        """Send an update to every client but sender, deltas carry their sequence number"""
+        key = self._update_key(update)
+        recipients = [conn for conn in self.players if conn is not sender]
 
-    def _send_client_update(self, fd: socket.socket):
-        pass
+        for recipient in recipients:
+            if recipient in self.syncing:
+                # Positions are superseded by the snapshot's token indices
+                if seq is not None:
+                    self.syncing[recipient].append((seq, update))
+                continue
+            self._send(recipient, update, key=key)
 
     def stop(self):
-        self.running = False
-        self.sock.close()
-        self.poller.close()
-        self.thread.join()
-
-    def send_update(self, message: str):
-        for _, client in self.clients.items():
-            # print(f"Sending update to {fd}")
-            client.send(message.encode() + b"|")
+        """Close the listening socket and every connection, without waiting on any client"""
+        if self.server is not None:
+            self.transport.call(self.server.close)
+        self.transport.stop()
+
+    def send_update(self, frame: bytes):
+        if frame[HEADER.size - 1] == POS:
+            self.transport.call(self._forward_update, None, frame)
+        else:
+            self._publish(frame)
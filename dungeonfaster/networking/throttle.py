@@ -0,0 +1,55 @@
+import os
+import time
+from collections.abc import Callable
+
+from kivy.clock import Clock, ClockEvent
+
+# Most position updates sent per second for each dragged token
+POSITION_RATE = float(os.environ.get("DUNGEONFASTER_POSITION_RATE", 30))
+
+
+class PositionThrottle:
+    """Sends the position of dragged tokens at most POSITION_RATE times per second, latest wins
+
+    A position arriving sooner than that after the previous one of the same token is held back, replacing
+    any position already held back, and sent once the interval is over. The last position of a drag is
+    therefore always sent, unless the drag ends with a tile index which supersedes it (see discard).
+
+    Used from the Kivy thread only.
+    """
+
+    def __init__(self, send: Callable[[str, tuple[float, float]], None], rate: float = POSITION_RATE):
+        self.send = send
+        self.interval = 1 / rate
+
+        self.last_sent: dict[str, float] = {}
+        # Latest position held back for each token, and the event which sends it
+        self.pending: dict[str, tuple[float, float]] = {}
+        self.events: dict[str, ClockEvent] = {}
+
+    def update(self, token: str, pos: tuple[float, float]) -> None:
+        wait = self.last_sent.get(token, float("-inf")) + self.interval - time.monotonic()
+        if wait <= 0 and token not in self.pending:
+            self._send(token, pos)
+            return
+
+        self.pending[token] = pos
+        if token not in self.events:
+            self.events[token] = Clock.schedule_once(lambda dt: self._send_pending(token), max(wait, 0))
+
+    def discard(self, token: str) -> None:
+        """Drop the position held back for a token, whose final position is about to be sent another way"""
+        self.pending.pop(token, None)
+        event = self.events.pop(token, None)
+        if event is not None:
+            event.cancel()
+
+    def _send_pending(self, token: str) -> None:
+        self.events.pop(token, None)
+        pos = self.pending.pop(token, None)
+        if pos is not None:
+            self._send(token, pos)
+
+    def _send(self, token: str, pos: tuple[float, float]) -> None:
+        self.last_sent[token] = time.monotonic()
+        self.send(token, pos)
@@ -0,0 +1,61 @@
+import asyncio
+import concurrent.futures
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+# Seconds stop waits for the loop thread to cancel its tasks and exit
+STOP_TIMEOUT = 5.0
+
+
+class EventLoopThread:
+    """An asyncio event loop running in its own thread, driven from the Kivy thread
+
+    Coroutines are submitted and callbacks scheduled thread-safely. Stopping cancels every task still
+    running on the loop, so connections are closed at once rather than after a poll timeout.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+
+            tasks = asyncio.all_tasks(self.loop)
+            for task in tasks:
+                task.cancel()
+            self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self.loop.run_until_complete(self.loop.shutdown_asyncgens())
+        finally:
+            self.loop.close()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def submit(self, coro: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """Run a coroutine on the loop, from any thread"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call(self, callback: Callable[..., Any], *args) -> None:
+        """Call callback(*args) on the loop, from any thread"""
+        if self.running:
+            self.loop.call_soon_threadsafe(callback, *args)
+
+    def stop(self) -> None:
+        """Cancel every task and wait for the loop thread to exit"""
+        if not self.running:
+            return
+
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        if threading.current_thread() is not self.thread:
+            self.thread.join(STOP_TIMEOUT)
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+
+# Set as dungeonfaster/__main__.py does, modules find the campaigns and data folders from it
+os.environ.setdefault("DUNGEONFASTER_PATH", os.path.join(os.path.dirname(os.path.dirname(__file__)), "dungeonfaster"))
+# Keep Kivy from parsing pytest's command line arguments as its own
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+
+
+@pytest.fixture
+def make_grid():
+    """Build a grid of the given class with width by height tiles, without laying it out on a map"""
+    # Imported here as the grids load Kivy, which must see the variables above
+    from dungeonfaster.model.grid import Grid
+    from dungeonfaster.model.window import Window
+
+    def make(grid_class: type[Grid], width: int, height: int) -> Grid:
+        grid = grid_class(Window())
+        grid.x = width
+        grid.y = height
+        grid.matrix.resize(width, height)
+        return grid
+
+    return make
+
+
+@pytest.fixture
+def campaign_data() -> dict:
+    """A small campaign in the current schema version, with fog and walls on its locations"""
+    grid = {
+        "width": 6,
+        "height": 4,
+        "x_offset": 0,
+        "y_offset": 0,
+        "x_margin": 1,
+        "y_margin": 1,
+        "pixel_density": 60.0,
+        "matrix": [[0, 0], [1, 0], [5, 2], [0, 3]],
+    }
+    return {
+        "version": 1,
+        "name": "Test campaign",
+        "position": [2, 3],
+        "current_location": "Overworld",
+        "party": [{"name": "Alice"}],
+        "locations": {
+            "Overworld": {
+                "position": [0, 0],
+                "transitions": [[[2, 3], "Cave"]],
+                "entrances": [[[1, 1], [4, 2]]],
+                "music": [],
+                "map": {
+                    "map_file": "campaigns/files/overworld.png",
+                    "zoom": 1.0,
+                    "hidden": True,
+                    "grid_type": "square",
+                    "grid": grid,
+                    "walls": [[0, 0, 120, 0, 120, 60], [10.5, 20.25, 30.0, 40.125]],
+                },
+            },
+            "Cave": {"map": {}},
+        },
+    }
@@ -0,0 +1,128 @@
+import copy
+import json
+
+import pytest
+
+from dungeonfaster.model import campaignFile
+from dungeonfaster.model.campaignFile import CampaignFileError, decode_fog, dumps, encode_fog, encode_fog_bits, loads
+from dungeonfaster.model.fog import FogMatrix
+
+# ==== Fog ==== #
+
+
+def test_fog_round_trip():
+    coordinates = [[0, 0], [1, 0], [5, 2], [0, 3]]
+    assert decode_fog(encode_fog(coordinates, 6, 4), 6) == coordinates
+
+
+def test_empty_fog():
+    runs = encode_fog([], 6, 4)
+    assert runs == bytes([24])
+    assert decode_fog(runs, 6) == []
+    assert encode_fog([], 0, 0) == b""
+    assert decode_fog(b"", 0) == []
+
+
+def test_fully_hidden_fog():
+    coordinates = [[x, y] for y in range(3) for x in range(2)]
+    runs = encode_fog(coordinates, 2, 3)
+    # An empty revealed run first, then every tile
+    assert runs == bytes([0, 6])
+    assert decode_fog(runs, 2) == coordinates
+
+
+def test_long_runs():
+    runs = encode_fog([[299, 299]], 300, 300)
+    assert decode_fog(runs, 300) == [[299, 299]]
+    # 89999 revealed tiles take three varint bytes
+    assert len(runs) == 4
+
+
+@pytest.mark.parametrize(
+    "coordinates",
+    [[[1, 0], [0, 0]], [[0, 0], [0, 0]], [[6, 0]], [[0, -1]], [[0.5, 0]], [[1, 2, 3]]],
+)
+def test_fog_not_from_a_bitmap(coordinates):
+    assert encode_fog(coordinates, 6, 4) is None
+
+
+def test_fog_bits_match_coordinates():
+    fog = FogMatrix(7, 5)
+    fog.hide_many([(0, 0), (6, 0), (3, 2), (4, 2), (6, 4)])
+    assert encode_fog_bits(fog.bits) == encode_fog(fog.save(), 7, 5)
+
+
+# ==== Campaigns ==== #
+
+
+def test_round_trip(campaign_data):
+    original = copy.deepcopy(campaign_data)
+    blob = dumps(campaign_data)
+    assert campaign_data == original
+    assert blob.startswith(campaignFile.MAGIC)
+    assert loads(blob) == original
+
+
+def test_sections(campaign_data):
+    sections = [kind for kind, _ in campaignFile._sections(dumps(campaign_data))]
+    assert sections == [campaignFile.META, campaignFile.FOG, campaignFile.WALLS]
+
+
+def test_values_kept_in_meta(campaign_data):
+    map_data = campaign_data["locations"]["Overworld"]["map"]
+    map_data["grid"]["matrix"] = [[5, 2], [0, 0]]
+    map_data["walls"] = [[0, 0.5, 1, 2]]
+    sections = [kind for kind, _ in campaignFile._sections(dumps(campaign_data))]
+    assert sections == [campaignFile.META]
+    assert loads(dumps(campaign_data)) == campaign_data
+
+
+def test_double_walls(campaign_data):
+    campaign_data["locations"]["Overworld"]["map"]["walls"] = [[0.1, 0.2, 1e300, -3.5]]
+    assert loads(dumps(campaign_data)) == campaign_data
+
+
+def test_fog_snapshot(campaign_data):
+    fog = FogMatrix(6, 4)
+    fog.load(campaign_data["locations"]["Overworld"]["map"]["grid"]["matrix"])
+    expected = copy.deepcopy(campaign_data)
+    campaign_data["locations"]["Overworld"]["map"]["grid"]["matrix"] = fog.snapshot()
+    assert loads(dumps(campaign_data)) == expected
+
+
+def test_truncated(campaign_data):
+    blob = dumps(campaign_data)
+    for length in (0, 5, campaignFile.HEADER.size + 2, len(blob) - 1):
+        with pytest.raises(CampaignFileError):
+            loads(blob[:length])
+
+
+def test_not_a_campaign():
+    with pytest.raises(CampaignFileError):
+        loads(b"{}" * 10)
+
+
+def test_newer_format(campaign_data):
+    blob = bytearray(dumps(campaign_data))
+    campaignFile.HEADER.pack_into(blob, 0, campaignFile.MAGIC, campaignFile.FORMAT_VERSION + 1, 1, 0)
+    with pytest.raises(CampaignFileError, match="Unsupported"):
+        loads(bytes(blob))
+
+
+@pytest.mark.parametrize("extension", campaignFile.EXTENSIONS)
+def test_write_and_read(tmp_path, campaign_data, extension):
+    path = tmp_path / f"campaign{extension}"
+    campaignFile.write_campaign(path, copy.deepcopy(campaign_data))
+    assert campaignFile.read_campaign(path) == campaign_data
+    assert [file.name for file in tmp_path.iterdir()] == [path.name]
+    if extension == campaignFile.JSON_EXTENSION:
+        assert json.loads(path.read_text()) == campaign_data
+
+
+def test_read_meta(tmp_path, campaign_data):
+    path = tmp_path / "campaign.dfc"
+    campaignFile.write_campaign(path, campaign_data)
+    meta = campaignFile.read_campaign_meta(path)
+    assert meta["name"] == campaign_data["name"]
+    assert "matrix" not in meta["locations"]["Overworld"]["map"]["grid"]
+    assert "walls" not in meta["locations"]["Overworld"]["map"]
@@ -0,0 +1,113 @@
+from dungeonfaster.model.fog import FogMatrix
+
+
+def test_empty_fog():
+    fog = FogMatrix()
+    assert len(fog) == 0
+    assert list(fog) == []
+    assert fog.save() == []
+    assert fog.snapshot().save() == []
+    assert not fog.in_range(0, 0)
+    assert not fog.hide(0, 0)
+
+
+def test_empty_fog_of_a_grid():
+    fog = FogMatrix(3, 2)
+    assert len(fog) == 0
+    assert fog.save() == []
+    assert all(fog.revealed(x, y) for x in range(3) for y in range(2))
+
+
+def test_hide_reveal_flip():
+    fog = FogMatrix(4, 4)
+    assert fog.hide(1, 2)
+    assert not fog.hide(1, 2)
+    assert fog.hidden(1, 2)
+    assert (1, 2) in fog
+
+    assert not fog.flip(1, 2)
+    assert fog.revealed(1, 2)
+    assert not fog.reveal(1, 2)
+    assert fog.flip(1, 2)
+    assert not fog.flip(-1, 0)
+
+    assert not fog.hide(4, 0)
+    assert not fog.hidden(-1, 0)
+
+
+def test_changes_bump_the_version():
+    fog = FogMatrix(2, 2)
+    version = fog.version
+    fog.reveal(0, 0)
+    assert fog.version == version
+
+    fog.hide(0, 0)
+    assert fog.version > version
+    version = fog.version
+    fog.invert()
+    assert fog.version > version
+
+
+def test_many():
+    fog = FogMatrix(3, 3)
+    assert fog.hide_many([(0, 0), (1, 1), (0, 0), (5, 5)]) == [(0, 0), (1, 1)]
+    assert fog.reveal_many([(1, 1), (2, 2)]) == [(1, 1)]
+    assert fog.save() == [[0, 0]]
+
+
+def test_whole_map():
+    fog = FogMatrix(2, 3)
+    fog.hide_all()
+    assert len(fog) == 6
+    fog.reveal(1, 1)
+    fog.invert()
+    assert fog.save() == [[1, 1]]
+    fog.reveal_all()
+    assert len(fog) == 0
+
+
+def test_save_load_round_trip():
+    fog = FogMatrix(5, 4)
+    fog.hide_many([(4, 0), (0, 1), (2, 3), (3, 3)])
+    saved = fog.save()
+    assert saved == [[4, 0], [0, 1], [2, 3], [3, 3]]
+
+    loaded = FogMatrix(5, 4)
+    loaded.load(saved)
+    assert loaded.save() == saved
+    assert fog.snapshot().save() == saved
+
+
+def test_load_ignores_out_of_range():
+    fog = FogMatrix(2, 2)
+    fog.load([[1, 1], [2, 0], [0, -1]])
+    assert fog.save() == [[1, 1]]
+
+
+def test_snapshot_is_detached():
+    fog = FogMatrix(2, 2)
+    fog.hide(0, 0)
+    snapshot = fog.snapshot()
+    fog.hide(1, 1)
+    assert snapshot.save() == [[0, 0]]
+    assert (snapshot.width, snapshot.height) == (2, 2)
+
+
+def test_resize_keeps_tiles():
+    fog = FogMatrix(3, 3)
+    fog.hide_many([(0, 0), (2, 2), (1, 0)])
+    fog.resize(2, 4)
+    assert (fog.width, fog.height) == (2, 4)
+    assert fog.save() == [[0, 0], [1, 0]]
+    assert fog.revealed(1, 3)
+
+
+def test_copy():
+    fog = FogMatrix(2, 2)
+    fog.hide(1, 0)
+    copy = fog.copy()
+    assert copy.version == fog.version
+    assert copy.save() == fog.save()
+
+    copy.hide(0, 1)
+    assert fog.revealed(0, 1)
@@ -0,0 +1,71 @@
+import pytest
+
+from dungeonfaster.model.grid import Grid, HexGrid, SquareGrid
+
+
+def all_tiles(grid: Grid) -> list[tuple[int, int]]:
+    return [(i, j) for j in range(grid.y) for i in range(grid.x)]
+
+
+@pytest.fixture(params=[SquareGrid, HexGrid])
+def grid(request, make_grid) -> Grid:
+    return make_grid(request.param, 7, 9)
+
+
+def test_adjacent_matches_distance(grid):
+    for tile in all_tiles(grid):
+        expected = {other for other in all_tiles(grid) if grid.distance(tile, other) == 1}
+        assert set(grid.adjacent(*tile)) == expected
+
+
+def test_adjacent_outside_the_grid(grid):
+    assert set(grid.adjacent(-1, 0)) <= set(all_tiles(grid))
+    assert grid.adjacent(-5, -5) == []
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 4])
+def test_within_radius(grid, radius):
+    origin = (3, 4)
+    tiles = grid.within_radius(*origin, radius)
+    assert len(tiles) == len(set(tiles))
+    assert set(tiles) == {tile for tile in all_tiles(grid) if grid.distance(origin, tile) <= radius}
+
+
+@pytest.mark.parametrize("radius", [0, 1, 2, 4])
+def test_ring(grid, radius):
+    origin = (3, 4)
+    tiles = grid.ring(*origin, radius)
+    assert len(tiles) == len(set(tiles))
+    assert set(tiles) == {tile for tile in all_tiles(grid) if grid.distance(origin, tile) == radius}
+
+
+def test_ring_at_the_edge(grid):
+    tiles = grid.ring(0, 0, 1)
+    assert set(tiles) == set(grid.adjacent(0, 0))
+
+
+def test_ring_out_of_range_radius(grid):
+    assert grid.ring(3, 4, 50) == []
+    assert grid.ring(3, 4, -1) == []
+    assert grid.within_radius(3, 4, -1) == []
+
+
+def test_within_radius_covers_the_grid(grid):
+    assert sorted(grid.within_radius(3, 4, 50)) == sorted(all_tiles(grid))
+
+
+def test_outside_origin(grid):
+    assert grid.ring(-1, 0, 0) == []
+    assert set(grid.within_radius(-1, 0, 1)) <= set(all_tiles(grid))
+
+
+def test_square_ring_size(make_grid):
+    grid = make_grid(SquareGrid, 20, 20)
+    for radius in range(1, 5):
+        assert len(grid.ring(10, 10, radius)) == 8 * radius
+
+
+def test_hex_ring_size(make_grid):
+    grid = make_grid(HexGrid, 20, 40)
+    for radius in range(1, 5):
+        assert len(grid.ring(10, 20, radius)) == 6 * radius
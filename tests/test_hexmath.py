@@ -0,0 +1,26 @@
+from dungeonfaster.model import hexmath
+
+
+def test_offset_axial_round_trip():
+    for j in range(-5, 6):
+        for i in range(-5, 6):
+            assert hexmath.axial_to_offset(*hexmath.offset_to_axial(i, j)) == (i, j)
+
+
+def test_pixel_axial_round_trip():
+    for q in range(-4, 5):
+        for r in range(-4, 5):
+            assert hexmath.pixel_to_axial(*hexmath.axial_to_pixel(q, r, 30), 30) == (q, r)
+
+
+def test_pixel_near_the_center():
+    (x, y) = hexmath.axial_to_pixel(2, -1, 30)
+    assert hexmath.pixel_to_axial(x + 10, y - 10, 30) == (2, -1)
+
+
+def test_axial_distance():
+    assert hexmath.axial_distance((0, 0), (0, 0)) == 0
+    for direction in hexmath.AXIAL_DIRECTIONS:
+        assert hexmath.axial_distance((0, 0), direction) == 1
+    assert hexmath.axial_distance((0, 0), (3, -1)) == 3
+    assert hexmath.axial_distance((2, 1), (-1, 3)) == 3
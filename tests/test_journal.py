@@ -0,0 +1,150 @@
+import pytest
+
+from dungeonfaster.model import journal as journal_module
+from dungeonfaster.model.journal import CampaignJournal
+
+
+@pytest.fixture
+def path(tmp_path):
+    return CampaignJournal.path_for(tmp_path / "campaign.json")
+
+
+def write_events(path, count, start=0):
+    journal = CampaignJournal(path)
+    journal.read()
+    for value in range(start, start + count):
+        journal.append({"type": "move", "value": value})
+    journal.close()
+
+
+def values(events):
+    return [event["value"] for event in events]
+
+
+def test_path_for(tmp_path):
+    assert CampaignJournal.path_for(tmp_path / "a.dfc") == str(tmp_path / "a.dfc.journal")
+
+
+def test_missing_journal(path):
+    journal = CampaignJournal(path)
+    assert journal.read() == []
+    assert journal.seq == 0
+    journal.close()
+
+
+def test_append_and_read(path):
+    write_events(path, 3)
+
+    journal = CampaignJournal(path)
+    events = journal.read()
+    assert values(events) == [0, 1, 2]
+    assert [event["seq"] for event in events] == [1, 2, 3]
+    assert journal.seq == 3
+
+    # Sequence numbers carry on after reopening
+    journal.append({"type": "move", "value": 3})
+    journal.close()
+    assert [event["seq"] for event in CampaignJournal(path).read()] == [1, 2, 3, 4]
+
+
+def test_torn_last_line(path):
+    write_events(path, 2)
+    with open(path, "ab") as journal_file:
+        journal_file.write(b'{"seq":3,"type":"mo')
+
+    journal = CampaignJournal(path)
+    assert values(journal.read()) == [0, 1]
+    journal.append({"type": "move", "value": 2})
+    journal.close()
+
+    with open(path, "rb") as journal_file:
+        lines = journal_file.read().splitlines()
+    assert len(lines) == 3
+    assert values(CampaignJournal(path).read()) == [0, 1, 2]
+
+
+def test_corrupt_line_ends_the_journal(path):
+    write_events(path, 1)
+    with open(path, "ab") as journal_file:
+        journal_file.write(b"not json\n")
+        journal_file.write(b'{"seq":9,"value":9}\n')
+
+    assert values(CampaignJournal(path).read()) == [0]
+
+
+def test_sync(path, monkeypatch):
+    synced = []
+    monkeypatch.setattr(journal_module.os, "fsync", synced.append)
+
+    journal = CampaignJournal(path)
+    journal.read()
+    for value in range(journal_module.SYNC_EVERY - 1):
+        journal.append({"value": value})
+    assert synced == []
+
+    journal.append({"value": 0})
+    assert len(synced) == 1
+    assert journal.pending == 0
+
+    journal.sync()
+    assert len(synced) == 1
+    journal.close()
+
+
+def test_needs_compaction(path, monkeypatch):
+    monkeypatch.setattr(journal_module, "COMPACT_EVERY", 3)
+    write_events(path, 2)
+
+    journal = CampaignJournal(path)
+    journal.read()
+    assert not journal.needs_compaction()
+    journal.append({"value": 2})
+    assert journal.needs_compaction()
+
+    journal.rotate()
+    assert not journal.needs_compaction()
+    journal.close()
+
+
+def test_rotate_and_replay(path):
+    write_events(path, 2)
+
+    journal = CampaignJournal(path)
+    journal.read()
+    journal.rotate()
+    journal.append({"value": 2})
+    journal.close()
+
+    # The snapshot was never written, both files are replayed in order
+    journal = CampaignJournal(path)
+    events = journal.read()
+    assert values(events) == [0, 1, 2]
+    assert [event["seq"] for event in events] == [1, 2, 3]
+
+    journal.discard_rotated()
+    journal.close()
+    assert values(CampaignJournal(path).read()) == [2]
+
+
+def test_rotate_twice_keeps_unwritten_events(path):
+    write_events(path, 1)
+
+    journal = CampaignJournal(path)
+    journal.read()
+    journal.rotate()
+    journal.append({"value": 1})
+    # The first snapshot failed, the second one must still include event 0
+    journal.rotate()
+    journal.append({"value": 2})
+    journal.close()
+
+    with open(journal.rotated_path, "rb") as rotated:
+        assert len(rotated.read().splitlines()) == 2
+    assert values(CampaignJournal(path).read()) == [0, 1, 2]
+
+
+def test_discard_without_rotation(path):
+    journal = CampaignJournal(path)
+    journal.discard_rotated()
+    journal.close()
+    journal.close()
@@ -0,0 +1,106 @@
+import itertools
+from types import SimpleNamespace
+
+import pytest
+
+from dungeonfaster.model.grid import HexGrid, SquareGrid
+from dungeonfaster.model.pathfinding import PathFinder
+
+
+def make_map(grid, walls=()):
+    """Stand-in for Map with the attributes PathFinder reads"""
+    return SimpleNamespace(grid=grid, walls=list(walls), walls_version=0)
+
+
+def column_wall(grid, column, gap=None):
+    """Wall between columns column - 1 and column of a square grid, open at row gap"""
+    x = (grid.map_center_from_index(column - 1, 0)[0] + grid.map_center_from_index(column, 0)[0]) / 2
+    (_, bottom) = grid.map_pos_from_index(0, 0)
+    (_, top) = grid.map_pos_from_index(0, grid.y)
+    if gap is None:
+        return [[(x, bottom), (x, top)]]
+
+    (_, gap_bottom) = grid.map_pos_from_index(0, gap)
+    (_, gap_top) = grid.map_pos_from_index(0, gap + 1)
+    return [[(x, bottom), (x, gap_bottom)], [(x, gap_top), (x, top)]]
+
+
+def assert_valid_path(grid, path, start, goal):
+    assert path[0] == start
+    assert path[-1] == goal
+    for tile, next_tile in itertools.pairwise(path):
+        assert next_tile in grid.adjacent(*tile)
+
+
+@pytest.mark.parametrize("grid_class", [SquareGrid, HexGrid])
+def test_open_grid(make_grid, grid_class):
+    grid = make_grid(grid_class, 8, 10)
+    finder = PathFinder(make_map(grid))
+    start = (1, 2)
+    for goal in [(1, 2), (0, 0), (7, 9), (5, 3)]:
+        moves = finder.moves(start, goal)
+        assert moves == grid.distance(start, goal)
+
+        path = finder.path(start, goal)
+        assert len(path) == moves + 1
+        assert_valid_path(grid, path, start, goal)
+
+
+def test_distance_field(make_grid):
+    grid = make_grid(SquareGrid, 4, 3)
+    field = PathFinder(make_map(grid)).distance_field((0, 0))
+    assert list(field) == [0, 1, 2, 3, 1, 1, 2, 3, 2, 2, 2, 3]
+
+
+def test_out_of_bounds(make_grid):
+    grid = make_grid(SquareGrid, 4, 4)
+    finder = PathFinder(make_map(grid))
+    assert finder.moves((0, 0), (4, 0)) is None
+    assert finder.path((-1, 0), (2, 2)) is None
+    assert set(finder.distance_field((9, 9))) == {-1}
+
+
+def test_unreachable_goal(make_grid):
+    grid = make_grid(SquareGrid, 6, 5)
+    finder = PathFinder(make_map(grid, column_wall(grid, 3)))
+    assert finder.moves((0, 0), (5, 4)) is None
+    assert finder.path((0, 0), (5, 4)) is None
+    assert finder.moves((0, 0), (2, 4)) == 4
+
+
+def test_walls_lengthen_routes(make_grid):
+    grid = make_grid(SquareGrid, 6, 5)
+    finder = PathFinder(make_map(grid, column_wall(grid, 3, gap=4)))
+    # Up to the gap, through it and back down, moves touching the end of the wall are blocked too
+    assert finder.moves((2, 0), (3, 0)) == 9
+    path = finder.path((2, 0), (3, 0))
+    assert len(path) == 10
+    assert_valid_path(grid, path, (2, 0), (3, 0))
+    assert path[4:6] == [(2, 4), (3, 4)]
+
+
+def test_wall_changes_invalidate_fields(make_grid):
+    grid = make_grid(SquareGrid, 6, 5)
+    map_arg = make_map(grid)
+    finder = PathFinder(map_arg)
+    assert finder.moves((0, 0), (5, 0)) == 5
+
+    map_arg.walls = column_wall(grid, 3)
+    map_arg.walls_version += 1
+    assert finder.moves((0, 0), (5, 0)) is None
+
+
+def test_avoid_hidden(make_grid):
+    grid = make_grid(SquareGrid, 5, 3)
+    finder = PathFinder(make_map(grid))
+    grid.matrix.hide_many([(2, 0), (2, 1), (2, 2)])
+
+    assert finder.moves((0, 1), (4, 1)) == 4
+    assert finder.moves((0, 1), (4, 1), avoid_hidden=True) is None
+    assert finder.path((0, 1), (4, 1), avoid_hidden=True) is None
+
+    # Revealing a tile changes the fog version, so the cached field is recomputed
+    grid.matrix.reveal(2, 2)
+    path = finder.path((0, 1), (4, 1), avoid_hidden=True)
+    assert (2, 2) in path
+    assert_valid_path(grid, path, (0, 1), (4, 1))
@@ -0,0 +1,144 @@
+import asyncio
+import struct
+import zlib
+
+import pytest
+
+from dungeonfaster.model.fog import FogMatrix
+from dungeonfaster.networking import protocol
+from dungeonfaster.networking.protocol import ProtocolError
+
+
+def read_frames(data: bytes, count: int) -> list[tuple[int, bytes]]:
+    """Read count frames from a stream holding data, then the end of the stream"""
+
+    async def read():
+        stream = asyncio.StreamReader()
+        stream.feed_data(data)
+        stream.feed_eof()
+        return [(kind, bytes(body)) for kind, body in [await protocol.read_frame(stream) for _ in range(count)]]
+
+    return asyncio.run(read())
+
+
+def body(data: bytes) -> memoryview:
+    return memoryview(data)[protocol.HEADER.size :]
+
+
+# ==== Framing ==== #
+
+
+def test_read_frames():
+    frames = read_frames(
+        protocol.encode_sync_request() + protocol.encode_hello("bob", "secret") + protocol.encode_party((3, 4)), 3
+    )
+    assert [kind for kind, _ in frames] == [protocol.SYNC_REQUEST, protocol.HELLO, protocol.PARTY]
+    assert frames[0][1] == b""
+    assert protocol.decode_hello(memoryview(frames[1][1])) == ("bob", "secret")
+
+
+def test_read_frame_split_across_writes():
+    data = protocol.encode_index("bob", (1, 2))
+
+    async def read():
+        stream = asyncio.StreamReader()
+        task = asyncio.create_task(protocol.read_frame(stream))
+        for byte in data:
+            stream.feed_data(bytes([byte]))
+            await asyncio.sleep(0)
+        return await task
+
+    (kind, frame_body) = asyncio.run(read())
+    assert kind == protocol.INDEX
+    assert protocol.decode_index(frame_body) == ("bob", (1, 2))
+
+
+@pytest.mark.parametrize("length", [0, 3, protocol.HEADER.size, protocol.HEADER.size + 4])
+def test_truncated_stream(length):
+    data = protocol.encode_hello("bob", "secret")[:length]
+    with pytest.raises(asyncio.IncompleteReadError):
+        read_frames(data, 1)
+
+
+def test_frame_too_large():
+    with pytest.raises(ProtocolError):
+        read_frames(protocol.HEADER.pack(protocol.MAX_FRAME + 1, protocol.FILE), 1)
+
+
+# ==== Messages ==== #
+
+
+def test_pos_round_trip():
+    assert protocol.decode_pos(body(protocol.encode_pos("Ünïcode", (12.5, -3.0625)))) == ("Ünïcode", (12.5, -3.0625))
+
+
+def test_file_request_round_trip():
+    frame = protocol.encode_file_request("campaigns/files/map.png", 3 << 20)
+    assert protocol.decode_file_request(body(frame)) == ("campaigns/files/map.png", 3 << 20)
+
+
+def test_file_chunk():
+    data = b"some file data"
+    header = protocol.encode_chunk_header("a.png", 100, 20, zlib.crc32(data), len(data))
+    (path, chunk) = protocol.decode_file(body(header + data))
+    assert path == "a.png"
+    assert (chunk.size, chunk.offset, chunk.crc, bytes(chunk.data)) == (100, 20, zlib.crc32(data), data)
+
+    assert protocol.decode_file(body(protocol.encode_file_missing("b.png"))) == ("b.png", None)
+
+
+def test_delta_round_trip():
+    update = protocol.encode_party((5, 6))
+    (seq, kind, update_body) = protocol.decode_delta(body(protocol.encode_delta(42, update)))
+    assert (seq, kind) == (42, protocol.PARTY)
+    assert protocol.decode_party(update_body) == (5, 6)
+
+
+def test_snapshot_round_trip():
+    compressed = zlib.compress(b"campaign")
+    (seq, payload) = protocol.decode_snapshot(body(protocol.encode_snapshot(7, compressed)))
+    assert seq == 7
+    assert zlib.decompress(payload) == b"campaign"
+
+
+@pytest.mark.parametrize("tiles", [[], [(0, 0)], [(3, 4), (10, 2), (4, 4), (3, 9)]])
+def test_tiles_round_trip(tiles):
+    assert protocol.unpack_tiles(memoryview(protocol.pack_tiles(tiles))) == sorted(
+        ([x, y] for x, y in tiles), key=lambda tile: (tile[1], tile[0])
+    )
+
+
+@pytest.mark.parametrize("change", protocol.FOG_CHANGES)
+def test_fog_change_round_trip(change):
+    tiles = [(1, 2), (2, 2)]
+    (location, decoded, decoded_tiles) = protocol.decode_fog_change(
+        body(protocol.encode_fog_change("Cave", change, tiles))
+    )
+    assert (location, decoded) == ("Cave", change)
+    assert decoded_tiles == ([[1, 2], [2, 2]] if change in ("reveal", "flip") else [])
+
+
+def test_location_round_trip():
+    fog = FogMatrix(5, 3)
+    fog.hide_many([(0, 0), (4, 2)])
+    assert protocol.decode_location(body(protocol.encode_location("Cave", fog.snapshot()))) == ("Cave", fog.save())
+    assert protocol.decode_location(body(protocol.encode_location("Empty", FogMatrix().snapshot()))) == ("Empty", [])
+
+
+@pytest.mark.parametrize(
+    ("decode", "data"),
+    [
+        (protocol.decode_hello, struct.pack("!H", 5) + b"ab"),
+        (protocol.decode_pos, protocol.pack_string("bob") + b"\x00"),
+        (protocol.decode_index, protocol.pack_string("bob")),
+        (protocol.decode_file, protocol.pack_string("a.png")),
+        (protocol.decode_file, protocol.pack_string("a.png") + b"\x01\x00"),
+        (protocol.decode_delta, protocol.SEQ.pack(1) + protocol.HEADER.pack(10, protocol.PARTY)),
+        (protocol.decode_fog_change, protocol.pack_string("Cave") + bytes([len(protocol.FOG_CHANGES)])),
+        (protocol.decode_fog_change, protocol.pack_string("Cave") + b"\x00" + protocol.BOX.pack(0, 0, 8, 8)),
+        (protocol.decode_party, b"\x00"),
+    ],
+)
+def test_truncated_bodies(decode, data):
+    with pytest.raises(ProtocolError):
+        decode(memoryview(data))
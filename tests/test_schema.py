@@ -0,0 +1,146 @@
+import pytest
+
+from dungeonfaster.model.schema import (
+    SCHEMA_VERSION,
+    SchemaError,
+    encode_polyline,
+    parse_coordinate,
+    parse_polyline,
+    upgrade,
+    validate,
+)
+
+
+def campaign_v0() -> dict:
+    return {
+        "name": "Old campaign",
+        "position": "(2, 3)",
+        "current_location": "Overworld",
+        "locations": {
+            "Overworld": {
+                "position": "(0, 0)",
+                "transitions": {"(2, 3)": "Cave"},
+                "entrances": {"(1, 1)": "(4, 2)"},
+                "map": {
+                    "map_file": "campaigns/files/overworld.png",
+                    "zoom": 1.0,
+                    "hidden": True,
+                    "grid_type": "square",
+                    "grid": {
+                        "width": 6,
+                        "height": 4,
+                        "x_offset": 0,
+                        "y_offset": 0,
+                        "x_margin": 1,
+                        "y_margin": 1,
+                        "pixel_density": 60.0,
+                    },
+                    "walls": [["(0, 0)", "(120.5, 0)"]],
+                },
+            },
+            "Cave": {},
+        },
+    }
+
+
+# ==== Coordinates ==== #
+
+
+def test_parse_coordinate():
+    assert parse_coordinate("(3, 4)") == (3, 4)
+    assert parse_coordinate("(3.5, -4)") == (3.5, -4)
+    assert parse_coordinate([3, 4.5]) == (3, 4.5)
+    assert parse_coordinate((1, 2)) == (1, 2)
+
+
+@pytest.mark.parametrize("value", ["(3, four)", "__import__('os')", None, 3, [1, "2"], {"x": 1}])
+def test_invalid_coordinate(value):
+    with pytest.raises(SchemaError):
+        parse_coordinate(value)
+
+
+def test_polyline_round_trip():
+    points = [(0, 0), (10.5, 3), (-2, 7)]
+    assert parse_polyline(encode_polyline(points)) == points
+    assert parse_polyline([]) == []
+
+
+def test_odd_polyline():
+    with pytest.raises(SchemaError):
+        parse_polyline([0, 0, 1])
+
+
+# ==== Versions ==== #
+
+
+def test_upgrade_v0():
+    data = upgrade(campaign_v0())
+    assert data["version"] == SCHEMA_VERSION
+    assert data["position"] == [2, 3]
+
+    overworld = data["locations"]["Overworld"]
+    assert overworld["position"] == [0, 0]
+    assert overworld["transitions"] == [[[2, 3], "Cave"]]
+    assert overworld["entrances"] == [[[1, 1], [4, 2]]]
+    assert overworld["map"]["walls"] == [[0, 0, 120.5, 0]]
+    assert data["locations"]["Cave"] == {"transitions": [], "entrances": []}
+
+
+def test_upgrade_current_version(campaign_data):
+    assert upgrade(campaign_data) is campaign_data
+
+
+def test_upgrade_newer_version(campaign_data):
+    campaign_data["version"] = SCHEMA_VERSION + 1
+    with pytest.raises(SchemaError, match="Unsupported"):
+        upgrade(campaign_data)
+
+
+@pytest.mark.parametrize("data", [[], "campaign", None])
+def test_upgrade_non_object(data):
+    with pytest.raises(SchemaError):
+        upgrade(data)
+
+
+def test_upgrade_invalid_v0():
+    data = campaign_v0()
+    data["locations"]["Overworld"]["transitions"] = {"os.system('ls')": "Cave"}
+    with pytest.raises(SchemaError):
+        upgrade(data)
+
+
+# ==== Validation ==== #
+
+
+def test_validate(campaign_data):
+    validate(campaign_data)
+
+
+def test_missing_field(campaign_data):
+    del campaign_data["current_location"]
+    with pytest.raises(SchemaError, match=r"campaign\.current_location is missing"):
+        validate(campaign_data)
+
+
+def test_invalid_location_field(campaign_data):
+    campaign_data["locations"]["Overworld"]["transitions"] = [[[2, 3], 4]]
+    with pytest.raises(SchemaError, match=r"transitions has an invalid value"):
+        validate(campaign_data)
+
+
+def test_invalid_grid_field(campaign_data):
+    campaign_data["locations"]["Overworld"]["map"]["grid"]["matrix"] = [[0, "0"]]
+    with pytest.raises(SchemaError, match=r"map\.grid\.matrix"):
+        validate(campaign_data)
+
+
+def test_invalid_walls(campaign_data):
+    campaign_data["locations"]["Overworld"]["map"]["walls"] = [[0, 0, 1]]
+    with pytest.raises(SchemaError, match=r"map\.walls"):
+        validate(campaign_data)
+
+
+def test_booleans_are_not_numbers(campaign_data):
+    campaign_data["position"] = [True, 0]
+    with pytest.raises(SchemaError):
+        validate(campaign_data)
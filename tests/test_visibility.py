@@ -0,0 +1,58 @@
+from types import SimpleNamespace
+
+import pytest
+
+from dungeonfaster.model.grid import HexGrid, SquareGrid
+from dungeonfaster.model.visibility import LineOfSight
+
+
+def make_map(grid, walls=()):
+    """Stand-in for Map with the attributes LineOfSight reads"""
+    return SimpleNamespace(grid=grid, walls=list(walls), walls_version=0)
+
+
+def wall_right_of(grid, column, rows):
+    """Vertical wall between column and column + 1 of a square grid, along rows"""
+    x = grid.map_pos_from_index(column + 1, 0)[0]
+    return [(x, grid.map_pos_from_index(0, rows.start)[1]), (x, grid.map_pos_from_index(0, rows.stop)[1])]
+
+
+@pytest.mark.parametrize("grid_class", [SquareGrid, HexGrid])
+def test_without_walls(make_grid, grid_class):
+    grid = make_grid(grid_class, 9, 9)
+    sight = LineOfSight(make_map(grid))
+    assert sight.visible_tiles((4, 4), 3) == grid.within_radius(4, 4, 3)
+
+
+def test_out_of_range_origin(make_grid):
+    grid = make_grid(SquareGrid, 5, 5)
+    sight = LineOfSight(make_map(grid, [wall_right_of(grid, 1, range(5))]))
+    assert sight.visible_tiles((20, 20), 2) == []
+
+
+def test_wall_casts_a_shadow(make_grid):
+    grid = make_grid(SquareGrid, 9, 9)
+    sight = LineOfSight(make_map(grid, [wall_right_of(grid, 4, range(3, 6))]))
+    visible = set(sight.visible_tiles((3, 4), 4))
+
+    assert (3, 4) in visible
+    assert (4, 4) in visible
+    assert (5, 4) not in visible
+    assert (7, 4) not in visible
+    assert (5, 5) not in visible
+    # Around the ends of the wall
+    assert (5, 7) in visible
+    assert (5, 1) in visible
+    # Behind the viewer
+    assert (0, 4) in visible
+
+
+def test_wall_changes(make_grid):
+    grid = make_grid(SquareGrid, 9, 9)
+    map_arg = make_map(grid)
+    sight = LineOfSight(map_arg)
+    assert (6, 4) in sight.visible_tiles((3, 4), 4)
+
+    map_arg.walls.append(wall_right_of(grid, 4, range(3, 6)))
+    map_arg.walls_version += 1
+    assert (6, 4) not in sight.visible_tiles((3, 4), 4)
@@ -0,0 +1,97 @@
+import random
+
+from dungeonfaster.model.walls import VertexIndex, WallIndex, segments_cross
+
+WALLS = [
+    [(0, 0), (100, 0), (100, 100)],
+    [(500, 500), (520, 510)],
+    [(2000, 40), (2100, 40), (2100, 900), (1900, 900)],
+]
+
+
+# ==== Segments ==== #
+
+
+def test_crossing_segments():
+    assert segments_cross((0, 0), (10, 10), (0, 10), (10, 0))
+    assert not segments_cross((0, 0), (10, 10), (20, 0), (30, 10))
+    assert not segments_cross((0, 0), (1, 0), (0, 1), (1, 1))
+
+
+def test_touching_segments():
+    assert segments_cross((0, 0), (10, 0), (10, 0), (10, 10))
+    assert segments_cross((0, 0), (10, 0), (5, 0), (5, 10))
+
+
+def test_collinear_segments():
+    assert not segments_cross((0, 0), (10, 0), (5, 0), (15, 0))
+    assert not segments_cross((0, 0), (10, 0), (20, 0), (30, 0))
+
+
+# ==== Wall index ==== #
+
+
+def test_segment_keys():
+    index = WallIndex(WALLS)
+    assert index.segments[(0, 1)] == ((100, 0), (100, 100))
+    assert index.segments[(2, 2)] == ((2100, 900), (1900, 900))
+    assert len(index.segments) == 6
+
+
+def test_empty_walls():
+    index = WallIndex([])
+    assert index.segments == {}
+    assert index.segments_in(-1000, -1000, 1000, 1000) == []
+    assert VertexIndex([]).nearest((0, 0), 1000) is None
+
+
+def test_segments_in():
+    index = WallIndex(WALLS)
+    # Candidates come from whole cells, so nearby segments may be returned too
+    assert ((100, 0), (100, 100)) in index.segments_in(90, 50, 110, 60)
+    assert ((2000, 40), (2100, 40)) not in index.segments_in(90, 50, 110, 60)
+    assert ((500, 500), (520, 510)) in index.segments_in(510, 505, 511, 506)
+    assert index.segments_in(5000, 5000, 6000, 6000) == []
+
+
+def test_segments_in_finds_every_overlap():
+    rng = random.Random(4)
+    walls = [[(rng.uniform(0, 3000), rng.uniform(0, 3000)) for _ in range(4)] for _ in range(30)]
+    index = WallIndex(walls)
+    for _ in range(50):
+        (left, bottom) = (rng.uniform(0, 3000), rng.uniform(0, 3000))
+        (right, top) = (left + rng.uniform(0, 500), bottom + rng.uniform(0, 500))
+        found = index.segments_in(left, bottom, right, top)
+        for (x1, y1), (x2, y2) in index.segments.values():
+            if min(x1, x2) <= right and max(x1, x2) >= left and min(y1, y2) <= top and max(y1, y2) >= bottom:
+                assert ((x1, y1), (x2, y2)) in found
+
+
+# ==== Vertex index ==== #
+
+
+def test_nearest():
+    index = VertexIndex(WALLS)
+    assert len(index) == 9
+    assert index.nearest((98, 3), 10) == (0, 1)
+    assert index.nearest((510, 505), 20) in {(1, 0), (1, 1)}
+    assert index.nearest((300, 300), 50) is None
+
+
+def test_nearest_excluding_a_polyline():
+    index = VertexIndex(WALLS)
+    assert index.nearest((500, 500), 30, exclude_polyline=1) is None
+    assert index.nearest((2100, 45), 10, exclude_polyline=1) == (2, 1)
+
+
+def test_move_and_remove():
+    index = VertexIndex(WALLS)
+    index.move((0, 1), (1500, 1500))
+    assert index.nearest((100, 0), 10) is None
+    assert index.nearest((1502, 1500), 10) == (0, 1)
+    assert len(index) == 9
+
+    index.remove((0, 1))
+    index.remove((0, 1))
+    assert index.nearest((1502, 1500), 10) is None
+    assert len(index) == 8